@@ -44,6 +44,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost so it times the whole stack; removes itself unless REQUEST_PROFILING is on
+    'pages.profiling.RequestProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,12 +80,74 @@ WSGI_APPLICATION = 'myproject.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite tuning for concurrent importers and dashboard readers.
+# WAL lets readers keep reading while one writer commits; NORMAL sync is
+# safe under WAL (a power cut can lose the last commit, never corrupt).
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,  # Read pages through the OS page cache
+    'cache_size': -64 * 1024,        # Negative = KiB, i.e. 64 MiB per connection
+}
+# Seconds a connection waits on a locked database before raising
+SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20))
+# Write strategy: IMMEDIATE takes the write lock when atomic() begins, so
+# concurrent writers queue on the busy timeout instead of failing with
+# "database is locked" when a read lock cannot be upgraded mid-transaction.
+# Set to DEFERRED to get SQLite's default behaviour back.
+SQLITE_TRANSACTION_MODE = os.environ.get('SQLITE_TRANSACTION_MODE', 'IMMEDIATE')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'timeout': SQLITE_BUSY_TIMEOUT,
+            'transaction_mode': SQLITE_TRANSACTION_MODE,
+            # Run on every new connection
+            'init_command': ';'.join(f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()),
+        },
+    }
+}
+
+
+# Cache (per-process by default; use a shared backend such as Redis when
+# running several web processes so invalidations reach all of them)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'smart-sorter',
     }
 }
+# Upper bound, in seconds, on how long cached category metadata can be stale
+CATEGORY_CACHE_TIMEOUT = 300
+# How long the Transaction admin reuses a changelist row count (pages/changelist.py)
+ADMIN_COUNT_CACHE_TIMEOUT = 60
+# Users whose LedgerSnapshot each process keeps in memory (pages/ledger.py)
+LEDGER_CACHE_USERS = 4
+# Ledger version files, shared by the web processes, the import worker and commands
+LEDGER_VERSION_DIR = os.path.join(BASE_DIR, 'ledger_versions')
+
+
+# Request profiling (pages/profiling.py): Server-Timing headers and one
+# JSON log line per request with wall time, query count/time and memory
+REQUEST_PROFILING = os.environ.get('REQUEST_PROFILING', '') == '1'
+# Requests slower than this log at WARNING and keep their cProfile dump
+REQUEST_PROFILING_SLOW_MS = float(os.environ.get('REQUEST_PROFILING_SLOW_MS', 500))
+# Share of requests run under cProfile (0 turns profiling off, 1 profiles everything)
+REQUEST_PROFILING_SAMPLE_RATE = float(os.environ.get('REQUEST_PROFILING_SAMPLE_RATE', 0))
+REQUEST_PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'pages.profiling': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
 
 
 # Password validation
@@ -130,6 +194,15 @@ STATICFILES_DIRS = [
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 
+# Uploaded files (queued CSV imports are stored here until processed)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Largest statement file (CSV or ZIP) the import form accepts, in bytes (pages/uploads.py)
+IMPORT_UPLOAD_MAX_BYTES = 100 * 1024 * 1024
+# A running import job with no progress for this many seconds is taken to have lost its worker (pages/jobs.py)
+IMPORT_JOB_TIMEOUT = 15 * 60
+
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -171,6 +244,12 @@ JAZZMIN_SETTINGS = {
         "pages.Category": "fas fa-tags",
         "pages.Transaction": "fas fa-exchange-alt",
         "pages.DefaultCategory": "fas fa-list-ul",
+        "pages.ImportBatch": "fas fa-layer-group",
+        "pages.ImportJob": "fas fa-file-import",
+        "pages.CategoryRule": "fas fa-filter",
+        "pages.Merchant": "fas fa-store",
+        "pages.RecurringSeries": "fas fa-redo",
+        "pages.SpendingAnomaly": "fas fa-exclamation-triangle",
     },
     # Order of the sidebar
     "order_with_respect_to": ["pages", "auth.user", "auth.Group"],
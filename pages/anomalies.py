@@ -0,0 +1,148 @@
+"""
+Spending-anomaly detection for the Analytics Dashboard (UC 5.1).
+Flags transactions whose amount is far outside the recent normal range
+of their category: each row is compared with the median and MAD (median
+absolute deviation) of the previous ``WINDOW`` transactions in the same
+category, and flagged when its robust z-score exceeds ``THRESHOLD``.
+
+The (id, amount, category) columns come from the user's cached
+LedgerSnapshot (pages/ledger.py), loaded with just those columns and
+regrouped into (category, date) order with one stable sort; grouping and the rolling statistics are
+array operations, so no per-row Python objects are built and a rescan
+after an unchanged ledger does not touch the database.
+
+NumPy is optional: without it ``ANOMALIES_AVAILABLE`` is False and the
+dashboard simply shows no anomalies.
+"""
+import time
+
+from django.db import transaction
+
+from .ledger import get_ledger
+from .models import SpendingAnomaly
+
+try:
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+ANOMALIES_AVAILABLE = np is not None
+
+# Rows per median computation; bounds the (rows x window) working copy
+ROLLING_CHUNK_ROWS = 100_000
+
+
+def rolling_median_mad(values, positions, window, min_history, stride=1):
+    """
+    Median and MAD of the previous ``window`` values of each row's group.
+    ``values`` are sorted by group then time; ``positions`` is each row's
+    index within its group. Rows with fewer than ``min_history`` earlier
+    rows get NaN. With ``stride`` > 1 the full-window statistics are
+    computed every ``stride`` rows and reused until the next refresh, so
+    a row's window may end up to ``stride - 1`` rows before it.
+    """
+    median = np.full(len(values), np.nan)
+    mad = np.full(len(values), np.nan)
+    if len(values) <= min_history:
+        return median, mad
+    # Row i looks at values[i - window:i]; pad the front so every row has a full window
+    padded = np.concatenate([np.full(window, np.nan), values])
+    windows = sliding_window_view(padded, window)[:len(values)]
+
+    # Rows with a full window of their own group: plain median at every
+    # ``stride``-th row (the anchors), in bounded chunks
+    full = np.flatnonzero(positions >= window)
+    anchor_of = full - (positions[full] - window) % stride
+    anchors = full[anchor_of == full]
+    for start in range(0, len(anchors), ROLLING_CHUNK_ROWS):
+        rows = anchors[start:start + ROLLING_CHUNK_ROWS]
+        chunk = windows[rows]
+        median[rows] = np.median(chunk, axis=1)
+        mad[rows] = np.median(np.abs(chunk - median[rows, None]), axis=1)
+    median[full] = median[anchor_of]
+    mad[full] = mad[anchor_of]
+
+    # Rows early in their group: mask the previous group's values, then nan-median
+    warm = np.flatnonzero((positions >= min_history) & (positions < window))
+    if len(warm):
+        chunk = windows[warm].copy()
+        offsets = np.arange(window)
+        chunk[offsets[None, :] < (window - positions[warm])[:, None]] = np.nan
+        median[warm] = np.nanmedian(chunk, axis=1)
+        mad[warm] = np.nanmedian(np.abs(chunk - median[warm, None]), axis=1)
+    return median, mad
+
+
+class AnomalyDetector:
+    """
+    Scores all of a user's categorized transactions and replaces their
+    stored SpendingAnomaly flags. Uncategorized rows are skipped, since
+    they have no shared "normal" to compare with.
+    """
+    WINDOW = 30
+    MIN_HISTORY = 10
+    # Recompute the window statistics every STRIDE rows of a category
+    STRIDE = 5
+    # Iglewicz-Hoaglin cut-off for the modified z-score
+    THRESHOLD = 3.5
+    # MAD floor: identical payments (rent) would otherwise flag any change
+    MIN_MAD = 1.0
+    MIN_MAD_SHARE = 0.01
+    # Snapshot columns the scoring reads
+    LEDGER_COLUMNS = ('ids', 'cents', 'category_ids')
+
+    def __init__(self, user):
+        self.user = user
+
+    def load(self):
+        """Return an (n, 3) float64 array of id, amount, category_id in (category, date) order."""
+        ledger = get_ledger(self.user.pk, self.LEDGER_COLUMNS)
+        categorized = np.flatnonzero(ledger.category_ids >= 0)
+        # The ledger is in (date, id) order; a stable sort by category keeps it within each category
+        rows = categorized[np.argsort(ledger.category_ids[categorized], kind='stable')]
+        return np.column_stack([ledger.ids[rows], ledger.amounts(rows), ledger.category_ids[rows]]).astype(np.float64)
+
+    def score(self, data):
+        """
+        Return (ids, scores, medians, mads) for the rows whose robust
+        z-score exceeds THRESHOLD.
+        """
+        ids, amounts, categories = data.T
+        # Index of each row within its category run
+        starts = np.flatnonzero(np.r_[True, categories[1:] != categories[:-1]])
+        lengths = np.diff(np.r_[starts, len(categories)])
+        positions = np.arange(len(categories)) - np.repeat(starts, lengths)
+
+        median, mad = rolling_median_mad(amounts, positions, self.WINDOW, self.MIN_HISTORY, self.STRIDE)
+        spread = np.fmax(mad, np.fmax(self.MIN_MAD, self.MIN_MAD_SHARE * np.abs(median)))
+        z = 0.6745 * (amounts - median) / spread
+        flagged = np.flatnonzero(np.abs(z) > self.THRESHOLD)  # NaN (short history) compares False
+        return ids[flagged].astype(np.int64), z[flagged], median[flagged], mad[flagged]
+
+    def run(self):
+        """Re-score the user's history and store the flags; return the stats dict."""
+        started = time.perf_counter()
+        data = self.load()
+        loaded = time.perf_counter()
+        ids, scores, medians, mads = self.score(data)
+        scored = time.perf_counter()
+        anomalies = [
+            SpendingAnomaly(
+                user=self.user,
+                transaction_id=pk,
+                score=round(score, 2),
+                expected_amount=round(median, 2),
+                typical_deviation=round(mad, 2),
+            )
+            for pk, score, median, mad in zip(ids.tolist(), scores.tolist(), medians.tolist(), mads.tolist())
+        ]
+        with transaction.atomic():
+            SpendingAnomaly.objects.filter(user=self.user).delete()
+            SpendingAnomaly.objects.bulk_create(anomalies, batch_size=1000)
+        return {
+            'scanned': len(data),
+            'flagged': len(anomalies),
+            'load_seconds': round(loaded - started, 3),
+            'score_seconds': round(scored - loaded, 3),
+        }
@@ -0,0 +1,91 @@
+"""
+Keyset (seek) pagination over a user's transactions.
+Pages are ordered newest first by (date, created_at, id) and located by
+the last row of the previous page instead of an OFFSET, so page 1,000
+costs the same index seek as page 1.
+"""
+import base64
+import datetime
+
+from django.db.models import Q
+
+from .models import Transaction
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+class TransactionBrowser:
+    """
+    Runs one filtered page query for a user.
+    Only the columns the browser renders are selected, via ``values()``.
+    """
+    DEFAULT_LIMIT = 50
+    COLUMNS = ('id', 'date', 'created_at', 'description', 'amount', 'category_id', 'category__name')
+    ORDERING = ('-date', '-created_at', '-id')
+
+    def __init__(self, user, filters=None):
+        self.user = user
+        self.filters = filters or {}
+
+    def queryset(self):
+        filters = self.filters
+        queryset = Transaction.objects.filter(user=self.user)
+        if filters.get('date_from'):
+            queryset = queryset.filter(date__gte=filters['date_from'])
+        if filters.get('date_to'):
+            queryset = queryset.filter(date__lte=filters['date_to'])
+        if filters.get('uncategorized'):
+            queryset = queryset.filter(category__isnull=True)
+        elif filters.get('category'):
+            queryset = queryset.filter(category=filters['category'])
+        if filters.get('amount_min') is not None:
+            queryset = queryset.filter(amount__gte=filters['amount_min'])
+        if filters.get('amount_max') is not None:
+            queryset = queryset.filter(amount__lte=filters['amount_max'])
+        return queryset.order_by(*self.ORDERING)
+
+    def page(self, cursor=None, limit=None):
+        """Return (rows, next_cursor); next_cursor is None on the last page."""
+        limit = limit or self.DEFAULT_LIMIT
+        # Fetch one extra row to know whether another page exists
+        rows = list(self._page_rows(cursor, limit + 1))
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self.encode_cursor(rows[-1])
+        return rows, next_cursor
+
+    def _page_rows(self, cursor, count):
+        """The first ``count`` rows after ``cursor`` (or from the top), as a queryset."""
+        queryset = self.queryset()
+        if cursor:
+            date, created_at, pk = self.decode_cursor(cursor)
+            # Everything strictly after the cursor row in descending order.
+            # The date__lte bound is implied by the OR below, but only it can
+            # be used as a range on the index (user_id=? AND date<=?).
+            queryset = queryset.filter(date__lte=date).filter(
+                Q(date__lt=date)
+                | Q(date=date, created_at__lt=created_at)
+                | Q(date=date, created_at=created_at, id__lt=pk)
+            )
+        return queryset.values(*self.COLUMNS)[:count]
+
+    @staticmethod
+    def encode_cursor(row):
+        raw = f"{row['date'].isoformat()}|{row['created_at'].isoformat()}|{row['id']}"
+        return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            date, created_at, pk = base64.urlsafe_b64decode(padded).decode('ascii').split('|')
+            return (
+                datetime.date.fromisoformat(date),
+                datetime.datetime.fromisoformat(created_at),
+                int(pk),
+            )
+        except (ValueError, UnicodeDecodeError) as e:
+            raise InvalidCursor("Invalid page cursor.") from e
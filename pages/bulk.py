@@ -0,0 +1,175 @@
+"""
+Bulk recategorization: merge one category into another, reassign every
+transaction whose description contains a text, and undo the last such
+change. Each operation is a fixed number of set-based statements in one
+transaction, never a load-modify-save loop:
+
+  1. record the affected rows' current category and its source (INSERT ... SELECT)
+  2. total them per day and old category (one GROUP BY)
+  3. change them (one UPDATE ... WHERE, with the same WHERE as step 1)
+  4. move those totals between the monthly rollups (``move_in_rollups``)
+
+Only the most recent change per user is kept for undo.
+"""
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min, Sum
+
+from .category_cache import invalidate_user
+from .labels import bump_labels_version
+from .models import BulkCategoryChange, BulkCategoryChangeItem, Category, CategoryRule, Transaction
+from .rollups import move_in_rollups
+
+
+class BulkChangeError(Exception):
+    """Raised when a bulk change cannot be applied or undone."""
+
+
+class CategoryBulkEditor:
+    """Set-based category changes for one user's transactions."""
+
+    def __init__(self, user):
+        self.user = user
+
+    def merge(self, source, target):
+        """Move every transaction and rule of ``source`` to ``target``, then delete ``source``."""
+        if source.user_id != self.user.pk or target.user_id != self.user.pk:
+            raise BulkChangeError("Both categories must be yours.")
+        if source.pk == target.pk:
+            raise BulkChangeError("Pick two different categories to merge.")
+        with transaction.atomic():
+            rule_ids = list(CategoryRule.objects.filter(category=source).values_list('id', flat=True))
+            change = self._apply(
+                Transaction.objects.filter(user=self.user, category=source),
+                target,
+                kind=BulkCategoryChange.KIND_MERGE,
+                summary=f"Merged '{source.name}' into '{target.name}'",
+                source_category_id=source.pk,
+                source_category_name=source.name,
+                moved_rule_ids=rule_ids,
+            )
+            CategoryRule.objects.filter(id__in=rule_ids).update(category=target)
+            # Its transactions and rules have moved, so nothing is lost here
+            source.delete()
+        # QuerySet.update() sends no signals; drop the cached rules ourselves
+        invalidate_user(self.user.pk)
+        return change
+
+    def reassign(self, text, target):
+        """Put every transaction whose description contains ``text`` into ``target``."""
+        text = text.strip()
+        if not text:
+            raise BulkChangeError("Enter some description text to match.")
+        if target.user_id != self.user.pk:
+            raise BulkChangeError("That category is not yours.")
+        queryset = (
+            Transaction.objects
+            .filter(user=self.user, description__icontains=text)
+            .exclude(category=target)
+        )
+        with transaction.atomic():
+            return self._apply(
+                queryset,
+                target,
+                kind=BulkCategoryChange.KIND_REASSIGN,
+                summary=f"Moved transactions matching '{text}' to '{target.name}'",
+            )
+
+    def assign(self, queryset, target, summary):
+        """
+        Put the user's transactions in ``queryset`` into ``target`` (None
+        clears their category). Rows of other users are left alone.
+        """
+        if target is not None and target.user_id != self.user.pk:
+            raise BulkChangeError("That category is not yours.")
+        queryset = queryset.filter(user=self.user)
+        queryset = queryset.exclude(category=target) if target else queryset.exclude(category=None)
+        with transaction.atomic():
+            return self._apply(queryset, target, kind=BulkCategoryChange.KIND_REASSIGN, summary=summary)
+
+    def last_change(self):
+        return BulkCategoryChange.objects.filter(user=self.user).first()
+
+    def undo(self):
+        """Restore the categories changed by the user's last bulk change; return that change."""
+        change = self.last_change()
+        if change is None:
+            raise BulkChangeError("There is nothing to undo.")
+        with transaction.atomic():
+            if change.kind == BulkCategoryChange.KIND_MERGE:
+                self._restore_merged_category(change)
+            items = BulkCategoryChangeItem.objects.filter(change=change)
+            missing = items.exclude(previous_category_id=None).exclude(
+                previous_category_id__in=Category.objects.filter(user=self.user).values('id')
+            )
+            if missing.exists():
+                raise BulkChangeError("Some of the original categories have since been deleted.")
+            moves = self._totals(
+                items, 'transaction__amount', 'transaction__date', 'transaction__category_id', 'previous_category_id'
+            )
+            # One UPDATE per previous category and source (a merge has few)
+            previous = items.order_by().values_list('previous_category_id', 'previous_category_source').distinct()
+            for previous_id, previous_source in list(previous):
+                Transaction.objects.filter(
+                    id__in=items.filter(
+                        previous_category_id=previous_id, previous_category_source=previous_source
+                    ).values('transaction_id')
+                ).update(category_id=previous_id, category_source=previous_source)
+            move_in_rollups(self.user.pk, moves)
+            bump_labels_version(self.user.pk)
+            # The items go with it in one fast DELETE (no signals or dependents)
+            change.delete()
+        invalidate_user(self.user.pk)
+        return change
+
+    def _apply(self, queryset, target, **change_fields):
+        """Log and move the rows of ``queryset`` to ``target``; return the change record."""
+        # Only one change is kept for undo
+        BulkCategoryChange.objects.filter(user=self.user).delete()
+        change = BulkCategoryChange.objects.create(user=self.user, target_category=target, **change_fields)
+        change.rows = self._record_items(change, queryset)
+        target_id = target.pk if target else None
+        moves = [
+            (date, from_id, target_id, *stats)
+            for date, from_id, *stats in self._totals(queryset, 'amount', 'date', 'category_id')
+        ]
+        # The same WHERE as the log: inside this transaction no other writer
+        # can change which rows match (SQLite holds the write lock). A bulk
+        # change is the user's own decision, so the rows become labels.
+        queryset.update(category=target, category_source=Transaction.SOURCE_MANUAL)
+        move_in_rollups(self.user.pk, moves)
+        bump_labels_version(self.user.pk)
+        change.save(update_fields=['rows'])
+        return change
+
+    @staticmethod
+    def _record_items(change, queryset):
+        """Copy id, category_id and category_source of each row in ``queryset`` to the change log; return the count."""
+        select_sql, params = (
+            queryset.order_by().values_list('id', 'category_id', 'category_source').query.sql_with_params()
+        )
+        item_table = connection.ops.quote_name(BulkCategoryChangeItem._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {item_table} (change_id, transaction_id, previous_category_id, previous_category_source) "
+                f"SELECT %s, picked.id, picked.category_id, picked.category_source FROM ({select_sql}) picked",
+                (change.pk, *params)
+            )
+            return cursor.rowcount
+
+    @staticmethod
+    def _totals(queryset, amount, *columns):
+        """``columns`` of each group of ``queryset`` followed by the sum, count, min and max of ``amount``."""
+        return list(
+            queryset.order_by().values_list(*columns).annotate(Sum(amount), Count('pk'), Min(amount), Max(amount))
+        )
+
+    def _restore_merged_category(self, change):
+        """Recreate the merged-away category under its old id and give its rules back."""
+        if Category.objects.filter(user=self.user, name=change.source_category_name).exists():
+            raise BulkChangeError(
+                f"A category named '{change.source_category_name}' exists again; rename it before undoing."
+            )
+        Category.objects.create(id=change.source_category_id, user=self.user, name=change.source_category_name)
+        CategoryRule.objects.filter(id__in=change.moved_rule_ids, user=self.user).update(
+            category_id=change.source_category_id
+        )
@@ -0,0 +1,178 @@
+"""
+Rule-based categorization engine for AI Sorting (UC 4.1).
+A user's keyword and merchant-pattern rules are compiled into a single
+regular expression, so each description is matched in one pass no
+matter how many rules exist. Assignments are written back in chunks.
+"""
+import re
+from collections import OrderedDict, defaultdict
+
+from django.db import transaction
+
+from .category_cache import user_categories, user_rules
+from .models import CategoryRule, Transaction
+from .rollups import month_start, refresh_monthly_rollups
+
+
+def write_assignments(user, assignments, months, source, chunk_size=500):
+    """
+    Apply {category_id: [transaction ids]} with one UPDATE per category
+    chunk, recording ``source`` (a ``Transaction.SOURCE_*``) as who assigned
+    them, then refresh the rollups of the affected months. Rows that were
+    categorized by hand in the meantime are left alone. The labels version
+    is not bumped: the ML model does not learn from these assignments.
+    Returns the number of rows updated.
+    """
+    updated = 0
+    with transaction.atomic():
+        for category_id, ids in assignments.items():
+            for start in range(0, len(ids), chunk_size):
+                updated += Transaction.objects.filter(
+                    pk__in=ids[start:start + chunk_size],
+                    category__isnull=True
+                ).update(category_id=category_id, category_source=source)
+        if updated:
+            refresh_monthly_rollups(user.pk, months)
+    return updated
+
+
+class CompiledRuleSet:
+    """
+    All of a user's rules combined into one alternation.
+    Each rule becomes a capturing group; the group that matched tells us
+    the category. The earliest match in the description wins, and at the
+    same position the higher-priority (then longer) rule wins.
+    """
+
+    def __init__(self, rules):
+        """
+        ``rules`` is an iterable of (regex source, category_id) pairs, best
+        first. A source that does not compile inside its group (e.g. a
+        global flag saved before rules were checked for it) is skipped.
+        """
+        parts = []
+        category_for_name = {}
+        for index, (source, category_id) in enumerate(rules):
+            name = f'_rule{index}'
+            part = f'(?P<{name}>{source})'
+            try:
+                re.compile(part)
+            except re.error:
+                continue
+            parts.append(part)
+            category_for_name[name] = category_id
+
+        self.size = len(parts)
+        if not parts:
+            self._regex = None
+            self._category_for_group = {}
+            return
+        self._regex = re.compile('|'.join(parts), re.IGNORECASE)
+        # Rule patterns may contain groups of their own; the outer rule group
+        # always closes last, so ``lastindex`` points at it.
+        self._category_for_group = {
+            self._regex.groupindex[name]: category_id
+            for name, category_id in category_for_name.items()
+        }
+
+    def match(self, description):
+        """Return the category id for ``description`` or None."""
+        if self._regex is None:
+            return None
+        found = self._regex.search(description)
+        if found is None:
+            return None
+        return self._category_for_group[found.lastindex]
+
+    @staticmethod
+    def keyword_source(keyword):
+        """Regex for a plain keyword, bounded so 'shell' does not hit 'shellfish'."""
+        source = re.escape(keyword.strip())
+        if re.match(r'\w', keyword.strip()):
+            source = r'\b' + source
+        if re.search(r'\w$', keyword.strip()):
+            source += r'\b'
+        return source
+
+
+class RuleCategorizer:
+    """
+    Assigns categories to a user's uncategorized transactions.
+    Rules and categories come from the category cache; compiled rule sets
+    are kept in a small process-level LRU and rebuilt only when either
+    of them changes.
+    """
+    CHUNK_SIZE = 500
+    FETCH_SIZE = 5000
+    CACHE_SIZE = 128
+
+    _cache = OrderedDict()
+
+    def __init__(self, user):
+        self.user = user
+
+    def get_ruleset(self):
+        """Return the user's compiled rules, compiling only if they changed."""
+        rules = user_rules(self.user.pk)
+        categories = [(c['name'], c['id']) for c in user_categories(self.user.pk)]
+        signature = (tuple(rules), tuple(categories))
+
+        cached = self._cache.get(self.user.pk)
+        if cached is not None and cached[0] == signature:
+            self._cache.move_to_end(self.user.pk)
+            return cached[1]
+
+        ruleset = CompiledRuleSet(self._rule_sources(rules, categories))
+        self._cache[self.user.pk] = (signature, ruleset)
+        self._cache.move_to_end(self.user.pk)
+        while len(self._cache) > self.CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return ruleset
+
+    def _rule_sources(self, rules, categories):
+        """Explicit rules by priority, then category names as fallback keywords."""
+        sources = []
+        # Higher priority first, longer patterns first within a priority
+        ordered = sorted(rules, key=lambda r: (-r[3], -len(r[0])))
+        for pattern, match_type, category_id, _ in ordered:
+            if match_type == CategoryRule.MATCH_PATTERN:
+                if CategoryRule.pattern_error(pattern):
+                    continue  # Skip a broken pattern rather than the whole rule set
+                sources.append((pattern, category_id))
+            else:
+                sources.append((CompiledRuleSet.keyword_source(pattern), category_id))
+
+        # Longer names first so "Coffee Shops" beats "Coffee"
+        for name, category_id in sorted(categories, key=lambda c: -len(c[0])):
+            sources.append((CompiledRuleSet.keyword_source(name), category_id))
+        return sources
+
+    def run(self):
+        """Categorize every uncategorized transaction; return the stats dict."""
+        ruleset = self.get_ruleset()
+        stats = {'scanned': 0, 'categorized': 0, 'rules': ruleset.size}
+        if not ruleset.size:
+            return stats
+
+        # Collect assignments first; writing while the read cursor is open
+        # would change the very rows it is iterating over.
+        assignments = defaultdict(list)
+        months = set()
+        pending = (
+            Transaction.objects
+            .filter(user=self.user, category__isnull=True)
+            .order_by('id')  # Served by txn_uncategorized_idx without a sort
+            .values_list('id', 'description', 'date')
+            .iterator(chunk_size=self.FETCH_SIZE)
+        )
+        for pk, description, date in pending:
+            stats['scanned'] += 1
+            category_id = ruleset.match(description)
+            if category_id is not None:
+                assignments[category_id].append(pk)
+                months.add(month_start(date))
+
+        stats['categorized'] = write_assignments(
+            self.user, assignments, months, Transaction.SOURCE_RULE, self.CHUNK_SIZE
+        )
+        return stats
@@ -0,0 +1,88 @@
+"""
+Versioned cache for category metadata.
+Each user's categories and categorization rules, and the global list of
+default category names, are read once and then served from Django's
+cache. Entries are keyed by a version number; signals bump the version
+on any save or delete, so stale entries are simply never read again.
+
+The default backend is per-process (locmem). Entries also expire after
+``CATEGORY_CACHE_TIMEOUT`` seconds, which bounds staleness when several
+processes each hold their own copy; configure a shared backend (e.g.
+Redis) to invalidate across processes immediately.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Category, CategoryRule, DefaultCategory
+
+DEFAULTS_SCOPE = 'defaults'
+
+
+def _timeout():
+    return getattr(settings, 'CATEGORY_CACHE_TIMEOUT', 300)
+
+
+def _version(scope):
+    key = f"categories:{scope}:version"
+    version = cache.get(key)
+    if version is None:
+        # A fresh, unique version: never matches an entry written before eviction
+        version = time.time_ns()
+        cache.add(key, version, None)
+        version = cache.get(key, version)
+    return version
+
+
+def _cached(scope, name, load):
+    key = f"categories:{scope}:{_version(scope)}:{name}"
+    value = cache.get(key)
+    if value is None:
+        value = load()
+        cache.set(key, value, _timeout())
+    return value
+
+
+def _bump_version(scope):
+    """
+    Invalidate every entry of ``scope``: now, for readers inside the
+    current transaction, and again on commit, in case another request
+    re-cached the pre-commit data in between.
+    """
+    def bump():
+        cache.set(f"categories:{scope}:version", time.time_ns(), None)
+    bump()
+    transaction.on_commit(bump)
+
+
+def invalidate_user(user_id):
+    _bump_version(f"user:{user_id}")
+
+
+def invalidate_defaults():
+    _bump_version(DEFAULTS_SCOPE)
+
+
+def user_categories(user_id):
+    """The user's categories as [{'id', 'name'}], ordered by name."""
+    return _cached(f"user:{user_id}", 'categories', lambda: list(
+        Category.objects.filter(user_id=user_id).order_by('name').values('id', 'name')
+    ))
+
+
+def user_rules(user_id):
+    """The user's rules as (pattern, match_type, category_id, priority) tuples, best first."""
+    return _cached(f"user:{user_id}", 'rules', lambda: list(
+        CategoryRule.objects.filter(user_id=user_id)
+        .order_by('-priority', 'id')
+        .values_list('pattern', 'match_type', 'category_id', 'priority')
+    ))
+
+
+def default_category_names():
+    """Names of the admin-managed default categories, ordered by name."""
+    return _cached(DEFAULTS_SCOPE, 'names', lambda: list(
+        DefaultCategory.objects.order_by('name').values_list('name', flat=True)
+    ))
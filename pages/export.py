@@ -0,0 +1,70 @@
+"""
+Streaming export of a user's transactions as CSV or NDJSON.
+Rows are read with a server-side iterator and written out in ~64 KB
+pieces, so memory stays flat and the first bytes go out immediately
+however many transactions the user has.
+"""
+import csv
+import io
+import json
+
+
+class TransactionExporter:
+    """
+    Serializes a Transaction queryset.
+    CSV uses the importer's Date/Description/Amount/Notes layout plus a
+    Category column, so an export can be uploaded again as-is.
+    """
+    FORMATS = {
+        'csv': ('text/csv', 'csv'),
+        'ndjson': ('application/x-ndjson', 'ndjson'),
+    }
+    HEADER = ['Date', 'Description', 'Amount', 'Notes', 'Category']
+    # Only the exported columns are fetched; the category name comes from the same join
+    COLUMNS = ('date', 'description', 'amount', 'notes', 'category__name')
+    CHUNK_SIZE = 2000
+    FLUSH_BYTES = 64 * 1024
+
+    def __init__(self, queryset, chunk_size=None):
+        self.queryset = queryset
+        self.chunk_size = chunk_size or self.CHUNK_SIZE
+
+    def rows(self):
+        return self.queryset.values_list(*self.COLUMNS).iterator(chunk_size=self.chunk_size)
+
+    def stream(self, fmt):
+        """Yield the export in ``fmt`` ('csv' or 'ndjson') as text pieces."""
+        return self.csv() if fmt == 'csv' else self.ndjson()
+
+    def csv(self):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self.HEADER)
+        yield self._drain(buffer)  # Header first, before the query runs
+        for date, description, amount, notes, category in self.rows():
+            writer.writerow([date.isoformat(), description, amount, notes or '', category or ''])
+            if buffer.tell() >= self.FLUSH_BYTES:
+                yield self._drain(buffer)
+        yield self._drain(buffer)
+
+    def ndjson(self):
+        buffer = io.StringIO()
+        for date, description, amount, notes, category in self.rows():
+            buffer.write(json.dumps({
+                'date': date.isoformat(),
+                'description': description,
+                'amount': str(amount),
+                'notes': notes,
+                'category': category,
+            }))
+            buffer.write('\n')
+            if buffer.tell() >= self.FLUSH_BYTES:
+                yield self._drain(buffer)
+        yield self._drain(buffer)
+
+    @staticmethod
+    def _drain(buffer):
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
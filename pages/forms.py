@@ -4,23 +4,51 @@ Handles file uploads and validation for transaction imports.
 """
 from django import forms
 import os
+import zipfile
+
+from .jobs import zip_csv_members
+from .models import Category
+
+
+class MultipleFileInput(forms.FileInput):
+    allow_multiple_selected = True
+
+
+class MultipleFileField(forms.FileField):
+    """FileField that accepts several files and cleans to a list."""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('widget', MultipleFileInput())
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        single_file_clean = super().clean
+        if isinstance(data, (list, tuple)):
+            return [single_file_clean(d, initial) for d in data]
+        return [single_file_clean(data, initial)]
 
 
 class TransactionUploadForm(forms.Form):
     """
     Form for uploading CSV transaction files.
+    Accepts several .csv files and/or .zip archives of them at once.
     Provides user-friendly error messages for unsupported file types.
     """
-    file = forms.FileField(
-        label="Select CSV File",
-        help_text="Upload a .csv file with columns: Date, Description, Amount, Notes",
-        widget=forms.FileInput(attrs={
-            'accept': '.csv',
+    file = MultipleFileField(
+        label="Select CSV Files",
+        help_text="Upload .csv files (or a .zip of them) with columns: Date, Description, Amount, Notes",
+        widget=MultipleFileInput(attrs={
+            'accept': '.csv,.zip',
             'class': 'form-control',
             'id': 'csv-file-input'
         })
     )
     
+    # Statements per upload, counting the CSV files inside archives
+    MAX_FILES = 50
+    # Uncompressed size limit for the CSV files inside one archive
+    MAX_ZIP_UNCOMPRESSED_BYTES = 200 * 1024 * 1024
+    
     # Mapping of file extensions to helpful error messages with icon classes
     FILE_TYPE_ERRORS = {
         '.xlsx': ("Excel file detected! Please save as CSV from Excel: File → Save As → CSV (Comma delimited)", "fa-file-excel", "excel"),
@@ -33,21 +61,42 @@ class TransactionUploadForm(forms.Form):
     
     def clean_file(self):
         """
-        Validate that the uploaded file is a CSV.
+        Validate that every uploaded file is a CSV or a ZIP of CSVs.
         Provides specific, helpful error messages for common file types.
         """
-        uploaded_file = self.cleaned_data.get('file')
+        uploaded_files = self.cleaned_data.get('file')
         
-        if not uploaded_file:
+        if not uploaded_files:
             raise forms.ValidationError("Please select a file to upload.")
         
+        statements = 0
+        for uploaded_file in uploaded_files:
+            statements += self._check_file(uploaded_file)
+        
+        if statements > self.MAX_FILES:
+            raise forms.ValidationError(
+                f"Too many files: {statements} CSV files were uploaded, the limit is {self.MAX_FILES} per upload.",
+                code='too_many'
+            )
+        return uploaded_files
+    
+    def _check_file(self, uploaded_file):
+        """Validate one file; return how many CSV statements it holds."""
+        # Refused while it was being received (see pages/uploads.py)
+        upload_error = getattr(uploaded_file, 'upload_error', None)
+        if upload_error is not None:
+            raise upload_error
+        
         # Get file extension
         file_name = uploaded_file.name
         _, file_extension = os.path.splitext(file_name.lower())
         
         # Check for valid CSV
         if file_extension == '.csv':
-            return uploaded_file
+            return 1
+        
+        if file_extension == '.zip':
+            return self._check_zip(uploaded_file)
         
         # Provide helpful error message for known file types
         if file_extension in self.FILE_TYPE_ERRORS:
@@ -56,6 +105,50 @@ class TransactionUploadForm(forms.Form):
         
         # Generic error for unknown types
         raise forms.ValidationError(
-            f"Unsupported file format '{file_extension}'. Please upload a .csv file.",
+            f"Unsupported file format '{file_extension}'. Please upload a .csv or .zip file.",
             code='unsupported'
         )
+    
+    def _check_zip(self, uploaded_file):
+        """Validate an archive without extracting it; return its CSV count."""
+        try:
+            with zipfile.ZipFile(uploaded_file) as archive:
+                members = zip_csv_members(archive)
+        except (zipfile.BadZipFile, OSError):
+            raise forms.ValidationError(
+                f"'{uploaded_file.name}' is not a valid ZIP archive.", code='bad_zip'
+            )
+        finally:
+            uploaded_file.seek(0)
+        
+        if not members:
+            raise forms.ValidationError(
+                f"'{uploaded_file.name}' does not contain any .csv files.", code='empty_zip'
+            )
+        if sum(info.file_size for info in members) > self.MAX_ZIP_UNCOMPRESSED_BYTES:
+            raise forms.ValidationError(
+                f"'{uploaded_file.name}' is too large once extracted "
+                f"(limit {self.MAX_ZIP_UNCOMPRESSED_BYTES // (1024 * 1024)} MB).",
+                code='zip_too_large'
+            )
+        return len(members)
+
+
+class TransactionFilterForm(forms.Form):
+    """
+    Filters for the transaction browser and its JSON endpoint.
+    All fields are optional; ``cursor`` is the opaque keyset position
+    returned with the previous page.
+    """
+    date_from = forms.DateField(required=False)
+    date_to = forms.DateField(required=False)
+    category = forms.ModelChoiceField(queryset=None, required=False, empty_label="All categories")
+    amount_min = forms.DecimalField(required=False, max_digits=10, decimal_places=2)
+    amount_max = forms.DecimalField(required=False, max_digits=10, decimal_places=2)
+    uncategorized = forms.BooleanField(required=False, label="Uncategorized only")
+    limit = forms.IntegerField(required=False, min_value=1, max_value=200)
+    cursor = forms.CharField(required=False)
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['category'].queryset = Category.objects.filter(user=user).order_by('name')
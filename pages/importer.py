@@ -0,0 +1,121 @@
+"""
+Streaming CSV import pipeline for transactions (UC 3.1).
+Decodes the upload chunk by chunk, validates one row at a time and
+writes transactions in fixed-size batches so memory stays flat.
+Parsing lives in pages/parsers.py; this module does the database side.
+"""
+from .merchants import MerchantResolver
+from .models import ImportBatch, Transaction
+from .parsers import CSVHeaderError, CSVRowParser  # noqa: F401 (CSVHeaderError re-exported)
+from .recurring import refresh_recurring_series
+from .rollups import month_start, refresh_monthly_rollups
+
+
+class TransactionImporter:
+    """
+    Imports transactions from an uploaded CSV file for a single user.
+    Rows are streamed from ``UploadedFile.chunks()`` and flushed to the
+    database with ``bulk_create`` every ``batch_size`` valid rows.
+    Rows whose fingerprint the user already has are skipped as duplicates,
+    and each new row is linked to its canonical Merchant and, if given,
+    its ImportBatch. Rejected rows are counted; only the first
+    ``max_error_samples`` messages are kept.
+    """
+    # Required CSV headers (case-insensitive matching)
+    REQUIRED_HEADERS = CSVRowParser.REQUIRED_HEADERS
+    OPTIONAL_HEADERS = CSVRowParser.OPTIONAL_HEADERS
+
+    BATCH_SIZE = 1000
+    MAX_ERROR_SAMPLES = ImportBatch.MAX_ERROR_SAMPLES
+
+    def __init__(self, user, batch_size=None, on_progress=None, import_batch=None, max_error_samples=None):
+        self.user = user
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.on_progress = on_progress
+        self.import_batch = import_batch
+        self.max_error_samples = self.MAX_ERROR_SAMPLES if max_error_samples is None else max_error_samples
+        self._merchants = MerchantResolver()
+        self.touched_months = set()
+        self.touched_merchants = set()
+        self.stats = {
+            'total_rows': 0,
+            'successful': 0,
+            'duplicates': 0,
+            'rejected': 0,
+            'errors': [],
+            'processed': False
+        }
+        self.parser = CSVRowParser(user.pk, stats=self.stats, max_error_samples=self.max_error_samples)
+
+    def run(self, uploaded_file):
+        """Parse ``uploaded_file`` in this process and import it; return the stats dict."""
+        return self.write(self.parser.parse(uploaded_file.chunks()))
+
+    def write(self, rows):
+        """
+        Import parsed rows (see ``CSVRowParser``) and return the stats dict.
+        Each batch is committed on its own so progress is visible to
+        other connections (e.g. the import status endpoint) as it happens.
+        """
+        pending = []
+        try:
+            for row in rows:
+                pending.append(self._build_transaction(row))
+                if len(pending) >= self.batch_size:
+                    self._flush(pending)
+                    pending = []
+            self._flush(pending)
+        finally:
+            # Keep the dashboard rollups and recurring series in step with whatever was committed
+            refresh_monthly_rollups(self.user.pk, self.touched_months)
+            refresh_recurring_series(self.user.pk, self.touched_merchants)
+        self.stats['processed'] = True
+        self._report_progress()
+        return self.stats
+
+    def _build_transaction(self, row):
+        """Return an unsaved Transaction for one parsed row."""
+        date, description, amount, notes, fingerprint = row
+        return Transaction(
+            user=self.user,
+            date=date,
+            description=description,
+            amount=amount,
+            notes=notes,
+            import_batch=self.import_batch,
+            fingerprint=fingerprint
+        )
+
+    def _flush(self, pending):
+        """Write one batch of transactions, skipping rows already imported."""
+        if not pending:
+            return
+        # One set-based lookup per batch instead of a query per row
+        known = Transaction.objects.filter(
+            user=self.user,
+            fingerprint__in=[t.fingerprint for t in pending]
+        ).values_list('fingerprint', 'import_batch_id', 'date', 'merchant_id')
+        known_fingerprints = set()
+        for fingerprint, import_batch_id, date, merchant_id in known:
+            known_fingerprints.add(fingerprint)
+            if self.import_batch is not None and import_batch_id == self.import_batch.pk:
+                # Committed by an earlier, interrupted run of this batch (a requeued job):
+                # its rollups and series may never have been refreshed
+                self.touched_months.add(month_start(date))
+                self.touched_merchants.add(merchant_id)
+        new = [t for t in pending if t.fingerprint not in known_fingerprints]
+        merchant_ids = self._merchants.resolve_many({t.description for t in new})
+        for txn in new:
+            txn.merchant_id = merchant_ids[txn.description]
+        # ignore_conflicts covers a concurrent import of the same rows
+        Transaction.objects.bulk_create(new, ignore_conflicts=True)
+        self.touched_months.update(month_start(t.date) for t in new)
+        self.touched_merchants.update(t.merchant_id for t in new)
+        self.stats['successful'] += len(new)
+        self.stats['duplicates'] += len(pending) - len(new)
+        self._report_progress()
+
+    def _report_progress(self):
+        """Hand the running stats to the progress callback, if any."""
+        if self.on_progress is not None:
+            self.on_progress(self.stats)
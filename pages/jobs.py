@@ -0,0 +1,340 @@
+"""
+Database-backed queue for background CSV imports.
+An upload becomes one ``ImportBatch`` with an ``ImportJob`` per CSV file
+(ZIP archives are expanded into their CSV members). The
+``process_imports`` management command claims pending jobs and runs
+them through the importer; with several workers, files are parsed in a
+process pool while this process does the inserts.
+"""
+import datetime
+import logging
+import multiprocessing
+import os
+import queue
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .importer import TransactionImporter, CSVHeaderError
+from .models import ImportBatch, ImportJob
+from .parsers import parse_csv_file
+
+logger = logging.getLogger(__name__)
+
+
+def zip_csv_members(archive):
+    """Return the ZipInfo of every CSV file in an open ZipFile, skipping folders and OS metadata."""
+    return [
+        info for info in archive.infolist()
+        if not info.is_dir()
+        and info.filename.lower().endswith('.csv')
+        and not os.path.basename(info.filename).startswith('.')
+        and not info.filename.startswith('__MACOSX/')
+    ]
+
+
+def enqueue_upload(user, uploaded_files):
+    """
+    Queue uploaded CSV and ZIP files as one ImportBatch; return the batch.
+    The files, and the CSVs inside ZIPs, are written to storage before the
+    transaction: SQLite holds its write lock until commit, and extracting
+    a large archive inside it would block every other writer. All jobs are
+    then created in one transaction so no worker can see (and finish) the
+    batch before every file is queued. Stored files are removed again if
+    anything fails.
+    """
+    stored = []
+    try:
+        for uploaded_file in uploaded_files:
+            if uploaded_file.name.lower().endswith('.zip'):
+                with zipfile.ZipFile(uploaded_file) as archive:
+                    for info in zip_csv_members(archive):
+                        name = os.path.basename(info.filename)
+                        with archive.open(info) as member:
+                            stored.append((_store(File(member, name=name)), f"{uploaded_file.name}/{name}"))
+            else:
+                stored.append((_store(uploaded_file), uploaded_file.name))
+        with transaction.atomic():
+            batch = ImportBatch.objects.create(user=user)
+            for stored_name, original_name in stored:
+                _create_job(batch, stored_name, original_name)
+    except Exception:
+        storage = ImportJob._meta.get_field('file').storage
+        for stored_name, _ in stored:
+            storage.delete(stored_name)
+        raise
+    return batch
+
+
+def _store(file):
+    """Save ``file`` where ``ImportJob.file`` keeps its files; return the stored name."""
+    field = ImportJob._meta.get_field('file')
+    return field.storage.save(field.generate_filename(None, file.name), file, max_length=field.max_length)
+
+
+def _create_job(batch, stored_name, original_name):
+    return ImportJob.objects.create(
+        user=batch.user,
+        batch=batch,
+        file=stored_name,
+        original_name=original_name[:255]
+    )
+
+
+class ImportJobRunner:
+    """
+    Claims and processes queued import jobs.
+    Claiming is a conditional UPDATE on the status column, so several
+    workers can poll the same table without processing a job twice.
+    With ``workers`` > 1, CSV parsing and validation run in a
+    ProcessPoolExecutor and the parsed rows are inserted here in batches;
+    SQLite takes one writer at a time, so the inserts stay in one process.
+    Rows come back through a bounded queue per file as they are parsed,
+    so no whole file is held in memory on either side.
+
+    A worker marks its running jobs with a heartbeat as it goes. A job
+    whose heartbeat is older than ``IMPORT_JOB_TIMEOUT`` has lost its
+    worker (killed, out of memory) and is put back in the queue, or
+    failed after ``ImportJob.MAX_ATTEMPTS`` claims so that its batch
+    still finishes. Rows it had already committed come back as
+    duplicates on the retry.
+    """
+    # Seconds between heartbeats for jobs parsing in the process pool
+    HEARTBEAT_INTERVAL = 30
+    # Parsed chunks (of parse_csv_file's rows_per_put rows) a file may get ahead of the inserts
+    QUEUED_CHUNKS = 8
+
+    def __init__(self, workers=1):
+        self.workers = max(1, workers)
+        self.timeout = datetime.timedelta(seconds=getattr(settings, 'IMPORT_JOB_TIMEOUT', 15 * 60))
+
+    def claim_next(self):
+        """Mark the oldest pending job as running and return it, or None."""
+        while True:
+            job = (
+                ImportJob.objects
+                .filter(status=ImportJob.STATUS_PENDING)
+                .order_by('created_at', 'id')
+                .first()
+            )
+            if job is None:
+                return None
+            now = timezone.now()
+            claimed = ImportJob.objects.filter(
+                pk=job.pk, status=ImportJob.STATUS_PENDING
+            ).update(
+                status=ImportJob.STATUS_RUNNING,
+                started_at=now,
+                heartbeat_at=now,
+                attempts=F('attempts') + 1,
+            )
+            if claimed:
+                job.refresh_from_db()
+                return job
+            # Another worker got there first; try the next one
+
+    def recover_stale(self):
+        """Requeue (or fail, after too many attempts) running jobs whose worker has gone; return how many."""
+        cutoff = timezone.now() - self.timeout
+        stale = ImportJob.objects.filter(status=ImportJob.STATUS_RUNNING, heartbeat_at__lt=cutoff)
+        recovered = 0
+        for job in stale.order_by('id'):
+            # Conditional, like claiming: only one worker recovers each job
+            still_stale = ImportJob.objects.filter(
+                pk=job.pk, status=ImportJob.STATUS_RUNNING, heartbeat_at__lt=cutoff
+            )
+            if job.attempts < ImportJob.MAX_ATTEMPTS:
+                if still_stale.update(
+                    status=ImportJob.STATUS_PENDING,
+                    rows_parsed=0, rows_inserted=0, rows_rejected=0, rows_duplicate=0,
+                ):
+                    logger.warning("Import job %s lost its worker; requeued", job.pk)
+                    recovered += 1
+            elif still_stale.update(heartbeat_at=timezone.now()):
+                logger.warning("Import job %s lost its worker %s times; failing it", job.pk, job.attempts)
+                job.message = "The import stopped unexpectedly several times. Please try a smaller file."
+                self._finish(job, {
+                    'total_rows': job.rows_parsed,
+                    'successful': job.rows_inserted,
+                    'rejected': job.rows_rejected,
+                    'duplicates': job.rows_duplicate,
+                    'errors': job.errors,
+                }, ImportJob.STATUS_FAILED)
+                recovered += 1
+        return recovered
+
+    @staticmethod
+    def heartbeat(*job_ids):
+        ImportJob.objects.filter(pk__in=job_ids).update(heartbeat_at=timezone.now())
+
+    def process(self, job):
+        """Parse and import a claimed job in this process."""
+        def load(importer):
+            with job.file.open('rb') as uploaded_file:
+                return importer.run(uploaded_file)
+        return self._import(job, load)
+
+    def run_pending(self):
+        """Process every job currently in the queue; return how many ran."""
+        self.recover_stale()
+        if self.workers > 1:
+            return self._run_parallel()
+        processed = 0
+        while True:
+            job = self.claim_next()
+            if job is None:
+                return processed
+            self.process(job)
+            processed += 1
+
+    def _run_parallel(self):
+        processed = 0
+        # future -> (job, queue of its parsed rows), in the order submitted
+        in_flight = {}
+        self._last_beat = time.monotonic()
+        with multiprocessing.Manager() as manager, ProcessPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                # Keep a file queued behind each worker so none idles while rows are inserted
+                while len(in_flight) < self.workers * 2:
+                    job = self.claim_next()
+                    if job is None:
+                        break
+                    try:
+                        path = job.file.path
+                    except NotImplementedError:
+                        # Storage without local paths: parse here instead
+                        self.process(job)
+                        processed += 1
+                        continue
+                    rows = manager.Queue(self.QUEUED_CHUNKS)
+                    future = pool.submit(parse_csv_file, path, job.user_id, rows, ImportBatch.MAX_ERROR_SAMPLES)
+                    in_flight[future] = job, rows
+                if not in_flight:
+                    return processed
+                # The pool starts files in this order, so the oldest is always
+                # being parsed; the others parse ahead until their queues fill
+                future = next(iter(in_flight))
+                job, rows = in_flight[future]
+                self._import(job, self._queued_loader(future, rows, in_flight))
+                del in_flight[future]
+                processed += 1
+
+    def _queued_loader(self, future, rows, in_flight):
+        def received(importer):
+            while True:
+                chunk, stats = self._next_chunk(future, rows)
+                self._keep_alive(in_flight)
+                if stats is not None:
+                    importer.stats.update(stats)
+                if chunk is None:
+                    # Raises whatever stopped the parse
+                    future.result()
+                    return
+                yield from chunk
+
+        def load(importer):
+            chunks = received(importer)
+            try:
+                return importer.write(chunks)
+            finally:
+                if chunks.gi_frame is not None:
+                    # The inserts stopped early; let the worker run to the end instead of blocking on a full queue
+                    chunks.close()
+                    while not future.done() or not rows.empty():
+                        try:
+                            if rows.get(timeout=1)[0] is None:
+                                break
+                        except queue.Empty:
+                            pass
+        return load
+
+    def _next_chunk(self, future, rows):
+        """The next (rows, stats) from a parsing worker; ([], None) if none came within the heartbeat interval."""
+        try:
+            return rows.get(timeout=self.HEARTBEAT_INTERVAL)
+        except queue.Empty:
+            if not future.done():
+                return [], None
+        try:
+            # The worker may have finished just after the wait timed out
+            return rows.get_nowait()
+        except queue.Empty:
+            future.result()
+            raise RuntimeError("The parser stopped before the end of the file.")
+
+    def _keep_alive(self, in_flight):
+        """Heartbeat every in-flight job (parsing, queued or inserting) once per interval."""
+        if time.monotonic() - self._last_beat >= self.HEARTBEAT_INTERVAL:
+            self.heartbeat(*(job.pk for job, _ in in_flight.values()))
+            self._last_beat = time.monotonic()
+
+    def _import(self, job, load):
+        """Run ``load(importer)`` for a claimed job, recording the outcome on the row."""
+        def save_progress(stats):
+            ImportJob.objects.filter(pk=job.pk).update(
+                rows_parsed=stats['total_rows'],
+                rows_inserted=stats['successful'],
+                rows_rejected=stats['rejected'],
+                rows_duplicate=stats['duplicates'],
+                heartbeat_at=timezone.now(),
+            )
+
+        importer = TransactionImporter(job.user, on_progress=save_progress, import_batch=job.batch)
+        try:
+            stats = load(importer)
+        except CSVHeaderError as e:
+            self._fail(job, importer, str(e))
+            return job
+        except UnicodeDecodeError:
+            self._fail(job, importer, "Unable to read file. Please ensure it's saved as UTF-8 encoded CSV.")
+            return job
+        except Exception as e:
+            logger.exception("Import job %s failed", job.pk)
+            self._fail(job, importer, f"An error occurred while processing: {str(e)}")
+            return job
+
+        self._finish(job, stats, ImportJob.STATUS_DONE)
+        # The upload is no longer needed once its rows are in the database
+        job.file.delete(save=False)
+        return job
+
+    def _fail(self, job, importer, message):
+        job.message = message
+        self._finish(job, importer.stats, ImportJob.STATUS_FAILED)
+
+    def _finish(self, job, stats, status):
+        """Record the job's final counters and fold them into its batch."""
+        job.rows_parsed = stats['total_rows']
+        job.rows_inserted = stats['successful']
+        job.rows_rejected = stats['rejected']
+        job.rows_duplicate = stats['duplicates']
+        job.errors = stats['errors']
+        job.status = status
+        job.finished_at = timezone.now()
+        with transaction.atomic():
+            job.save()
+            if job.batch_id is not None:
+                self._update_batch(job)
+
+    def _update_batch(self, job):
+        """Add a finished job's counters to its batch; close the batch after its last job."""
+        batch = ImportBatch.objects.select_for_update().get(pk=job.batch_id)
+        batch.rows_parsed = F('rows_parsed') + job.rows_parsed
+        batch.rows_inserted = F('rows_inserted') + job.rows_inserted
+        batch.rows_rejected = F('rows_rejected') + job.rows_rejected
+        batch.rows_duplicate = F('rows_duplicate') + job.rows_duplicate
+        room = ImportBatch.MAX_ERROR_SAMPLES - len(batch.error_samples)
+        if room > 0:
+            batch.error_samples = batch.error_samples + job.errors[:room]
+        unfinished = batch.jobs.exclude(
+            status__in=(ImportJob.STATUS_DONE, ImportJob.STATUS_FAILED)
+        ).exists()
+        if not unfinished:
+            batch.finished_at = job.finished_at
+        batch.save()
@@ -0,0 +1,54 @@
+"""
+Version of each user's transaction labels (the category on each row).
+A trained ML model records the version it learned from and is retrained
+once the version moves on. Moving rows between categories leaves the
+number of labeled rows unchanged, so counting them cannot tell.
+
+Only categories assigned by hand count as labels: the bulk editor and
+the Transaction signals (a single-row edit) bump the version once their
+transaction commits. The categorizers' write_assignments does not, as
+the model never learns from rule or model output.
+
+The version lives in a small file next to the user's model, so the web
+processes, the import worker and management commands all see the same value.
+"""
+import os
+
+from django.conf import settings
+from django.db import transaction
+
+from .versions import read_version, write_version
+
+
+def model_dir():
+    return getattr(settings, 'ML_MODEL_DIR', os.path.join(settings.BASE_DIR, 'ml_models'))
+
+
+def _version_path(user_id):
+    return os.path.join(model_dir(), f"user_{user_id}.labels")
+
+
+def labeled_user_ids():
+    """Ids of the users whose labels version was ever bumped."""
+    try:
+        names = os.listdir(model_dir())
+    except FileNotFoundError:
+        return []
+    return [
+        int(name[len('user_'):-len('.labels')])
+        for name in names
+        if name.startswith('user_') and name.endswith('.labels')
+    ]
+
+
+def labels_version(user_id):
+    """The current labels version of ``user_id``; 0 if it was never bumped."""
+    return read_version(_version_path(user_id))
+
+
+def bump_labels_version(user_id):
+    """
+    Give ``user_id`` a new labels version when the current transaction
+    commits. A model trained from the data before the commit keeps the old one.
+    """
+    transaction.on_commit(lambda: write_version(_version_path(user_id)))
@@ -0,0 +1,55 @@
+"""
+Link existing transactions to canonical merchants.
+New imports do this automatically; run once after upgrading, or after
+changing the normalizer rules in pages/merchants.py (with --all).
+
+Usage:
+    python manage.py assign_merchants
+    python manage.py assign_merchants --all
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from pages.merchants import MerchantResolver
+from pages.models import Transaction
+
+
+class Command(BaseCommand):
+    help = "Fill Transaction.merchant from the description."
+
+    BATCH_SIZE = 2000
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help="Re-resolve every transaction, not only those without a merchant."
+        )
+
+    def handle(self, *args, **options):
+        queryset = Transaction.objects.all()
+        if not options['all']:
+            queryset = queryset.filter(merchant__isnull=True)
+
+        resolver = MerchantResolver()
+        updated = 0
+        last_id = 0
+        while True:
+            # Walk by primary key so rows updated in this run are never revisited
+            batch = list(
+                queryset.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', 'description')[:self.BATCH_SIZE]
+            )
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            merchant_ids = resolver.resolve_many({description for _, description in batch})
+            rows = [
+                Transaction(id=pk, merchant_id=merchant_ids[description])
+                for pk, description in batch
+            ]
+            with transaction.atomic():
+                Transaction.objects.bulk_update(rows, ['merchant'])
+            updated += len(rows)
+
+        self.stdout.write(f"Assigned merchants to {updated} transaction(s).")
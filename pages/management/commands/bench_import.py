@@ -0,0 +1,203 @@
+"""
+Import pipeline benchmark on synthetic bank statements.
+
+Two stages are measured for each size:
+  parse   CSVRowParser alone over the file's bytes (no database)
+  upload  end to end: POST to TransactionUploadView with the test client,
+          run the queued ImportJob, then load the results page
+
+Each case reports rows/sec, query count and peak RSS; results are
+written as JSON so runs on different commits can be compared.
+Runs against a throwaway test database, never the real one.
+
+Usage:
+    python manage.py bench_import --rows 1000 10000 100000
+    python manage.py bench_import --rows 1000000 --stages parse
+    python manage.py bench_import --output new.json --compare old.json
+"""
+import contextlib
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import tempfile
+import time
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from pages.jobs import ImportJobRunner
+from pages.parsers import CSVRowParser
+from pages.profiling import peak_rss_mb
+from pages.synthetic import write_statement
+
+STAGES = ('parse', 'upload')
+# Date style and number convention rotate with the size so every run covers all of them
+FORMATS = [
+    {'date_style': 'dmy'},
+    {'date_style': 'mdy'},
+    {'date_style': 'iso'},
+    {'date_style': 'dmy', 'decimal_comma': True},
+]
+# A slowdown beyond this fraction is flagged by --compare
+REGRESSION_THRESHOLD = 0.10
+
+
+class QueryCounter:
+    """Counts queries without keeping their SQL (unlike CaptureQueriesContext)."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = "Benchmark CSV parsing and the end-to-end upload on synthetic statements; write JSON results."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+        parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+        parser.add_argument('--output', default='bench_import.json', help="Where to write the JSON results.")
+        parser.add_argument('--compare', help="Earlier results JSON to compare rows/sec against.")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        baseline = self._load_baseline(options['compare'])
+        results = []
+        with tempfile.TemporaryDirectory() as tmp:
+            files = []
+            for index, rows in enumerate(sorted(options['rows'])):
+                path = os.path.join(tmp, f"statement_{rows}.csv")
+                fmt = FORMATS[index % len(FORMATS)]
+                write_statement(path, rows, seed=options['seed'] + index, **fmt)
+                files.append((rows, path, fmt))
+
+            if 'parse' in options['stages']:
+                for rows, path, fmt in files:
+                    results.append(self._report(self._bench_parse(rows, path, fmt), baseline))
+            if 'upload' in options['stages']:
+                with self._test_database(), override_settings(MEDIA_ROOT=os.path.join(tmp, 'media')):
+                    for rows, path, fmt in files:
+                        results.append(self._report(self._bench_upload(rows, path, fmt), baseline))
+
+        with open(options['output'], 'w') as fh:
+            json.dump({'meta': self._metadata(), 'results': results}, fh, indent=2)
+        self.stdout.write(f"Results written to {options['output']}")
+
+    # --- stages ---
+
+    def _bench_parse(self, rows, path, fmt):
+        parser = CSVRowParser(user_id=1)
+        before = peak_rss_mb()
+        started = time.perf_counter()
+        with open(path, 'rb') as fh:
+            parsed = sum(1 for _ in parser.parse(iter(lambda: fh.read(64 * 1024), b'')))
+        elapsed = time.perf_counter() - started
+        return self._result('parse', rows, path, fmt, elapsed, before, queries=0, extra={
+            'valid_rows': parsed,
+            'rejected_rows': parser.stats['rejected'],
+        })
+
+    def _bench_upload(self, rows, path, fmt):
+        user = User.objects.create_user(f"bench_{rows}_{time.time_ns()}")
+        client = Client()
+        client.force_login(user)
+        counter = QueryCounter()
+        before = peak_rss_mb()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            with open(path, 'rb') as fh:
+                response = client.post('/upload/', {'file': fh})
+            if response.status_code != 302:
+                raise CommandError(f"Upload of {rows} rows was rejected ({response.status_code}).")
+            ImportJobRunner(workers=1).run_pending()
+            page = client.get(response['Location'])
+        elapsed = time.perf_counter() - started
+        stats = page.context['stats']
+        return self._result('upload', rows, path, fmt, elapsed, before, queries=counter.count, extra={
+            'inserted_rows': stats['successful'],
+            'duplicate_rows': stats['duplicates'],
+            'rejected_rows': stats['rejected'],
+        })
+
+    # --- helpers ---
+
+    def _result(self, stage, rows, path, fmt, elapsed, rss_before, queries, extra):
+        rss_after = peak_rss_mb()
+        result = {
+            'stage': stage,
+            'rows': rows,
+            'bytes': os.path.getsize(path),
+            'format': fmt,
+            'seconds': round(elapsed, 4),
+            'rows_per_sec': round(rows / elapsed, 1) if elapsed else None,
+            'queries': queries,
+            'peak_rss_mb': rss_after,
+            # Growth of the high-water mark during this case (sizes run smallest first)
+            'rss_growth_mb': round(rss_after - rss_before, 1) if rss_after is not None else None,
+        }
+        result.update(extra)
+        return result
+
+    def _report(self, result, baseline):
+        line = (
+            f"{result['stage']:<7} {result['rows']:>9,} rows  {result['rows_per_sec']:>12,.0f} rows/s  "
+            f"{result['queries']:>6} queries  peak RSS {result['peak_rss_mb']} MB"
+        )
+        previous = baseline.get((result['stage'], result['rows']))
+        if previous and previous.get('rows_per_sec'):
+            change = result['rows_per_sec'] / previous['rows_per_sec'] - 1
+            line += f"  ({change:+.0%} vs baseline)"
+            if change < -REGRESSION_THRESHOLD:
+                line += "  REGRESSION"
+        self.stdout.write(line)
+        return result
+
+    def _load_baseline(self, path):
+        if not path:
+            return {}
+        try:
+            with open(path) as fh:
+                data = json.load(fh)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read baseline {path}: {e}")
+        return {(r['stage'], r['rows']): r for r in data.get('results', [])}
+
+    @contextlib.contextmanager
+    def _test_database(self):
+        """Swap in a fresh test database for the upload stage, like the test runner does."""
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def _metadata(self):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'commit': commit,
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'database': connection.vendor,
+            'cpus': os.cpu_count(),
+        }
@@ -0,0 +1,154 @@
+"""
+Throughput and accuracy benchmark for the ML categorizer.
+
+Starts from the descriptions in ``CSV Upload Test/`` and expands them into
+bank-style variants (store numbers, locations, card suffixes, casing).
+One merchant of every category that has several is held out: the model
+never sees it in training, and the headline accuracy is scored on those
+merchants alone. Accuracy on new variants of the training merchants is
+shown separately; it is close to 100% by construction.
+
+Usage:
+    python manage.py bench_ml_categorizer --train 5000 --test 50000
+"""
+import csv
+import os
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from pages.ml_categorizer import CategoryModel, MLCategorizer, ML_AVAILABLE, np
+
+# Hand labels for the merchants in the sample CSVs
+SAMPLE_LABELS = {
+    "Netflix Subscription": "Entertainment",
+    "Trader Joe's": "Groceries",
+    "Shell Gas Station": "Fuel",
+    "Spotify Premium": "Entertainment",
+    "Salary Deposit": "Income",
+    "Amazon.com": "Shopping",
+    "Uber Ride": "Transport",
+    "Starbucks": "Dining",
+    "Target Store": "Shopping",
+    "Electric Bill": "Utilities",
+    "Freelance Payment": "Income",
+    "Local Italian Restaurant": "Dining",
+    "Gym Membership": "Health",
+    "Apple Services": "Entertainment",
+    "Whole Foods Market": "Groceries",
+    "Cinema City": "Entertainment",
+    "Chevron Gas": "Fuel",
+    "Udemy Course": "Education",
+    "Internet Provider": "Utilities",
+    "Rent Payment": "Housing",
+    "CVS Pharmacy": "Health",
+    "Airbnb Booking": "Travel",
+    "Coffee Shop": "Dining",
+    "Bookstore": "Shopping",
+    "Refund Amazon": "Shopping",
+    "Starbucks Coffee": "Dining",
+    "Gym Membership Fee": "Health",
+}
+
+CITIES = ["LONDON", "NEW YORK", "LEEDS", "SEATTLE", "AUSTIN", "BRISTOL"]
+
+
+class Command(BaseCommand):
+    help = "Benchmark ML categorizer training/prediction speed and accuracy on the sample CSVs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--train', type=int, default=5000, help="Training rows to generate.")
+        parser.add_argument('--test', type=int, default=50000, help="Rows of held-out merchants to score.")
+        parser.add_argument('--seed', type=int, default=7)
+
+    def handle(self, *args, **options):
+        if not ML_AVAILABLE:
+            raise CommandError("NumPy is required for the ML categorizer benchmark.")
+
+        merchants = self._sample_merchants()
+        if len({label for _, label in merchants}) < 2:
+            raise CommandError("Not enough labelled sample descriptions found.")
+        rng = random.Random(options['seed'])
+        seen, held_out = self._split_merchants(rng, merchants)
+        if not held_out:
+            raise CommandError("No category has more than one sample merchant to hold out.")
+
+        train = [self._variant(rng, seen) for _ in range(options['train'])]
+        test = [self._variant(rng, held_out) for _ in range(options['test'])]
+        known = [self._variant(rng, seen) for _ in range(min(options['test'], 5000))]
+        label_ids = {label: i for i, label in enumerate(sorted({l for _, l in merchants}))}
+
+        started = time.perf_counter()
+        model = CategoryModel.fit([d for d, _ in train], [label_ids[l] for _, l in train])
+        fit_time = time.perf_counter() - started
+
+        # Score in the same batch size the categorizer uses
+        started = time.perf_counter()
+        batch = MLCategorizer.PREDICT_BATCH
+        results = [model.predict([d for d, _ in test[i:i + batch]]) for i in range(0, len(test), batch)]
+        predicted = np.concatenate([r[0] for r in results])
+        confidence = np.concatenate([r[1] for r in results])
+        predict_time = time.perf_counter() - started
+
+        known_predicted, _ = model.predict([d for d, _ in known])
+        known_correct = sum(int(p == label_ids[l]) for p, (_, l) in zip(known_predicted.tolist(), known))
+
+        expected = [label_ids[l] for _, l in test]
+        correct = sum(int(p == e) for p, e in zip(predicted.tolist(), expected))
+        confident = confidence >= MLCategorizer.MIN_CONFIDENCE
+        confident_correct = sum(
+            int(p == e) for p, e, c in zip(predicted.tolist(), expected, confident.tolist()) if c
+        )
+
+        self.stdout.write(
+            f"merchants: {len(seen)} trained on, {len(held_out)} held out "
+            f"({', '.join(d for d, _ in held_out)})  classes: {len(label_ids)}"
+        )
+        self.stdout.write(f"fit:     {len(train):>8,} rows in {fit_time:.3f}s ({len(train) / fit_time:,.0f} rows/s)")
+        self.stdout.write(f"predict: {len(test):>8,} rows in {predict_time:.3f}s ({len(test) / predict_time:,.0f} rows/s)")
+        self.stdout.write("accuracy on merchants never seen in training:")
+        self.stdout.write(f"accuracy (all):        {correct / len(test):.1%}")
+        self.stdout.write(
+            f"accuracy (conf>={MLCategorizer.MIN_CONFIDENCE}):  "
+            f"{confident_correct / max(1, int(confident.sum())):.1%} on {confident.mean():.1%} of rows"
+        )
+        self.stdout.write(f"accuracy on new variants of training merchants: {known_correct / len(known):.1%}")
+
+    def _sample_merchants(self):
+        sample_dir = os.path.join(settings.BASE_DIR, 'CSV Upload Test')
+        merchants = {}
+        for name in sorted(os.listdir(sample_dir)):
+            if not name.endswith('.csv'):
+                continue
+            with open(os.path.join(sample_dir, name), newline='', encoding='utf-8-sig') as fh:
+                for row in csv.DictReader(fh):
+                    description = (row.get('Description') or '').strip()
+                    if description in SAMPLE_LABELS:
+                        merchants[description] = SAMPLE_LABELS[description]
+        return sorted(merchants.items())
+
+    @staticmethod
+    def _split_merchants(rng, merchants):
+        """Hold out one random merchant of every category that has more than one."""
+        by_label = {}
+        for description, label in merchants:
+            by_label.setdefault(label, []).append(description)
+        held_out = {rng.choice(descriptions) for descriptions in by_label.values() if len(descriptions) > 1}
+        return (
+            [m for m in merchants if m[0] not in held_out],
+            [m for m in merchants if m[0] in held_out],
+        )
+
+    def _variant(self, rng, merchants):
+        """A bank-statement style rendering of a random sample merchant."""
+        description, label = rng.choice(merchants)
+        parts = [description.upper() if rng.random() < 0.5 else description]
+        if rng.random() < 0.6:
+            parts.append(f"#{rng.randint(1, 9999)}")
+        if rng.random() < 0.5:
+            parts.append(rng.choice(CITIES))
+        if rng.random() < 0.3:
+            parts.append(f"CARD {rng.randint(1000, 9999)}")
+        return ' '.join(parts), label
@@ -0,0 +1,78 @@
+"""
+Microbenchmark for the importer's date and amount parsers.
+
+Usage:
+    python manage.py bench_parsers --rows 200000
+"""
+import datetime
+import random
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand
+
+from pages.parsers import AmountParser, DateParser
+
+
+def legacy_parse_date(date_str):
+    """The importer's original parser: try each strptime format in turn."""
+    for fmt in ['%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%d-%m-%Y', '%m-%d-%Y']:
+        try:
+            return datetime.datetime.strptime(date_str, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def legacy_parse_amount(amount_str):
+    """The importer's original parser: chained replace() then Decimal."""
+    cleaned = amount_str.replace(',', '').replace('$', '').replace('£', '').replace('€', '')
+    try:
+        return Decimal(cleaned)
+    except (InvalidOperation, ValueError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Compare rows/sec of the legacy and sniffed date/amount parsers."
+
+    DATE_STYLES = {
+        'iso': '%Y-%m-%d',
+        'dmy': '%d/%m/%Y',
+        'mdy': '%m/%d/%Y',
+    }
+    AMOUNT_STYLES = {
+        'plain': '{:.2f}',
+        '$1,234': '${:,.2f}',
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        start = datetime.date(2020, 1, 1)
+        days = [start + datetime.timedelta(days=rng.randrange(1500)) for _ in range(options['rows'])]
+        values = [rng.uniform(-5000, 5000) for _ in range(options['rows'])]
+
+        for style, fmt in self.DATE_STYLES.items():
+            dates = [d.strftime(fmt) for d in days]
+            self._compare(f"date ({style})", dates, legacy_parse_date, DateParser.sniff(dates[:1000]))
+        for style, fmt in self.AMOUNT_STYLES.items():
+            amounts = [fmt.format(value) for value in values]
+            self._compare(f"amount ({style})", amounts, legacy_parse_amount, AmountParser.sniff(amounts[:1000]))
+
+    def _compare(self, label, values, legacy, fast):
+        before = self._rate(legacy, values)
+        after = self._rate(fast, values)
+        self.stdout.write(
+            f"{label:<16} before {before:>12,.0f} rows/s   "
+            f"after {after:>12,.0f} rows/s   ({after / before:.1f}x)"
+        )
+
+    def _rate(self, parse, values):
+        started = time.perf_counter()
+        for value in values:
+            parse(value)
+        return len(values) / (time.perf_counter() - started)
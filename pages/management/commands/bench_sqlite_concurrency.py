@@ -0,0 +1,176 @@
+"""
+Concurrency benchmark for the SQLite settings.
+Runs importer-like writers (look up fingerprints, then insert a batch in
+one transaction) alongside dashboard-like readers against a scratch
+database, once with SQLite's defaults and once with the tuned pragmas
+and write strategy from settings, and reports lock errors and latency.
+
+Usage:
+    python manage.py bench_sqlite_concurrency --writers 4 --readers 8 --seconds 5
+"""
+import datetime
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+SCHEMA = """
+CREATE TABLE txn (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    description TEXT NOT NULL,
+    amount NUMERIC NOT NULL,
+    fingerprint TEXT NOT NULL
+);
+CREATE UNIQUE INDEX txn_fingerprint ON txn (user_id, fingerprint);
+CREATE INDEX txn_user_date ON txn (user_id, date DESC);
+"""
+
+READ_QUERIES = [
+    # Analytics-style aggregate
+    "SELECT substr(date, 1, 7), SUM(amount), COUNT(*) FROM txn WHERE user_id = ? GROUP BY 1",
+    # Transaction list page
+    "SELECT id, date, description, amount FROM txn WHERE user_id = ? ORDER BY date DESC LIMIT 50",
+]
+
+
+class Command(BaseCommand):
+    help = "Compare lock errors and p99 latency of concurrent writers/readers before and after SQLite tuning."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--batch', type=int, default=1000, help="Rows per writer transaction")
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--seed-rows', type=int, default=50000)
+
+    def handle(self, *args, **options):
+        profiles = [
+            # Python's sqlite3 defaults: rollback journal, deferred transactions, 5s timeout
+            ('before', {}, 'DEFERRED', 5.0),
+            ('after', settings.SQLITE_PRAGMAS, settings.SQLITE_TRANSACTION_MODE, settings.SQLITE_BUSY_TIMEOUT),
+        ]
+        for label, pragmas, mode, timeout in profiles:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, 'bench.sqlite3')
+                self._seed(path, options)
+                results = self._run(path, pragmas, mode, timeout, options)
+            self._report(label, pragmas, mode, results)
+
+    # --- setup ---
+
+    def _connect(self, path, pragmas, timeout):
+        # Autocommit at the driver level; transactions are opened explicitly like Django does
+        conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        for name, value in pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    def _seed(self, path, options):
+        conn = sqlite3.connect(path)
+        conn.executescript(SCHEMA)
+        rng = random.Random(0)
+        conn.executemany(
+            "INSERT INTO txn (user_id, date, description, amount, fingerprint) VALUES (?, ?, ?, ?, ?)",
+            (self._row(rng, rng.randrange(options['users']), f"seed-{i}") for i in range(options['seed_rows']))
+        )
+        conn.commit()
+        conn.close()
+
+    def _row(self, rng, user_id, fingerprint):
+        date = datetime.date(2023, 1, 1) + datetime.timedelta(days=rng.randrange(730))
+        return (user_id, date.isoformat(), f"MERCHANT {rng.randrange(500)}", round(rng.uniform(-500, 500), 2), fingerprint)
+
+    # --- workload ---
+
+    def _run(self, path, pragmas, mode, timeout, options):
+        results = {'write': [], 'read': [], 'write_errors': 0, 'read_errors': 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options['seconds']
+
+        def record(kind, latency=None, error=False):
+            with lock:
+                if error:
+                    results[f'{kind}_errors'] += 1
+                else:
+                    results[kind].append(latency)
+
+        def writer(worker):
+            conn = self._connect(path, pragmas, timeout)
+            rng = random.Random(worker)
+            sequence = 0
+            while time.perf_counter() < deadline:
+                user_id = rng.randrange(options['users'])
+                rows = []
+                for _ in range(options['batch']):
+                    rows.append(self._row(rng, user_id, f"w{worker}-{sequence}"))
+                    sequence += 1
+                started = time.perf_counter()
+                try:
+                    conn.execute(f"BEGIN {mode}")
+                    # Read before write, like the importer's duplicate lookup
+                    placeholders = ','.join('?' * min(len(rows), 500))
+                    conn.execute(
+                        f"SELECT fingerprint FROM txn WHERE user_id = ? AND fingerprint IN ({placeholders})",
+                        [user_id] + [r[4] for r in rows[:500]]
+                    ).fetchall()
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO txn (user_id, date, description, amount, fingerprint) "
+                        "VALUES (?, ?, ?, ?, ?)", rows
+                    )
+                    conn.execute("COMMIT")
+                except sqlite3.OperationalError:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    record('write', error=True)
+                else:
+                    record('write', time.perf_counter() - started)
+            conn.close()
+
+        def reader(worker):
+            conn = self._connect(path, pragmas, timeout)
+            rng = random.Random(1000 + worker)
+            while time.perf_counter() < deadline:
+                sql = READ_QUERIES[rng.randrange(len(READ_QUERIES))]
+                started = time.perf_counter()
+                try:
+                    conn.execute(sql, [rng.randrange(options['users'])]).fetchall()
+                except sqlite3.OperationalError:
+                    record('read', error=True)
+                else:
+                    record('read', time.perf_counter() - started)
+            conn.close()
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(options['writers'])]
+        threads += [threading.Thread(target=reader, args=(i,)) for i in range(options['readers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    # --- output ---
+
+    def _report(self, label, pragmas, mode, results):
+        journal = pragmas.get('journal_mode', 'DELETE')
+        self.stdout.write(f"{label}: journal_mode={journal} transaction_mode={mode}")
+        for kind in ('write', 'read'):
+            latencies = sorted(results[kind])
+            if latencies:
+                p50 = statistics.median(latencies) * 1000
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+                timing = f"p50 {p50:8.1f} ms   p99 {p99:8.1f} ms"
+            else:
+                timing = "no successful operations"
+            self.stdout.write(
+                f"  {kind + 's':<7} {len(latencies):>7} ok   "
+                f"{results[f'{kind}_errors']:>5} locked   {timing}"
+            )
@@ -0,0 +1,49 @@
+"""
+Run the categorizers (AI Sorting, UC 4.1) from the command line:
+keyword/merchant rules first, then the per-user ML model.
+
+Usage:
+    python manage.py categorize_transactions             # every user
+    python manage.py categorize_transactions --user alice
+    python manage.py categorize_transactions --rules-only
+
+The ML model is retrained first when its hand labels changed.
+"""
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from pages.categorizer import RuleCategorizer
+from pages.ml_categorizer import MLCategorizer, ML_AVAILABLE
+
+
+class Command(BaseCommand):
+    help = "Assign categories to uncategorized transactions using each user's rules."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only categorize this username's transactions.")
+        parser.add_argument('--rules-only', action='store_true', help="Skip the ML model.")
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f"User '{options['user']}' does not exist.")
+
+        use_ml = ML_AVAILABLE and not options['rules_only']
+        if not ML_AVAILABLE and not options['rules_only']:
+            self.stderr.write("NumPy is not installed; running rules only.")
+
+        for user in users.iterator():
+            started = time.perf_counter()
+            stats = RuleCategorizer(user).run()
+            ml_stats = MLCategorizer(user).run() if use_ml else {'categorized': 0}
+            elapsed = time.perf_counter() - started
+            if stats['scanned']:
+                self.stdout.write(
+                    f"{user.username}: categorized {stats['categorized']} of "
+                    f"{stats['scanned']} transaction(s) with {stats['rules']} rule(s) "
+                    f"and {ml_stats['categorized']} more with the ML model in {elapsed:.2f}s"
+                )
@@ -0,0 +1,37 @@
+"""
+Flag unusual transactions for the Analytics Dashboard: amounts far
+outside the recent normal range of their category (pages/anomalies.py).
+
+Usage:
+    python manage.py detect_anomalies             # every user
+    python manage.py detect_anomalies --user alice
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from pages.anomalies import ANOMALIES_AVAILABLE, AnomalyDetector
+
+
+class Command(BaseCommand):
+    help = "Score each user's transactions against their category's rolling median/MAD and store the outliers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only process this username's transactions.")
+
+    def handle(self, *args, **options):
+        if not ANOMALIES_AVAILABLE:
+            raise CommandError("NumPy is not installed; anomaly detection is unavailable.")
+
+        users = User.objects.all()
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f"User '{options['user']}' does not exist.")
+
+        for user in users.iterator():
+            stats = AnomalyDetector(user).run()
+            if stats['scanned']:
+                self.stdout.write(
+                    f"{user.username}: flagged {stats['flagged']} of {stats['scanned']} transaction(s) "
+                    f"(load {stats['load_seconds']:.2f}s, score {stats['score_seconds']:.2f}s)"
+                )
@@ -0,0 +1,36 @@
+"""
+Re-detect recurring payments over each user's full history.
+Imports keep the RecurringSeries table up to date for the merchants they
+touch; use this after upgrading, after assign_merchants, or after
+changing the detection thresholds in pages/recurring.py.
+
+Usage:
+    python manage.py detect_recurring
+    python manage.py detect_recurring --user alice
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from pages.models import RecurringSeries
+from pages.recurring import rebuild_recurring_series
+
+
+class Command(BaseCommand):
+    help = "Detect subscriptions and other recurring payments for the Analytics Dashboard."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only process this username's transactions.")
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f"User '{options['user']}' does not exist.")
+
+        processed = 0
+        for user_id in users.values_list('id', flat=True).iterator():
+            rebuild_recurring_series(user_id)
+            processed += 1
+        found = RecurringSeries.objects.filter(user__in=users).count()
+        self.stdout.write(f"Found {found} recurring series for {processed} user(s).")
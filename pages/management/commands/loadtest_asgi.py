@@ -0,0 +1,407 @@
+"""
+Load test for the upload, import-status and list endpoints.
+
+Simulated local clients call Django's ASGI or WSGI application inside
+this process; no server or network is involved. Each upload client sends
+a synthetic statement in small chunks with a pause between them, like a
+slow connection. Start times are spread over ``--ramp`` seconds, so most
+uploads are mid-transfer at any moment. Meanwhile the polling clients
+alternate between the batch status endpoint and the transaction list
+API until every upload has been answered.
+
+Modes (the same endpoints in both):
+  asgi   ASGI (myproject.asgi)
+  wsgi   WSGI with a thread per connection (a threaded server)
+
+Under ASGI, Django reads the request body into a spooled temporary file
+in the event loop, and takes a thread only once the body is complete.
+So a slow transfer holds no thread, whether the view is sync or async.
+What remains is a thread per request while the view runs, which the
+ASGI handler creates for its own sync work (the request_started signal,
+the session) even for async views.
+
+Each mode reports upload and poll latency (p50/p95/max), failures and the
+peak number of threads in the process. Runs against a throwaway SQLite
+test database, never the real one.
+
+Usage:
+    python manage.py loadtest_asgi --uploads 200 --pollers 100
+    python manage.py loadtest_asgi --modes asgi --chunk-delay 0.5
+"""
+import asyncio
+import contextlib
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from pages.models import ImportBatch, Transaction
+from pages.synthetic import write_statement
+
+MODES = ('asgi', 'wsgi')
+# url name per role, and the status that counts as success
+ENDPOINTS = {
+    'upload': ('upload_transactions', 302),
+    'status': ('import_batch_status', 200),
+    'list': ('transaction_list_api', 200),
+}
+
+
+def chunked(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)] or [b'']
+
+
+class LocalASGIClient:
+    """Sends HTTP requests straight into an ASGI application."""
+
+    def __init__(self, application, headers):
+        self.application = application
+        self.headers = [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+
+    async def request(self, method, path, body=b'', content_type=None, chunk_size=None, chunk_delay=0.0):
+        """Return (status, seconds); the body is sent in ``chunk_size`` pieces ``chunk_delay`` apart."""
+        chunks = chunked(body, chunk_size or len(body) or 1)
+        sent = 0
+        answered = asyncio.Event()
+        status = None
+
+        async def receive():
+            nonlocal sent
+            if sent < len(chunks):
+                if sent and chunk_delay:
+                    await asyncio.sleep(chunk_delay)
+                sent += 1
+                return {'type': 'http.request', 'body': chunks[sent - 1], 'more_body': sent < len(chunks)}
+            # Django listens for a disconnect while the view runs; stay connected until answered
+            await answered.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif message['type'] == 'http.response.body' and not message.get('more_body'):
+                answered.set()
+
+        path, _, query = path.partition('?')
+        headers = [*self.headers, (b'content-length', str(len(body)).encode())]
+        if content_type:
+            headers.append((b'content-type', content_type.encode()))
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': headers,
+            'client': ('127.0.0.1', 50000),
+            'server': ('testserver', 80),
+        }
+        started = time.perf_counter()
+        try:
+            await self.application(scope, receive, send)
+        finally:
+            answered.set()
+        return status, time.perf_counter() - started
+
+
+class SlowInput(io.RawIOBase):
+    """wsgi.input that hands out the body ``chunk_size`` bytes at a time, ``chunk_delay`` apart."""
+
+    def __init__(self, body, chunk_size, chunk_delay):
+        self.chunks = chunked(body, chunk_size)
+        self.chunk_delay = chunk_delay
+        self.buffer = b''
+        self.sent = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        if not self.buffer and self.sent < len(self.chunks):
+            if self.sent and self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            self.buffer = self.chunks[self.sent]
+            self.sent += 1
+        size = min(len(target), len(self.buffer))
+        target[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return size
+
+
+class LocalWSGIClient:
+    """Calls a WSGI application from the calling thread, as a threaded server would."""
+
+    def __init__(self, application, headers):
+        self.application = application
+        self.headers = {f"HTTP_{name.upper().replace('-', '_')}": value for name, value in headers.items()}
+
+    def request(self, method, path, body=b'', content_type=None, chunk_size=None, chunk_delay=0.0):
+        path, _, query = path.partition('?')
+        environ = {
+            'REQUEST_METHOD': method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1',
+            'CONTENT_LENGTH': str(len(body)),
+            'CONTENT_TYPE': content_type or '',
+            'wsgi.input': io.BufferedReader(SlowInput(body, chunk_size or len(body) or 1, chunk_delay)),
+            'wsgi.errors': sys.stderr,
+            'wsgi.url_scheme': 'http',
+            'wsgi.version': (1, 0),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+            **self.headers,
+        }
+        status = None
+
+        def start_response(status_line, headers, exc_info=None):
+            nonlocal status
+            status = int(status_line.split()[0])
+
+        started = time.perf_counter()
+        response = self.application(environ, start_response)
+        try:
+            for _ in response:
+                pass
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+        return status, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = "Load-test the upload/status/list endpoints with simulated slow local clients (ASGI and WSGI)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+        parser.add_argument('--uploads', type=int, default=200, help="Slow upload clients.")
+        parser.add_argument('--pollers', type=int, default=100, help="Status/list polling clients.")
+        parser.add_argument('--rows', type=int, default=2000, help="Rows in the uploaded statement.")
+        parser.add_argument('--chunk-kb', type=int, default=8, help="Upload body sent in chunks of this size.")
+        parser.add_argument('--chunk-delay', type=float, default=0.25, help="Seconds between upload chunks.")
+        parser.add_argument('--ramp', type=float, default=3.0, help="Upload start times are spread over this.")
+        parser.add_argument('--poll-interval', type=float, default=0.5)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            statement = write_statement(os.path.join(tmp, 'statement.csv'), options['rows'], seed=options['seed'])
+            with open(statement, 'rb') as fh:
+                body = encode_multipart(BOUNDARY, {'file': fh})
+            with self._test_database(tmp), override_settings(MEDIA_ROOT=os.path.join(tmp, 'media')):
+                for mode in options['modes']:
+                    headers, batch_id = self._prepare(mode)
+                    paths = self._paths(batch_id)
+                    if mode == 'wsgi':
+                        client = LocalWSGIClient(get_wsgi_application(), headers)
+                        result = self._run_threads(client, paths, body, options)
+                    else:
+                        client = LocalASGIClient(get_asgi_application(), headers)
+                        result = asyncio.run(self._run_async(client, paths, body, options))
+                    self._report(mode, result, len(body), options)
+
+    # --- scenario ---
+
+    def _prepare(self, mode):
+        """Create a user with some history and an empty batch; return (request headers, batch id)."""
+        user = User.objects.create_user(f"loadtest_{mode}_{time.time_ns()}")
+        rng = random.Random(0)
+        Transaction.objects.bulk_create(
+            Transaction(
+                user=user,
+                date=f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                description=f"Load test row {i}",
+                amount=rng.randint(-20000, 5000) / 100,
+                fingerprint=f"loadtest-{i}",
+            )
+            for i in range(1000)
+        )
+        batch = ImportBatch.objects.create(user=user)
+        session = Client()
+        session.force_login(user)
+        csrf_secret = get_random_string(32)
+        cookies = {
+            settings.SESSION_COOKIE_NAME: session.cookies[settings.SESSION_COOKIE_NAME].value,
+            settings.CSRF_COOKIE_NAME: csrf_secret,
+        }
+        headers = {
+            'Host': 'testserver',
+            'Cookie': '; '.join(f"{name}={value}" for name, value in cookies.items()),
+            'X-CSRFToken': csrf_secret,
+        }
+        return headers, batch.id
+
+    @staticmethod
+    def _paths(batch_id):
+        return {
+            'upload': (reverse(ENDPOINTS['upload'][0]), ENDPOINTS['upload'][1]),
+            'status': (reverse(ENDPOINTS['status'][0], args=[batch_id]), ENDPOINTS['status'][1]),
+            'list': (reverse(ENDPOINTS['list'][0]) + '?limit=50', ENDPOINTS['list'][1]),
+        }
+
+    @staticmethod
+    def _schedule(options):
+        """Start offsets: uploads spread over the ramp, pollers over one poll interval."""
+        rng = random.Random(options['seed'])
+        uploads = sorted(rng.uniform(0, options['ramp']) for _ in range(options['uploads']))
+        pollers = [options['poll_interval'] * i / max(options['pollers'], 1) for i in range(options['pollers'])]
+        return uploads, pollers
+
+    async def _run_async(self, client, paths, body, options):
+        result = self._empty_result()
+        upload_starts, poll_starts = self._schedule(options)
+        uploads_done = asyncio.Event()
+
+        async def upload(delay):
+            await asyncio.sleep(delay)
+            path, expected = paths['upload']
+            self._record(result, 'upload', expected, *await client.request(
+                'POST', path, body, MULTIPART_CONTENT,
+                chunk_size=options['chunk_kb'] * 1024, chunk_delay=options['chunk_delay'],
+            ))
+
+        async def poll(index, delay):
+            await asyncio.sleep(delay)
+            while not uploads_done.is_set():
+                role = ('list', 'status')[index % 2]
+                path, expected = paths[role]
+                self._record(result, 'poll', expected, *await client.request('GET', path))
+                index += 1
+                await asyncio.sleep(options['poll_interval'])
+
+        async def watch_threads():
+            while not uploads_done.is_set():
+                result['threads_peak'] = max(result['threads_peak'], threading.active_count())
+                await asyncio.sleep(0.01)
+
+        started = time.perf_counter()
+        background = [asyncio.create_task(watch_threads())]
+        background += [asyncio.create_task(poll(i, delay)) for i, delay in enumerate(poll_starts)]
+        await asyncio.gather(*(upload(delay) for delay in upload_starts))
+        uploads_done.set()
+        await asyncio.gather(*background)
+        result['seconds'] = time.perf_counter() - started
+        return result
+
+    def _run_threads(self, client, paths, body, options):
+        result = self._empty_result()
+        upload_starts, poll_starts = self._schedule(options)
+        uploads_done = threading.Event()
+        lock = threading.Lock()
+
+        def upload(delay):
+            time.sleep(delay)
+            path, expected = paths['upload']
+            response = client.request(
+                'POST', path, body, MULTIPART_CONTENT,
+                chunk_size=options['chunk_kb'] * 1024, chunk_delay=options['chunk_delay'],
+            )
+            with lock:
+                self._record(result, 'upload', expected, *response)
+
+        def poll(index, delay):
+            time.sleep(delay)
+            while not uploads_done.is_set():
+                role = ('list', 'status')[index % 2]
+                path, expected = paths[role]
+                response = client.request('GET', path)
+                with lock:
+                    self._record(result, 'poll', expected, *response)
+                index += 1
+                uploads_done.wait(options['poll_interval'])
+
+        def watch_threads():
+            while not uploads_done.is_set():
+                result['threads_peak'] = max(result['threads_peak'], threading.active_count())
+                time.sleep(0.01)
+
+        # One thread per connection, as in a threaded WSGI server
+        started = time.perf_counter()
+        background = [threading.Thread(target=watch_threads)]
+        background += [threading.Thread(target=poll, args=(i, delay)) for i, delay in enumerate(poll_starts)]
+        workers = [threading.Thread(target=upload, args=(delay,)) for delay in upload_starts]
+        for thread in background + workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        uploads_done.set()
+        for thread in background:
+            thread.join()
+        result['seconds'] = time.perf_counter() - started
+        return result
+
+    # --- helpers ---
+
+    @staticmethod
+    def _empty_result():
+        return {
+            'upload': [], 'poll': [], 'upload_failed': 0, 'poll_failed': 0,
+            'threads_before': threading.active_count(), 'threads_peak': threading.active_count(),
+        }
+
+    @staticmethod
+    def _record(result, role, expected, status, seconds):
+        if status == expected:
+            result[role].append(seconds)
+        else:
+            result[f'{role}_failed'] += 1
+
+    def _report(self, mode, result, body_bytes, options):
+        chunks = len(chunked(b'x' * body_bytes, options['chunk_kb'] * 1024))
+        self.stdout.write(
+            f"{mode:<5} {options['uploads']} uploads of {body_bytes // 1024} KB "
+            f"(~{options['chunk_delay'] * (chunks - 1):.1f}s transfer each), "
+            f"{options['pollers']} pollers, {result['seconds']:.1f}s"
+        )
+        for role in ('upload', 'poll'):
+            self.stdout.write(f"      {role:<6} {self._latency(result[role])}  failed {result[role + '_failed']}")
+        self.stdout.write(f"      threads: {result['threads_before']} before, peak {result['threads_peak']}")
+
+    @staticmethod
+    def _latency(samples):
+        if not samples:
+            return "no successful requests"
+        ordered = sorted(samples)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return (
+            f"{len(ordered):>6} ok  p50 {statistics.median(ordered) * 1000:7.0f} ms  "
+            f"p95 {p95 * 1000:7.0f} ms  max {ordered[-1] * 1000:7.0f} ms"
+        )
+
+    @contextlib.contextmanager
+    def _test_database(self, tmp):
+        """A fresh test database in a file (requests use many threads; in-memory SQLite locks per table)."""
+        setup_test_environment()
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tmp, 'loadtest.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
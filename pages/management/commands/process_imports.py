@@ -0,0 +1,48 @@
+"""
+Worker for the background CSV import queue. Between polls it also
+retrains the ML models of users whose hand-assigned categories changed,
+so AI Sorting requests never train one.
+
+Usage:
+    python manage.py process_imports          # keep polling for new jobs
+    python manage.py process_imports --once   # drain the queue and exit
+    python manage.py process_imports --workers 1   # parse in this process only
+"""
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from pages.jobs import ImportJobRunner
+from pages.ml_categorizer import ML_AVAILABLE, retrain_stale_models
+
+
+class Command(BaseCommand):
+    help = "Process queued CSV import jobs (ImportJob rows)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Process the jobs currently queued, then exit."
+        )
+        parser.add_argument(
+            '--interval', type=float, default=2.0,
+            help="Seconds to sleep between polls when the queue is empty."
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help="Processes used to parse files in parallel (default: one per CPU)."
+        )
+
+    def handle(self, *args, **options):
+        runner = ImportJobRunner(workers=options['workers'])
+        while True:
+            processed = runner.run_pending()
+            if processed:
+                self.stdout.write(f"Processed {processed} import job(s).")
+            retrained = retrain_stale_models() if ML_AVAILABLE else 0
+            if retrained:
+                self.stdout.write(f"Retrained {retrained} categorization model(s).")
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,33 @@
+"""
+Rebuild the MonthlyRollup table from scratch.
+Normal writes keep it up to date incrementally; use this after upgrading
+or after changing transactions with raw SQL.
+
+Usage:
+    python manage.py rebuild_rollups
+    python manage.py rebuild_rollups --user alice
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from pages.rollups import rebuild_monthly_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute monthly spending rollups for the Analytics Dashboard."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only rebuild this username's rollups.")
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f"User '{options['user']}' does not exist.")
+
+        rebuilt = 0
+        for user_id in users.values_list('id', flat=True).iterator():
+            rebuild_monthly_rollups(user_id)
+            rebuilt += 1
+        self.stdout.write(f"Rebuilt rollups for {rebuilt} user(s).")
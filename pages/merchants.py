@@ -0,0 +1,93 @@
+"""
+Merchant normalization.
+Collapses raw bank descriptions onto canonical ``Merchant`` rows by
+stripping store numbers, dates, card suffixes and processor noise, so
+categorization and analytics work over a few hundred merchants instead
+of every distinct description string.
+"""
+import re
+from collections import OrderedDict
+from functools import lru_cache
+
+from .models import Merchant
+
+# Card-processor prefixes such as "SQ *", "PAYPAL *", "POS "
+PREFIX_RE = re.compile(r'^(?:(?:SQ|TST|SP|PAYPAL|ZETTLE|IZ|SUMUP)\s*\*\s*|(?:POS|DD|SO|BGC|FPI|FPO)\s+)')
+# Dates (2024-01-31, 31/01/2024, 31/01) and times (12:30)
+DATE_RE = re.compile(r'\b\d{1,4}[/.-]\d{1,2}(?:[/.-]\d{2,4})?\b|\b\d{1,2}:\d{2}(?::\d{2})?\b')
+# Card suffixes: "CARD 1234", "XXXX1234", "**** 1234", "*1234"
+CARD_RE = re.compile(r'\b(?:CARD|ENDING)\s*\d+\b|[X*]{2,}\s*\d+|\*\d+')
+# Web domains: keep "AMAZON" from "AMAZON.COM" / "WWW.AMAZON.CO.UK"
+DOMAIN_RE = re.compile(r'\bWWW\.|\.(?:COM|NET|ORG|CO|UK|IO)\b')
+WORD_RE = re.compile(r"[A-Z][A-Z'&]*")
+
+NOISE_WORDS = frozenset({
+    'POS', 'PURCHASE', 'DEBIT', 'CREDIT', 'CARD', 'VISA', 'MASTERCARD', 'CONTACTLESS',
+    'ONLINE', 'PAYMENT', 'REF', 'LTD', 'INC', 'LLC', 'PLC', 'CO', 'THE', 'STORE', 'NO',
+})
+MAX_WORDS = 3
+
+
+@lru_cache(maxsize=20000)
+def normalize_merchant(description):
+    """
+    Return the canonical merchant key for a description, or '' if nothing
+    merchant-like is left (e.g. a bare reference number).
+    """
+    text = description.upper()
+    text = PREFIX_RE.sub('', text)
+    text = DATE_RE.sub(' ', text)
+    text = CARD_RE.sub(' ', text)
+    text = DOMAIN_RE.sub(' ', text)
+    # Words only: store numbers, reference codes and punctuation drop out here
+    words = [w for w in WORD_RE.findall(text) if w not in NOISE_WORDS]
+    # Trailing words are usually locations ("... LONDON"); keep the head
+    return ' '.join(words[:MAX_WORDS])[:100]
+
+
+class MerchantResolver:
+    """
+    Maps descriptions to ``Merchant`` ids, creating merchants as needed.
+    Keys are looked up in a bounded process-level memo first, then in the
+    Merchant table with one query per batch; unknown keys are bulk-created.
+    """
+    MEMO_SIZE = 20000
+
+    _memo = OrderedDict()
+
+    def resolve_many(self, descriptions):
+        """Return a dict of description -> merchant id (None if no merchant)."""
+        keys = {description: normalize_merchant(description) for description in descriptions}
+        ids = self.ids_for_keys(set(keys.values()) - {''})
+        return {description: ids.get(key) for description, key in keys.items()}
+
+    def ids_for_keys(self, keys):
+        """Return a dict of merchant key -> id for ``keys``."""
+        found = {}
+        missing = []
+        for key in keys:
+            merchant_id = self._memo.get(key)
+            if merchant_id is None:
+                missing.append(key)
+            else:
+                self._memo.move_to_end(key)
+                found[key] = merchant_id
+
+        if missing:
+            known = dict(Merchant.objects.filter(key__in=missing).values_list('key', 'id'))
+            new = [k for k in missing if k not in known]
+            if new:
+                # ignore_conflicts: another importer may create the same merchant concurrently
+                Merchant.objects.bulk_create(
+                    [Merchant(key=k, name=k.title()) for k in new],
+                    ignore_conflicts=True
+                )
+                known.update(Merchant.objects.filter(key__in=new).values_list('key', 'id'))
+            found.update(known)
+            self._remember(known)
+        return found
+
+    def _remember(self, pairs):
+        self._memo.update(pairs)
+        while len(self._memo) > self.MEMO_SIZE:
+            self._memo.popitem(last=False)
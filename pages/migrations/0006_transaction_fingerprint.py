@@ -0,0 +1,60 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:17
+
+import hashlib
+from collections import Counter
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_fingerprints(apps, schema_editor):
+    """
+    Fingerprint existing rows the same way the importer does, numbering
+    identical rows per user so the unique constraint can be added.
+    """
+    Transaction = apps.get_model('pages', 'Transaction')
+    seen = Counter()
+    batch = []
+    rows = Transaction.objects.order_by('user_id', 'id').only(
+        'id', 'user_id', 'date', 'description', 'amount'
+    )
+    for txn in rows.iterator(chunk_size=2000):
+        normalized = ' '.join(txn.description.lower().split())
+        key = f"{txn.user_id}|{txn.date.isoformat()}|{normalized}|{txn.amount:.2f}"
+        occurrence = seen[key]
+        seen[key] += 1
+        if occurrence:
+            key += f"|{occurrence}"
+        txn.fingerprint = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        batch.append(txn)
+        if len(batch) >= 500:
+            Transaction.objects.bulk_update(batch, ['fingerprint'])
+            batch = []
+    if batch:
+        Transaction.objects.bulk_update(batch, ['fingerprint'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0005_importjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='rows_duplicate',
+            field=models.PositiveIntegerField(default=0, help_text='Rows skipped as already imported'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, help_text='Content hash used to skip re-uploaded rows', max_length=64, null=True),
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(fields=('user', 'fingerprint'), name='unique_transaction_fingerprint'),
+        ),
+    ]
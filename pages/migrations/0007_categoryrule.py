@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0006_transaction_fingerprint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pattern', models.CharField(help_text='Keyword or regular expression to look for in the description', max_length=200)),
+                ('match_type', models.CharField(choices=[('keyword', 'Keyword'), ('pattern', 'Merchant pattern (regex)')], default='keyword', max_length=10)),
+                ('priority', models.IntegerField(default=0, help_text='Higher priority rules win when several match at the same position')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rules', to='pages.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_rules', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-priority', 'pattern'],
+                'unique_together': {('user', 'pattern', 'match_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0007_categoryrule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Merchant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='Normalized merchant key', max_length=100, unique=True)),
+                ('name', models.CharField(help_text='Display name', max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='merchant',
+            field=models.ForeignKey(blank=True, help_text='Canonical merchant derived from the description', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='pages.merchant'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncMonth
+
+
+def build_rollups(apps, schema_editor):
+    """Aggregate existing transactions into the new rollup table."""
+    Transaction = apps.get_model('pages', 'Transaction')
+    MonthlyRollup = apps.get_model('pages', 'MonthlyRollup')
+    aggregates = (
+        Transaction.objects
+        .annotate(month=TruncMonth('date'))
+        .order_by()
+        .values('user_id', 'month', 'category_id')
+        .annotate(
+            total=Sum('amount'),
+            count=Count('id'),
+            min_amount=Min('amount'),
+            max_amount=Max('amount'),
+        )
+    )
+    MonthlyRollup.objects.bulk_create(
+        [MonthlyRollup(**row) for row in aggregates.iterator()],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0008_merchant'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('total', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('count', models.PositiveIntegerField()),
+                ('min_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('max_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='monthly_rollups', to='pages.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['month'],
+                'unique_together': {('user', 'category', 'month')},
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
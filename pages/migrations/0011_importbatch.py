@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0010_transaction_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='importjob',
+            name='errors',
+            field=models.JSONField(blank=True, default=list, help_text='First few row errors'),
+        ),
+        migrations.CreateModel(
+            name='ImportBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rows_parsed', models.PositiveIntegerField(default=0)),
+                ('rows_inserted', models.PositiveIntegerField(default=0)),
+                ('rows_rejected', models.PositiveIntegerField(default=0)),
+                ('rows_duplicate', models.PositiveIntegerField(default=0)),
+                ('error_samples', models.JSONField(blank=True, default=list, help_text='First few row errors')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_batches', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Import Batch',
+                'verbose_name_plural': 'Import Batches',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='batch',
+            field=models.ForeignKey(blank=True, help_text='Upload this file arrived in', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='pages.importbatch'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='import_batch',
+            field=models.ForeignKey(blank=True, editable=False, help_text='Upload this transaction was imported in', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='pages.importbatch'),
+        ),
+    ]
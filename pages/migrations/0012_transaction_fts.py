@@ -0,0 +1,67 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:05
+
+from django.db import migrations
+
+# External-content FTS5 index over Transaction.description and notes.
+# The triggers keep it in step with every INSERT, UPDATE and DELETE,
+# including bulk_create(), QuerySet.update() and cascading deletes.
+# prefix='2 3' adds prefix indexes so as-you-type queries stay fast.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE pages_transaction_fts USING fts5(
+        description, notes,
+        content='pages_transaction', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER pages_transaction_fts_ai AFTER INSERT ON pages_transaction BEGIN
+        INSERT INTO pages_transaction_fts(rowid, description, notes)
+        VALUES (new.id, new.description, new.notes);
+    END
+    """,
+    """
+    CREATE TRIGGER pages_transaction_fts_ad AFTER DELETE ON pages_transaction BEGIN
+        INSERT INTO pages_transaction_fts(pages_transaction_fts, rowid, description, notes)
+        VALUES ('delete', old.id, old.description, old.notes);
+    END
+    """,
+    """
+    CREATE TRIGGER pages_transaction_fts_au AFTER UPDATE OF description, notes ON pages_transaction BEGIN
+        INSERT INTO pages_transaction_fts(pages_transaction_fts, rowid, description, notes)
+        VALUES ('delete', old.id, old.description, old.notes);
+        INSERT INTO pages_transaction_fts(rowid, description, notes)
+        VALUES (new.id, new.description, new.notes);
+    END
+    """,
+    # Index the rows that already exist
+    "INSERT INTO pages_transaction_fts(pages_transaction_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS pages_transaction_fts_au",
+    "DROP TRIGGER IF EXISTS pages_transaction_fts_ad",
+    "DROP TRIGGER IF EXISTS pages_transaction_fts_ai",
+    "DROP TABLE IF EXISTS pages_transaction_fts",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        # FTS5 is SQLite-only; other databases fall back to LIKE search
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0011_importbatch'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(CREATE_SQL), _run(DROP_SQL)),
+    ]
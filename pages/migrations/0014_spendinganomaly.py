@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0013_recurringseries'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendingAnomaly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('expected_amount', models.DecimalField(decimal_places=2, help_text='Rolling median of the category', max_digits=10)),
+                ('typical_deviation', models.DecimalField(decimal_places=2, help_text='Rolling MAD of the category', max_digits=10)),
+                ('detected_at', models.DateTimeField(auto_now_add=True)),
+                ('transaction', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='anomaly', to='pages.transaction')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spending_anomalies', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Spending anomalies',
+                'ordering': ['-detected_at'],
+            },
+        ),
+    ]
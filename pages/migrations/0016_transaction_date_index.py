@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# txn_category_date_idx leads with category_id, so the FK's own index is
+# redundant. It is dropped with plain SQL: an AlterField would make SQLite
+# rebuild pages_transaction, which also drops the FTS triggers of 0012.
+CATEGORY_FK_INDEX = 'pages_transaction_category_id_a02c590f'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0015_bulkcategorychange'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['date'], name='txn_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['category', 'date'], name='txn_category_date_idx'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='transaction',
+                    name='category',
+                    field=models.ForeignKey(blank=True, db_index=False, help_text='Category assigned by AI or user', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='pages.category'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    f'DROP INDEX IF EXISTS "{CATEGORY_FK_INDEX}"',
+                    f'CREATE INDEX "{CATEGORY_FK_INDEX}" ON "pages_transaction" ("category_id")',
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:43
+
+from django.db import migrations, models
+
+# Adding a NOT NULL column makes Django rebuild pages_transaction on SQLite,
+# which drops the full-text search triggers of 0012_transaction_fts. They
+# are created again here; the index itself is untouched, since the rebuilt
+# table keeps every row's id.
+FTS_TRIGGERS_SQL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS pages_transaction_fts_ai AFTER INSERT ON pages_transaction BEGIN
+        INSERT INTO pages_transaction_fts(rowid, description, notes)
+        VALUES (new.id, new.description, new.notes);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS pages_transaction_fts_ad AFTER DELETE ON pages_transaction BEGIN
+        INSERT INTO pages_transaction_fts(pages_transaction_fts, rowid, description, notes)
+        VALUES ('delete', old.id, old.description, old.notes);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS pages_transaction_fts_au AFTER UPDATE OF description, notes ON pages_transaction BEGIN
+        INSERT INTO pages_transaction_fts(pages_transaction_fts, rowid, description, notes)
+        VALUES ('delete', old.id, old.description, old.notes);
+        INSERT INTO pages_transaction_fts(rowid, description, notes)
+        VALUES (new.id, new.description, new.notes);
+    END
+    """,
+]
+
+
+def restore_fts_triggers(apps, schema_editor):
+    # FTS5 is SQLite-only; other databases fall back to LIKE search
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in FTS_TRIGGERS_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0017_importjob_heartbeat'),
+    ]
+
+    operations = [
+        # Unapplying rebuilds the table again; this brings the triggers back afterwards
+        migrations.RunPython(migrations.RunPython.noop, restore_fts_triggers),
+        migrations.AddField(
+            model_name='bulkcategorychangeitem',
+            name='previous_category_source',
+            field=models.CharField(default='manual', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='category_source',
+            field=models.CharField(choices=[('manual', 'By hand'), ('rule', 'By a rule'), ('model', 'By the AI model')], default='manual', editable=False, help_text='Who assigned the category', max_length=10),
+        ),
+        migrations.RunPython(restore_fts_triggers, migrations.RunPython.noop),
+    ]
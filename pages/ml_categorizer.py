@@ -0,0 +1,255 @@
+"""
+Offline machine-learning categorizer for AI Sorting (UC 4.1).
+Learns from the categories a user assigned by hand (never from what the
+rules or the model itself assigned) with a hashed
+character n-gram Naive Bayes model (a linear model over NumPy arrays).
+Models are trained per user, saved to disk and kept in a process-level
+LRU cache; prediction scores a whole batch of pending transactions with
+one gather + segmented reduce over the weight matrix rather than row by
+row. No network access is involved.
+
+NumPy is optional: without it ``ML_AVAILABLE`` is False and callers fall
+back to the rule-based categorizer alone.
+"""
+import os
+import zlib
+from collections import defaultdict
+from functools import lru_cache
+
+from django.contrib.auth.models import User
+
+from .categorizer import write_assignments
+from .category_cache import user_categories
+from .labels import labeled_user_ids, labels_version, model_dir
+from .models import Transaction
+from .rollups import month_start
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+ML_AVAILABLE = np is not None
+
+# Bump when the feature extraction or file layout changes
+MODEL_FORMAT = 2
+N_FEATURES = 2 ** 16
+NGRAM_RANGE = (3, 5)
+BIAS_FEATURE = 0
+
+
+def hash_features(description):
+    """Return hashed character n-gram indices for one description."""
+    text = f" {' '.join(description.lower().split())} "
+    features = [BIAS_FEATURE]
+    encoded = text.encode('utf-8')
+    low, high = NGRAM_RANGE
+    for n in range(low, high + 1):
+        for start in range(len(encoded) - n + 1):
+            # crc32 is stable across processes, unlike hash()
+            features.append(1 + zlib.crc32(encoded[start:start + n]) % (N_FEATURES - 1))
+    return features
+
+
+def vectorize(descriptions):
+    """
+    Hash a list of descriptions into CSR-style arrays.
+    Returns (indices, indptr): row ``i`` owns ``indices[indptr[i]:indptr[i + 1]]``.
+    Every row has at least the bias feature, so no row is empty.
+    """
+    indices = []
+    indptr = [0]
+    for description in descriptions:
+        indices.extend(hash_features(description))
+        indptr.append(len(indices))
+    return np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)
+
+
+class CategoryModel:
+    """Multinomial Naive Bayes over hashed n-grams: log-weights plus class priors."""
+
+    ALPHA = 0.1  # Additive smoothing
+
+    def __init__(self, weights, priors, classes, n_samples, labels_version=0):
+        self.weights = weights      # (N_FEATURES, n_classes) float32 log-likelihoods
+        self.priors = priors        # (n_classes,) float32 log-priors
+        self.classes = classes      # (n_classes,) int64 category ids
+        self.n_samples = n_samples
+        self.labels_version = labels_version  # See pages/labels.py
+
+    @classmethod
+    def fit(cls, descriptions, labels, labels_version=0):
+        indices, indptr = vectorize(descriptions)
+        classes, label_idx = np.unique(np.asarray(labels, dtype=np.int64), return_inverse=True)
+        row_lengths = np.diff(indptr)
+        # Count every (feature, class) pair in one scatter-add
+        counts = np.zeros((N_FEATURES, len(classes)), dtype=np.float32)
+        np.add.at(counts, (indices, np.repeat(label_idx, row_lengths)), 1.0)
+        counts += cls.ALPHA
+        weights = np.log(counts / counts.sum(axis=0, keepdims=True)).astype(np.float32)
+        class_counts = np.bincount(label_idx, minlength=len(classes)).astype(np.float32)
+        priors = np.log(class_counts / class_counts.sum()).astype(np.float32)
+        return cls(weights, priors, classes, len(labels), labels_version)
+
+    def predict(self, descriptions):
+        """
+        Score all descriptions at once.
+        Returns (category_ids, confidence) arrays aligned with the input.
+        """
+        indices, indptr = vectorize(descriptions)
+        # Sum the weight rows of each description's features: one gather + segmented reduce
+        scores = np.add.reduceat(self.weights[indices], indptr[:-1], axis=0) + self.priors
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp(scores)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        best = probabilities.argmax(axis=1)
+        return self.classes[best], probabilities[np.arange(len(best)), best]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as fh:
+            np.savez_compressed(
+                fh, weights=self.weights, priors=self.priors, classes=self.classes,
+                n_samples=np.int64(self.n_samples), labels_version=np.int64(self.labels_version),
+                model_format=np.int64(MODEL_FORMAT)
+            )
+        os.replace(tmp_path, path)  # Readers never see a half-written file
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            if int(data['model_format']) != MODEL_FORMAT:
+                return None
+            return cls(
+                data['weights'], data['priors'], data['classes'], int(data['n_samples']), int(data['labels_version'])
+            )
+
+
+@lru_cache(maxsize=32)
+def _load_cached(path, version):
+    """Process-level LRU of loaded models; ``version`` changes whenever the file does."""
+    return CategoryModel.load(path)
+
+
+class MLCategorizer:
+    """
+    Trains, persists and applies a user's CategoryModel.
+    Only predictions at or above ``MIN_CONFIDENCE`` are written back.
+    """
+    MIN_TRAINING_ROWS = 10
+    MIN_CONFIDENCE = 0.6
+    CHUNK_SIZE = 500
+    FETCH_SIZE = 5000
+    # Rows scored per matrix operation; bounds the (n-grams x classes) gather
+    PREDICT_BATCH = 1000
+
+    def __init__(self, user):
+        self.user = user
+
+    @property
+    def model_path(self):
+        return os.path.join(model_dir(), f"user_{self.user.pk}.npz")
+
+    def labeled(self):
+        """The user's hand-labeled transactions, the only ones the model learns from."""
+        return Transaction.objects.filter(
+            user=self.user, category__isnull=False, category_source=Transaction.SOURCE_MANUAL
+        )
+
+    def labeled_count(self):
+        return self.labeled().count()
+
+    def train(self):
+        """Fit a fresh model from the user's hand-labeled transactions and save it."""
+        # Read before the rows: a change committed meanwhile leaves the model stale
+        version = labels_version(self.user.pk)
+        rows = list(self.labeled().values_list('description', 'category_id'))
+        if len(rows) < self.MIN_TRAINING_ROWS or len({c for _, c in rows}) < 2:
+            return None
+        descriptions, labels = zip(*rows)
+        model = CategoryModel.fit(descriptions, labels, version)
+        model.save(self.model_path)
+        return model
+
+    def get_model(self, retrain_if_stale=True):
+        """
+        Return the user's model from the LRU cache, loading or training it
+        if needed. A model is stale once the user's labels version moves on
+        (rows changed category) or the number of labeled rows changes.
+        """
+        model = None
+        try:
+            version = (MODEL_FORMAT, os.stat(self.model_path).st_mtime_ns)
+            model = _load_cached(self.model_path, version)
+        except FileNotFoundError:
+            pass
+        if retrain_if_stale and (model is None or self.is_stale(model)):
+            model = self.train()
+        return model
+
+    def is_stale(self, model):
+        return model.labels_version != labels_version(self.user.pk) or model.n_samples != self.labeled_count()
+
+    def run(self, retrain_if_stale=True):
+        """
+        Predict categories for every uncategorized transaction; return the
+        stats dict. Requests pass ``retrain_if_stale=False`` and use the
+        model as it is: training is left to the import worker
+        (``retrain_stale_models``) and the categorize_transactions command.
+        """
+        stats = {'scanned': 0, 'categorized': 0, 'trained_on': 0}
+        model = self.get_model(retrain_if_stale)
+        if model is None:
+            return stats
+        stats['trained_on'] = model.n_samples
+
+        # Only the user's current categories may be assigned
+        valid = {c['id'] for c in user_categories(self.user.pk)}
+        assignments = defaultdict(list)
+        months = set()
+        pending = (
+            Transaction.objects
+            .filter(user=self.user, category__isnull=True)
+            .order_by('id')  # Served by txn_uncategorized_idx without a sort
+            .values_list('id', 'description', 'date')
+            .iterator(chunk_size=self.FETCH_SIZE)
+        )
+        batch = []
+        for row in pending:
+            batch.append(row)
+            if len(batch) >= self.PREDICT_BATCH:
+                self._predict_batch(model, batch, valid, assignments, months, stats)
+                batch = []
+        self._predict_batch(model, batch, valid, assignments, months, stats)
+
+        stats['categorized'] = write_assignments(
+            self.user, assignments, months, Transaction.SOURCE_MODEL, self.CHUNK_SIZE
+        )
+        return stats
+
+    def _predict_batch(self, model, batch, valid, assignments, months, stats):
+        if not batch:
+            return
+        ids, descriptions, dates = zip(*batch)
+        category_ids, confidence = model.predict(descriptions)
+        stats['scanned'] += len(batch)
+        for pk, date, category_id, score in zip(ids, dates, category_ids.tolist(), confidence.tolist()):
+            if score >= self.MIN_CONFIDENCE and category_id in valid:
+                assignments[category_id].append(pk)
+                months.add(month_start(date))
+
+
+def retrain_stale_models():
+    """
+    Retrain the model of every user whose labels changed since it was
+    trained; return the number retrained. Only users with a labels version
+    are looked at, so an idle pass costs a few small file reads.
+    """
+    retrained = 0
+    for user in User.objects.filter(pk__in=labeled_user_ids()).iterator():
+        categorizer = MLCategorizer(user)
+        model = categorizer.get_model(retrain_if_stale=False)
+        if model is None or model.labels_version != labels_version(user.pk):
+            retrained += categorizer.train() is not None
+    return retrained
@@ -1,6 +1,12 @@
+import re
+
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import User
 
+# \1, \g<1>, (?P<name>, (?P=name) and (?(1)...) inside a rule pattern, outside escapes
+RULE_GROUP_REFERENCE_RE = re.compile(r'(?<!\\)(?:\\\\)*(?:\\[1-9]|\\g<|\(\?P[<=]|\(\?\()')
+
 class Category(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='categories')
     name = models.CharField(max_length=50)
@@ -28,12 +34,91 @@ class DefaultCategory(models.Model):
         return self.name 
 
 
+class CategoryRule(models.Model):
+    """
+    Keyword or merchant pattern that assigns a category to matching
+    transactions during AI Sorting (UC 4.1).
+    """
+    MATCH_KEYWORD = 'keyword'
+    MATCH_PATTERN = 'pattern'
+    MATCH_CHOICES = [
+        (MATCH_KEYWORD, 'Keyword'),
+        (MATCH_PATTERN, 'Merchant pattern (regex)'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='category_rules')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='rules')
+    pattern = models.CharField(max_length=200, help_text="Keyword or regular expression to look for in the description")
+    match_type = models.CharField(max_length=10, choices=MATCH_CHOICES, default=MATCH_KEYWORD)
+    priority = models.IntegerField(default=0, help_text="Higher priority rules win when several match at the same position")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-priority', 'pattern']
+        unique_together = ('user', 'pattern', 'match_type')
+
+    def __str__(self):
+        return f"{self.pattern} -> {self.category}"
+
+    def clean(self):
+        if self.match_type == self.MATCH_PATTERN:
+            error = self.pattern_error(self.pattern)
+            if error:
+                raise ValidationError({'pattern': error})
+
+    @staticmethod
+    def pattern_error(pattern):
+        """
+        Why ``pattern`` cannot be a rule, or None. Rules are combined into
+        one alternation with a group around each (see pages/categorizer.py),
+        so the pattern is compiled the same way: inline flags must not be
+        global, and groups of its own cannot be referred to by number or name.
+        """
+        if RULE_GROUP_REFERENCE_RE.search(pattern):
+            return "Invalid pattern: back-references and named groups are not supported."
+        try:
+            re.compile(f'(?P<_rule>{pattern})')
+        except re.error as e:
+            if 'global flags' in str(e):
+                return "Invalid pattern: flags like (?i) are not supported; matching already ignores case."
+            return f"Invalid pattern: {e}"
+        return None
+
+
+class Merchant(models.Model):
+    """
+    Canonical merchant that raw bank descriptions are collapsed onto,
+    e.g. "SHELL GAS STATION #1234 LONDON" and "Shell Gas Station".
+    Shared by all users; see pages/merchants.py for the normalizer.
+    """
+    key = models.CharField(max_length=100, unique=True, help_text="Normalized merchant key")
+    name = models.CharField(max_length=100, help_text="Display name")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
 class Transaction(models.Model):
     """
     Transaction model for storing uploaded financial transactions.
     Each transaction is linked to a user (owner) and optionally to a category.
     Used by UC-3.1 (Upload Transaction CSV) and UC-3.2 (AI Sorting).
     """
+    # Who assigned the category; the ML model learns from manual labels only
+    SOURCE_MANUAL = 'manual'
+    SOURCE_RULE = 'rule'
+    SOURCE_MODEL = 'model'
+    SOURCE_CHOICES = [
+        (SOURCE_MANUAL, 'By hand'),
+        (SOURCE_RULE, 'By a rule'),
+        (SOURCE_MODEL, 'By the AI model'),
+    ]
+
     user = models.ForeignKey(
         User, 
         on_delete=models.CASCADE, 
@@ -46,8 +131,34 @@ class Transaction(models.Model):
         null=True, 
         blank=True,
         related_name='transactions',
+        # Served by txn_category_date_idx below, which leads with category
+        db_index=False,
         help_text="Category assigned by AI or user"
     )
+    category_source = models.CharField(
+        max_length=10,
+        choices=SOURCE_CHOICES,
+        default=SOURCE_MANUAL,
+        editable=False,
+        help_text="Who assigned the category"
+    )
+    merchant = models.ForeignKey(
+        Merchant,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='transactions',
+        help_text="Canonical merchant derived from the description"
+    )
+    import_batch = models.ForeignKey(
+        'ImportBatch',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='transactions',
+        help_text="Upload this transaction was imported in"
+    )
     date = models.DateField(help_text="Transaction date")
     description = models.CharField(max_length=255, help_text="Transaction description from bank")
     amount = models.DecimalField(
@@ -60,12 +171,297 @@ class Transaction(models.Model):
         blank=True,
         help_text="Optional notes or memo"
     )
+    fingerprint = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Content hash used to skip re-uploaded rows"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['-date', '-created_at']
         verbose_name = "Transaction"
         verbose_name_plural = "Transactions"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'fingerprint'],
+                name='unique_transaction_fingerprint'
+            ),
+        ]
+        indexes = [
+            # A user's transactions in the default (newest first) order
+            models.Index(fields=['user', '-date', '-created_at'], name='txn_user_date_idx'),
+            # Filtering a user's transactions by category and date range
+            models.Index(fields=['user', 'category', 'date'], name='txn_user_category_date_idx'),
+            # The AI Sorting queue: only uncategorized rows, walked in id order
+            models.Index(
+                fields=['user', 'id'],
+                condition=models.Q(category__isnull=True),
+                name='txn_uncategorized_idx'
+            ),
+            # A user's history with one merchant, for recurring-payment detection
+            models.Index(fields=['user', 'merchant', 'date'], name='txn_user_merchant_date_idx'),
+            # The admin changelist across all users: -date, -id order, date_hierarchy and its min/max
+            models.Index(fields=['date'], name='txn_date_idx'),
+            # ... and its "uncategorized" filter in that order; also the FK index for category
+            models.Index(fields=['category', 'date'], name='txn_category_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.date} - {self.description[:30]} ({self.amount})"
+
+
+class ImportBatch(models.Model):
+    """
+    One upload action and the transactions it created.
+    Holds summed row counters and a capped sample of row errors, so the
+    upload page can report on an import of any size by batch id alone.
+    """
+    # Row errors kept for display; the rest are only counted
+    MAX_ERROR_SAMPLES = 20
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='import_batches')
+    rows_parsed = models.PositiveIntegerField(default=0)
+    rows_inserted = models.PositiveIntegerField(default=0)
+    rows_rejected = models.PositiveIntegerField(default=0)
+    rows_duplicate = models.PositiveIntegerField(default=0)
+    error_samples = models.JSONField(default=list, blank=True, help_text="First few row errors")
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Import Batch"
+        verbose_name_plural = "Import Batches"
+
+    def __str__(self):
+        return f"Batch {self.pk} ({self.user})"
+
+    @property
+    def is_finished(self):
+        return self.finished_at is not None
+
+    def as_stats(self):
+        """Return counters in the shape upload_transactions.html expects."""
+        return {
+            'total_rows': self.rows_parsed,
+            'successful': self.rows_inserted,
+            'duplicates': self.rows_duplicate,
+            'rejected': self.rows_rejected,
+            'errors': self.error_samples,
+            'processed': self.is_finished,
+        }
+
+
+class ImportJob(models.Model):
+    """
+    Queued CSV import, processed outside the request by the
+    ``process_imports`` management command (database-backed queue).
+    The upload page polls its counters while the worker runs.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    # Claims before a job whose worker keeps dying is failed instead of requeued
+    MAX_ATTEMPTS = 3
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='import_jobs',
+        help_text="Owner of the imported transactions"
+    )
+    batch = models.ForeignKey(
+        ImportBatch,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='jobs',
+        help_text="Upload this file arrived in"
+    )
+    file = models.FileField(upload_to='imports/%Y/%m/', blank=True)
+    original_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    rows_parsed = models.PositiveIntegerField(default=0)
+    rows_inserted = models.PositiveIntegerField(default=0)
+    rows_rejected = models.PositiveIntegerField(default=0)
+    rows_duplicate = models.PositiveIntegerField(default=0, help_text="Rows skipped as already imported")
+    errors = models.JSONField(default=list, blank=True, help_text="First few row errors")
+    message = models.TextField(blank=True, help_text="Reason the job failed, if any")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0, help_text="Times a worker has claimed this job")
+    heartbeat_at = models.DateTimeField(
+        null=True, blank=True, help_text="Last sign of life from the worker running this job"
+    )
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Import Job"
+        verbose_name_plural = "Import Jobs"
+
+    def __str__(self):
+        return f"{self.original_name} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+    def as_stats(self):
+        """Return counters in the shape upload_transactions.html expects."""
+        return {
+            'total_rows': self.rows_parsed,
+            'successful': self.rows_inserted,
+            'duplicates': self.rows_duplicate,
+            'rejected': self.rows_rejected,
+            'errors': self.errors,
+            'processed': self.status == self.STATUS_DONE,
+        }
+
+
+class MonthlyRollup(models.Model):
+    """
+    Pre-aggregated transaction totals per (user, category, month) for the
+    Analytics Dashboard (UC 5.1). A NULL category holds uncategorized rows.
+    Maintained by pages/rollups.py whenever transactions are imported,
+    categorized, edited or deleted.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='monthly_rollups')
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='monthly_rollups'
+    )
+    month = models.DateField(help_text="First day of the month")
+    total = models.DecimalField(max_digits=14, decimal_places=2)
+    count = models.PositiveIntegerField()
+    min_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    max_amount = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        ordering = ['month']
+        unique_together = ('user', 'category', 'month')
+
+    def __str__(self):
+        return f"{self.user} {self.month:%Y-%m} {self.category or 'Uncategorized'}: {self.total}"
+
+
+class RecurringSeries(models.Model):
+    """
+    A detected subscription or other periodic payment: a run of a user's
+    transactions with one merchant, a similar amount and a regular
+    interval. Maintained by pages/recurring.py after each import, so the
+    dashboard reads it without recomputing.
+    """
+    CADENCE_WEEKLY = 'weekly'
+    CADENCE_MONTHLY = 'monthly'
+    CADENCE_ANNUAL = 'annual'
+    CADENCE_CHOICES = [
+        (CADENCE_WEEKLY, 'Weekly'),
+        (CADENCE_MONTHLY, 'Monthly'),
+        (CADENCE_ANNUAL, 'Annual'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recurring_series')
+    merchant = models.ForeignKey(Merchant, on_delete=models.CASCADE, related_name='recurring_series')
+    cadence = models.CharField(max_length=10, choices=CADENCE_CHOICES)
+    typical_amount = models.DecimalField(max_digits=10, decimal_places=2, help_text="Median amount")
+    min_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    max_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    occurrences = models.PositiveIntegerField()
+    first_date = models.DateField()
+    last_date = models.DateField()
+    next_date = models.DateField(help_text="When the next payment is expected")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['next_date']
+        verbose_name_plural = "Recurring series"
+        indexes = [
+            models.Index(fields=['user', 'merchant'], name='recurring_user_merchant_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.merchant} {self.get_cadence_display().lower()} {self.typical_amount}"
+
+
+class SpendingAnomaly(models.Model):
+    """
+    A transaction whose amount is far outside the recent normal range of
+    its category, as flagged by pages/anomalies.py. ``score`` is the
+    robust z-score: distance from the rolling median in MADs (negative
+    means more spent than usual for expenses).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='spending_anomalies')
+    transaction = models.OneToOneField(Transaction, on_delete=models.CASCADE, related_name='anomaly')
+    score = models.FloatField()
+    expected_amount = models.DecimalField(max_digits=10, decimal_places=2, help_text="Rolling median of the category")
+    typical_deviation = models.DecimalField(max_digits=10, decimal_places=2, help_text="Rolling MAD of the category")
+    detected_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-detected_at']
+        verbose_name_plural = "Spending anomalies"
+
+    def __str__(self):
+        return f"{self.transaction} (score {self.score:+.1f})"
+
+
+class BulkCategoryChange(models.Model):
+    """
+    The user's most recent bulk recategorization (see pages/bulk.py),
+    kept so it can be undone. Each affected transaction's previous
+    category is recorded in a BulkCategoryChangeItem.
+    """
+    KIND_MERGE = 'merge'
+    KIND_REASSIGN = 'reassign'
+    KIND_CHOICES = [
+        (KIND_MERGE, 'Merge categories'),
+        (KIND_REASSIGN, 'Reassign by description'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bulk_category_changes')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    summary = models.CharField(max_length=255)
+    target_category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+'
+    )
+    # A merged category is deleted; its id and name are kept to recreate it on undo
+    source_category_id = models.BigIntegerField(null=True, blank=True)
+    source_category_name = models.CharField(max_length=50, blank=True)
+    moved_rule_ids = models.JSONField(default=list, blank=True)
+    rows = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.summary
+
+
+class BulkCategoryChangeItem(models.Model):
+    """One transaction touched by a bulk change, and the category it had before."""
+    change = models.ForeignKey(BulkCategoryChange, on_delete=models.CASCADE, related_name='items')
+    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='+')
+    # Not a foreign key: the category may be deleted by the change (merge) and recreated on undo
+    previous_category_id = models.BigIntegerField(null=True)
+    previous_category_source = models.CharField(max_length=10, default=Transaction.SOURCE_MANUAL)
+
+    class Meta:
+        unique_together = ('change', 'transaction')
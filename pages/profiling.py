@@ -0,0 +1,142 @@
+"""
+Opt-in per-request profiling.
+Records wall time, database query count and time, and peak memory for
+every request, and reports them as a ``Server-Timing`` header (shown in
+the browser's network panel) and as one JSON log line on the
+``pages.profiling`` logger. A sampled share of requests can also run
+under cProfile; the profile is kept only if the request was slow.
+
+Enabled with ``REQUEST_PROFILING = True`` (env ``REQUEST_PROFILING=1``).
+When disabled the middleware removes itself from the stack at startup,
+so it costs nothing per request.
+"""
+import cProfile
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+
+def peak_rss_mb():
+    """High-water mark of this process's resident memory, in MB."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class QueryTimer:
+    """Execute wrapper that counts queries and adds up their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+class RequestProfilingMiddleware:
+    """
+    Times each request and the queries it runs on every database alias.
+    Memory is the process RSS high-water mark and how much this request
+    raised it; with several threads serving at once the growth can belong
+    to a neighbouring request. Streaming responses are measured up to the
+    point the view returns, not until the body is sent.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'REQUEST_PROFILING_SLOW_MS', 500)
+        self.sample_rate = getattr(settings, 'REQUEST_PROFILING_SAMPLE_RATE', 0.0)
+        self.profile_dir = getattr(settings, 'REQUEST_PROFILING_DIR', None)
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        profiler = cProfile.Profile() if self._sampled() else None
+        rss_before = peak_rss_mb()
+        started = time.perf_counter()
+        wrappers = [connection.execute_wrapper(timer) for connection in connections.all()]
+        for wrapper in wrappers:
+            wrapper.__enter__()
+        try:
+            if profiler is not None:
+                profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+        finally:
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        record = self._record(request, response, elapsed_ms, timer, rss_before)
+        if profiler is not None and elapsed_ms >= self.slow_ms:
+            record['profile'] = self._dump(profiler, record)
+        response['Server-Timing'] = self._server_timing(record)
+        log = logger.warning if elapsed_ms >= self.slow_ms else logger.info
+        log(json.dumps(record), extra={'profile': record})
+        return response
+
+    def _sampled(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _record(self, request, response, elapsed_ms, timer, rss_before):
+        match = request.resolver_match
+        rss_after = peak_rss_mb()
+        return {
+            'method': request.method,
+            'path': request.path,
+            # Dotted path of the view, e.g. pages.views.TransactionUploadView
+            'view': match._func_path if match else None,
+            'status': response.status_code,
+            'user_id': getattr(getattr(request, 'user', None), 'pk', None),
+            'total_ms': round(elapsed_ms, 1),
+            'db_queries': timer.count,
+            'db_ms': round(timer.seconds * 1000, 1),
+            'peak_rss_mb': rss_after,
+            'rss_growth_mb': round(rss_after - rss_before, 1) if rss_after is not None else None,
+        }
+
+    @staticmethod
+    def _server_timing(record):
+        metrics = [
+            f"total;dur={record['total_ms']}",
+            f'db;dur={record["db_ms"]};desc="{record["db_queries"]} queries"',
+        ]
+        if record['peak_rss_mb'] is not None:
+            metrics.append(f'mem;desc="peak RSS {record["peak_rss_mb"]} MB (+{record["rss_growth_mb"]})"')
+        return ', '.join(metrics)
+
+    def _dump(self, profiler, record):
+        """Save the profile of a slow request for ``python -m pstats``; return its path."""
+        if not self.profile_dir:
+            return None
+        os.makedirs(self.profile_dir, exist_ok=True)
+        view = (record['view'] or 'unresolved').rsplit('.', 1)[-1]
+        path = os.path.join(self.profile_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{view}-{time.time_ns() % 10 ** 6}.prof")
+        profiler.dump_stats(path)
+        return path
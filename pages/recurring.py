@@ -0,0 +1,120 @@
+"""
+Detection of recurring payments (subscriptions, rent, salary).
+A user's transactions are grouped by canonical merchant, then split
+into amount bands (amounts within 20% of each other, same sign). Each
+band's sorted dates are checked for a regular weekly, monthly or annual
+interval. Imports report the merchants they touched and only those
+groups are re-examined, so the cost follows the size of the upload.
+"""
+import datetime
+import statistics
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+
+from .models import RecurringSeries, Transaction
+
+# cadence: (typical interval in days, tolerance in days, minimum occurrences)
+CADENCES = {
+    RecurringSeries.CADENCE_WEEKLY: (7, 1, 4),
+    RecurringSeries.CADENCE_MONTHLY: (30.4, 4, 3),
+    RecurringSeries.CADENCE_ANNUAL: (365.25, 10, 2),
+}
+# Amounts more than this fraction above the smallest in a band start a new band
+AMOUNT_TOLERANCE = Decimal('0.2')
+# Share of intervals that must fit the cadence (one missed or extra payment is fine)
+MIN_REGULAR_SHARE = 0.75
+
+
+def amount_bands(rows):
+    """Split (date, amount) rows into bands of similar amount with the same sign."""
+    bands = []
+    for negative in (True, False):
+        same_sign = sorted((r for r in rows if (r[1] < 0) == negative), key=lambda r: abs(r[1]))
+        band = []
+        for row in same_sign:
+            if band and abs(row[1]) > abs(band[0][1]) * (1 + AMOUNT_TOLERANCE):
+                bands.append(band)
+                band = []
+            band.append(row)
+        if band:
+            bands.append(band)
+    return bands
+
+
+def detect_cadence(dates):
+    """Return the cadence of a sorted list of distinct dates, or None."""
+    deltas = [(b - a).days for a, b in zip(dates, dates[1:])]
+    if not deltas:
+        return None
+    median = statistics.median(deltas)
+    for cadence, (interval, tolerance, minimum) in CADENCES.items():
+        if len(dates) < minimum or abs(median - interval) > tolerance:
+            continue
+        regular = sum(1 for d in deltas if abs(d - interval) <= tolerance)
+        if regular >= MIN_REGULAR_SHARE * len(deltas):
+            return cadence
+    return None
+
+
+def detect_series(user_id, merchant_id, rows):
+    """Return unsaved RecurringSeries for one merchant's (date, amount) rows."""
+    series = []
+    for band in amount_bands(rows):
+        dates = sorted({date for date, _ in band})
+        cadence = detect_cadence(dates)
+        if cadence is None:
+            continue
+        amounts = sorted(amount for _, amount in band)
+        interval = CADENCES[cadence][0]
+        series.append(RecurringSeries(
+            user_id=user_id,
+            merchant_id=merchant_id,
+            cadence=cadence,
+            typical_amount=amounts[len(amounts) // 2],
+            min_amount=amounts[0],
+            max_amount=amounts[-1],
+            occurrences=len(band),
+            first_date=dates[0],
+            last_date=dates[-1],
+            next_date=dates[-1] + datetime.timedelta(days=round(interval)),
+        ))
+    return series
+
+
+def refresh_recurring_series(user_id, merchant_ids):
+    """Re-detect the series of ``user_id`` for the given merchants."""
+    merchant_ids = {m for m in merchant_ids if m is not None}
+    if not merchant_ids:
+        return
+    history = defaultdict(list)
+    rows = (
+        Transaction.objects
+        .filter(user_id=user_id, merchant_id__in=merchant_ids)
+        .order_by()
+        .values_list('merchant_id', 'date', 'amount')
+    )
+    for merchant_id, date, amount in rows.iterator(chunk_size=5000):
+        history[merchant_id].append((date, amount))
+
+    detected = []
+    for merchant_id, merchant_rows in history.items():
+        detected.extend(detect_series(user_id, merchant_id, merchant_rows))
+    with transaction.atomic():
+        RecurringSeries.objects.filter(user_id=user_id, merchant_id__in=merchant_ids).delete()
+        RecurringSeries.objects.bulk_create(detected)
+
+
+def rebuild_recurring_series(user_id):
+    """Re-detect every series in a user's history."""
+    merchant_ids = (
+        Transaction.objects
+        .filter(user_id=user_id, merchant__isnull=False)
+        .order_by()
+        .values_list('merchant_id', flat=True)
+        .distinct()
+    )
+    with transaction.atomic():
+        RecurringSeries.objects.filter(user_id=user_id).delete()
+        refresh_recurring_series(user_id, list(merchant_ids))
@@ -0,0 +1,165 @@
+"""
+Maintenance of the MonthlyRollup table.
+Every write path that changes a transaction's amount, date or category
+reports the (user, month) pairs it touched; only those months are
+re-aggregated, so the cost follows the size of the change rather than
+the size of the user's history. Bulk category changes adjust the rollups
+by difference instead (``move_in_rollups``). Since every such path ends
+here, this is also where the user's cached LedgerSnapshot is invalidated.
+"""
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+
+from .ledger import invalidate_ledger
+from .models import MonthlyRollup, Transaction
+
+
+def month_start(date):
+    return date.replace(day=1)
+
+
+def next_month(month):
+    return (month + datetime.timedelta(days=32)).replace(day=1)
+
+
+def refresh_monthly_rollups(user_id, months):
+    """Recompute the rollups of ``user_id`` for the given months."""
+    months = sorted({month_start(m) for m in months})
+    if not months:
+        return
+    invalidate_ledger(user_id)
+    rollups = _aggregate(user_id, months)
+    with transaction.atomic():
+        MonthlyRollup.objects.filter(user_id=user_id, month__in=months).delete()
+        MonthlyRollup.objects.bulk_create(rollups.values())
+
+
+def move_in_rollups(user_id, moves):
+    """
+    Update the rollups of ``user_id`` after rows changed category, their
+    dates and amounts unchanged. ``moves`` holds, per group of moved rows,
+    (date, from category id, to category id, total, count, min amount,
+    max amount) aggregated before the move.
+
+    Totals and counts are adjusted by the difference and the receiving
+    side's min/max widened, without reading the moved rows again. Only a
+    (month, category) that gave away its smallest or largest amount is
+    re-aggregated from the transactions.
+    """
+    added, removed = {}, {}
+    for date, from_id, to_id, total, count, min_amount, max_amount in moves:
+        if from_id == to_id:
+            continue
+        month = month_start(date)
+        for side, key in ((added, (month, to_id)), (removed, (month, from_id))):
+            stats = side.get(key)
+            side[key] = (total, count, min_amount, max_amount) if stats is None else (
+                stats[0] + total, stats[1] + count, min(stats[2], min_amount), max(stats[3], max_amount)
+            )
+    keys = added.keys() | removed.keys()
+    if not keys:
+        return
+    invalidate_ledger(user_id)
+    existing = {
+        (rollup.month, rollup.category_id): rollup
+        for rollup in MonthlyRollup.objects.filter(user_id=user_id, month__in={month for month, _ in keys})
+    }
+    changed, created, emptied, stale = [], [], [], set()
+    for key in keys:
+        rollup = existing.get(key)
+        gained, lost = added.get(key), removed.get(key)
+        if rollup is None:
+            if lost or gained is None:
+                stale.add(key)  # Out of step already; count it again
+                continue
+            rollup = MonthlyRollup(
+                user_id=user_id, month=key[0], category_id=key[1],
+                total=gained[0], count=gained[1], min_amount=gained[2], max_amount=gained[3],
+            )
+            created.append(rollup)
+            continue
+        if lost:
+            rollup.total -= lost[0]
+            rollup.count -= lost[1]
+            if rollup.count <= 0 and not gained:
+                emptied.append(rollup.pk)
+                continue
+            if rollup.count <= 0 or lost[2] <= rollup.min_amount or lost[3] >= rollup.max_amount:
+                stale.add(key)
+                continue
+        if gained:
+            rollup.total += gained[0]
+            rollup.count += gained[1]
+            rollup.min_amount = min(rollup.min_amount, gained[2])
+            rollup.max_amount = max(rollup.max_amount, gained[3])
+        changed.append(rollup)
+    if stale:
+        fresh = _aggregate(user_id, {month for month, _ in stale}, {category_id for _, category_id in stale})
+        emptied += [existing[key].pk for key in stale if key in existing]
+        created += [fresh[key] for key in stale if key in fresh]
+    with transaction.atomic():
+        MonthlyRollup.objects.filter(pk__in=emptied).delete()
+        MonthlyRollup.objects.bulk_update(changed, ['total', 'count', 'min_amount', 'max_amount'])
+        MonthlyRollup.objects.bulk_create(created)
+
+
+def _aggregate(user_id, months, category_ids=None):
+    """
+    Fresh, unsaved rollups of ``user_id`` for ``months`` (first days), keyed
+    by (month, category id); only for ``category_ids`` if given (None is
+    the uncategorized rollup).
+    """
+    months = sorted(months)
+    # Aggregate per day in SQL and fold the days into months here: grouping
+    # by TruncMonth would call a Python function for every row on SQLite
+    daily = (
+        Transaction.objects
+        .filter(user_id=user_id, date__gte=months[0], date__lt=next_month(months[-1]))
+        .order_by()
+        .values('date', 'category_id')
+        .annotate(
+            total=Sum('amount'),
+            count=Count('id'),
+            min_amount=Min('amount'),
+            max_amount=Max('amount'),
+        )
+    )
+    if category_ids is not None:
+        category_filter = Q(category_id__in=[c for c in category_ids if c is not None])
+        if None in category_ids:
+            category_filter |= Q(category__isnull=True)
+        daily = daily.filter(category_filter)
+    wanted = set(months)
+    rollups = {}
+    for row in daily:
+        month = month_start(row['date'])
+        if month not in wanted:
+            continue
+        key = (month, row['category_id'])
+        rollup = rollups.get(key)
+        if rollup is None:
+            rollups[key] = MonthlyRollup(
+                user_id=user_id,
+                month=month,
+                category_id=row['category_id'],
+                total=row['total'],
+                count=row['count'],
+                min_amount=row['min_amount'],
+                max_amount=row['max_amount'],
+            )
+        else:
+            rollup.total += row['total']
+            rollup.count += row['count']
+            rollup.min_amount = min(rollup.min_amount, row['min_amount'])
+            rollup.max_amount = max(rollup.max_amount, row['max_amount'])
+    return rollups
+
+
+def rebuild_monthly_rollups(user_id):
+    """Recompute every month of a user's history."""
+    months = Transaction.objects.filter(user_id=user_id).dates('date', 'month')
+    with transaction.atomic():
+        MonthlyRollup.objects.filter(user_id=user_id).delete()
+        refresh_monthly_rollups(user_id, months)
@@ -0,0 +1,78 @@
+"""
+Full-text transaction search on SQLite FTS5.
+Migration 0012 creates ``pages_transaction_fts``, an index over
+Transaction.description and notes that triggers keep in sync. Queries
+are matched token by token with prefix matching ("star" finds
+"STARBUCKS") and ranked with bm25, description weighted above notes.
+On databases without FTS5 the search falls back to ``icontains``.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Transaction
+
+FTS_TABLE = 'pages_transaction_fts'
+# bm25 column weights: description, notes
+RANK = f"bm25({FTS_TABLE}, 4.0, 1.0)"
+MAX_TOKENS = 8
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def build_match(query):
+    """
+    Turn free text into an FTS5 MATCH expression, or '' if it has no tokens.
+    Every token is quoted (so FTS5 operators in user input are inert) and
+    prefix-matched; tokens are ANDed.
+    """
+    tokens = _TOKEN_RE.findall(query.lower())[:MAX_TOKENS]
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def matching_ids(match):
+    """Subquery of the ids of every transaction matching ``match``, for ``id__in``."""
+    return RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (match,))
+
+
+class TransactionSearch:
+    """Ranked search over one user's transactions."""
+    DEFAULT_LIMIT = 20
+    COLUMNS = ('id', 'date', 'description', 'amount', 'notes', 'category_id', 'category__name')
+
+    def __init__(self, user):
+        self.user = user
+
+    def search(self, query, limit=None):
+        """Return up to ``limit`` rows (dicts of COLUMNS), best match first."""
+        limit = limit or self.DEFAULT_LIMIT
+        match = build_match(query)
+        if not match:
+            return []
+        if not fts_available():
+            return list(
+                Transaction.objects
+                .filter(user=self.user, description__icontains=query.strip())
+                .order_by('-date', '-id')
+                .values(*self.COLUMNS)[:limit]
+            )
+        ids = self._ranked_ids(match, limit)
+        rows = {row['id']: row for row in Transaction.objects.filter(id__in=ids).values(*self.COLUMNS)}
+        return [rows[pk] for pk in ids if pk in rows]
+
+    def _ranked_ids(self, match, limit):
+        # The MATCH runs on the index; the join only checks ownership
+        sql = (
+            f"SELECT t.id FROM {FTS_TABLE} f "
+            f"JOIN {Transaction._meta.db_table} t ON t.id = f.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s AND t.user_id = %s "
+            f"ORDER BY {RANK} LIMIT %s"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [match, self.user.pk, limit])
+            return [row[0] for row in cursor.fetchall()]
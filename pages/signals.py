@@ -0,0 +1,99 @@
+"""
+Signal handlers for the Pages app.
+Bulk paths (import, categorizers) refresh rollups explicitly; these
+handlers cover single-row edits made through the admin or ORM, and
+invalidate the cached category metadata when it changes.
+"""
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .category_cache import invalidate_defaults, invalidate_user
+from .labels import bump_labels_version
+from .models import Category, CategoryRule, DefaultCategory, Transaction
+from .rollups import month_start, refresh_monthly_rollups
+
+# (database alias) -> {user_id: months} of Transaction rows deleted but not yet refreshed
+_deleted = threading.local()
+
+
+@receiver(pre_save, sender=Transaction)
+def remember_previous_month(sender, instance, raw=False, **kwargs):
+    """
+    Note where the row used to be counted, in case date or owner change,
+    and its category. A category changed through save() is a hand
+    correction: the rules and the model write theirs with update().
+    """
+    instance._previous_rollup_key = None
+    instance._previous_category_id = None
+    if raw or instance.pk is None:
+        return
+    previous = Transaction.objects.filter(pk=instance.pk).values('user_id', 'date', 'category_id').first()
+    if previous:
+        instance._previous_rollup_key = (previous['user_id'], month_start(previous['date']))
+        instance._previous_category_id = previous['category_id']
+        if instance.category_id != previous['category_id']:
+            instance.category_source = Transaction.SOURCE_MANUAL
+
+
+@receiver(post_save, sender=Transaction)
+def refresh_rollups_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_rollup_key', None)
+    if previous and previous != (instance.user_id, month_start(instance.date)):
+        refresh_monthly_rollups(previous[0], [previous[1]])
+    refresh_monthly_rollups(instance.user_id, [instance.date])
+    if previous and instance.category_id != getattr(instance, '_previous_category_id', None):
+        # A hand correction; the user's ML model should learn it
+        bump_labels_version(instance.user_id)
+
+
+@receiver(post_delete, sender=Transaction)
+def refresh_rollups_on_delete(sender, instance, using, **kwargs):
+    """
+    Note the row's month; the months are refreshed once per (user, month)
+    when the delete commits, not once per row. Deleting 100k rows (admin
+    "delete selected", or a whole user) would otherwise re-aggregate a
+    month for every row.
+    """
+    pending = _deleted.__dict__.setdefault(using, defaultdict(set))
+    pending[instance.user_id].add(month_start(instance.date))
+    # Registered per row: after a rollback drops the callback, the next
+    # delete still gets one. The first to run does the work, the rest find nothing.
+    transaction.on_commit(lambda: refresh_deleted_months(using), using=using)
+
+
+def refresh_deleted_months(using):
+    for user_id, months in _deleted.__dict__.pop(using, {}).items():
+        refresh_monthly_rollups(user_id, months)
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_months(sender, instance, **kwargs):
+    """Its transactions fall back to uncategorized (SET_NULL); note their months."""
+    instance._rollup_months = list(
+        Transaction.objects.filter(category=instance).dates('date', 'month')
+    )
+
+
+@receiver(post_delete, sender=Category)
+def refresh_rollups_on_category_delete(sender, instance, **kwargs):
+    refresh_monthly_rollups(instance.user_id, getattr(instance, '_rollup_months', []))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=CategoryRule)
+@receiver(post_delete, sender=CategoryRule)
+def invalidate_user_category_cache(sender, instance, **kwargs):
+    invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=DefaultCategory)
+@receiver(post_delete, sender=DefaultCategory)
+def invalidate_default_category_cache(sender, instance, **kwargs):
+    invalidate_defaults()
@@ -0,0 +1,130 @@
+"""
+Synthetic bank statements for benchmarks and load tests.
+Generates CSV files in the layout the importer accepts, with the mess
+real exports have: day-first, month-first and ISO dates, currency
+symbols and thousands separators, comma decimals, repeated rows and a
+share of invalid rows. Output is written row by row, so a 1M-row file
+never has to fit in memory.
+"""
+import csv
+import datetime
+import random
+
+MERCHANTS = [
+    "Netflix Subscription", "Trader Joe's", "Shell Gas Station", "Spotify Premium",
+    "Salary Deposit", "Amazon.com", "Uber Ride", "Starbucks", "Target Store",
+    "Electric Bill", "Freelance Payment", "Local Italian Restaurant", "Gym Membership",
+    "Apple Services", "Whole Foods Market", "Cinema City", "Chevron Gas", "Udemy Course",
+    "Internet Provider", "Rent Payment", "CVS Pharmacy", "Airbnb Booking", "Coffee Shop",
+]
+PREFIXES = ["", "", "", "POS ", "SQ *", "PAYPAL *", "DD "]
+CITIES = ["", "", "LONDON", "NEW YORK", "LEEDS", "SEATTLE", "AUSTIN", "BRISTOL"]
+
+# strftime pattern per date style; 'iso' rows may appear in any file
+DATE_STYLES = {
+    'iso': '%Y-%m-%d',
+    'dmy': '%d/%m/%Y',
+    'mdy': '%m/%d/%Y',
+}
+CURRENCY_SYMBOLS = ['', '$', '£', '€']
+
+
+class StatementGenerator:
+    """
+    Writes one synthetic statement.
+    ``date_style`` and ``decimal_comma`` are fixed per file (as with a real
+    bank export); ``bad_ratio`` of the rows are invalid and
+    ``duplicate_ratio`` repeat an earlier row exactly.
+    """
+
+    def __init__(self, seed=0, date_style='dmy', decimal_comma=False, bad_ratio=0.01,
+                 duplicate_ratio=0.01, iso_ratio=0.05, with_notes=True):
+        self.rng = random.Random(seed)
+        self.date_style = date_style
+        self.decimal_comma = decimal_comma
+        self.bad_ratio = bad_ratio
+        self.duplicate_ratio = duplicate_ratio
+        self.iso_ratio = iso_ratio
+        self.with_notes = with_notes
+        self.start = datetime.date(2022, 1, 1)
+
+    def header(self):
+        columns = ['Date', 'Description', 'Amount']
+        if self.with_notes:
+            columns.append('Notes')
+        return columns
+
+    def rows(self, count):
+        """Yield ``count`` rows as lists of strings."""
+        rng = self.rng
+        previous = None
+        for index in range(count):
+            roll = rng.random()
+            if previous is not None and roll < self.duplicate_ratio:
+                yield previous
+                continue
+            if roll < self.duplicate_ratio + self.bad_ratio:
+                yield self._bad_row()
+                continue
+            row = [self._date(index, count), self._description(), self._amount()]
+            if self.with_notes:
+                row.append('' if rng.random() < 0.8 else f"ref {rng.randrange(10 ** 6)}")
+            previous = row
+            yield row
+
+    def write(self, fh, count):
+        """Write the header and ``count`` rows as CSV text to ``fh``."""
+        writer = csv.writer(fh)
+        writer.writerow(self.header())
+        writer.writerows(self.rows(count))
+
+    def _date(self, index, count):
+        # Spread rows over two years in order, like a statement
+        day = self.start + datetime.timedelta(days=index * 730 // max(count, 1))
+        style = 'iso' if self.rng.random() < self.iso_ratio else self.date_style
+        return day.strftime(DATE_STYLES[style])
+
+    def _description(self):
+        rng = self.rng
+        text = rng.choice(PREFIXES) + rng.choice(MERCHANTS)
+        if rng.random() < 0.5:
+            text += f" #{rng.randrange(1, 9999)}"
+        city = rng.choice(CITIES)
+        if city:
+            text += f" {city}"
+        return text.upper() if rng.random() < 0.5 else text
+
+    def _amount(self):
+        rng = self.rng
+        value = rng.uniform(-2500, 2500) if rng.random() < 0.9 else rng.uniform(-50000, 50000)
+        text = f"{value:,.2f}"
+        if self.decimal_comma:
+            text = text.replace(',', ' ').replace('.', ',').replace(' ', '.')
+        elif rng.random() < 0.5:
+            text = text.replace(',', '')
+        symbol = rng.choice(CURRENCY_SYMBOLS)
+        if symbol:
+            text = f"-{symbol}{text[1:]}" if text.startswith('-') else f"{symbol}{text}"
+        return text
+
+    def _bad_row(self):
+        rng = self.rng
+        row = [self._date(0, 1), self._description(), self._amount()]
+        kind = rng.randrange(3)
+        if kind == 0:
+            row[0] = rng.choice(['31/02/2024', 'yesterday', '2024-13-01', ''])
+        elif kind == 1:
+            row[1] = ''
+        else:
+            row[2] = rng.choice(['N/A', '--5', 'abc', ''])
+        if self.with_notes:
+            row.append('')
+        return row
+
+
+def write_statement(path, rows, seed=0, **options):
+    """Write a synthetic statement of ``rows`` data rows to ``path``."""
+    generator = StatementGenerator(seed=seed, **options)
+    with open(path, 'w', newline='', encoding='utf-8') as fh:
+        generator.write(fh, rows)
+    return path
@@ -1,3 +1,661 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import json
+import os
+import tempfile
+import unittest
+import zipfile
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from .anomalies import ANOMALIES_AVAILABLE, rolling_median_mad
+from .browse import InvalidCursor, TransactionBrowser
+from .bulk import CategoryBulkEditor
+from .categorizer import CompiledRuleSet, RuleCategorizer
+from .category_cache import user_categories
+from .export import TransactionExporter
+from .importer import TransactionImporter
+from .jobs import ImportJobRunner, enqueue_upload
+from .ledger import LEDGER_AVAILABLE, LedgerSnapshot, get_ledger, invalidate_ledger
+from .ml_categorizer import ML_AVAILABLE, MLCategorizer, retrain_stale_models
+from .models import (
+    Category, CategoryRule, ImportBatch, ImportJob, Merchant, MonthlyRollup, RecurringSeries, Transaction,
+)
+from .parsers import CSVRowParser, make_fingerprint
+from .recurring import detect_series, refresh_recurring_series
+from .rollups import rebuild_monthly_rollups
+from .search import TransactionSearch, fts_available
+from .uploads import ImportUploadHandler, RejectedUpload
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN is SQLite-specific")
+class TransactionIndexUsageTests(TestCase):
+    """
+    Guards the composite indexes on Transaction: each key per-user query
+    must be answered by its index, without a full scan or a separate sort.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('indexes')
+        cls.category = Category.objects.create(user=cls.user, name='Groceries')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(f"USING INDEX {index_name}", plan)
+        self.assertNotIn("SCAN pages_transaction", plan)
+        self.assertNotIn("USE TEMP B-TREE", plan)
+
+    def test_recent_transactions_use_user_date_index(self):
+        queryset = Transaction.objects.filter(user=self.user)[:50]
+        self.assertUsesIndex(queryset, 'txn_user_date_idx')
+
+    def test_date_range_uses_user_date_index(self):
+        queryset = Transaction.objects.filter(
+            user=self.user,
+            date__gte=datetime.date(2024, 1, 1),
+            date__lt=datetime.date(2024, 2, 1),
+        )
+        self.assertUsesIndex(queryset, 'txn_user_date_idx')
+
+    def test_category_filter_uses_user_category_date_index(self):
+        queryset = Transaction.objects.filter(
+            user=self.user,
+            category=self.category,
+            date__gte=datetime.date(2024, 1, 1),
+        ).order_by('date')
+        self.assertUsesIndex(queryset, 'txn_user_category_date_idx')
+
+    def test_browser_cursor_page_seeks_on_user_date_index(self):
+        cursor = TransactionBrowser.encode_cursor({
+            'date': datetime.date(2024, 1, 1),
+            'created_at': datetime.datetime(2024, 1, 2, 9, 30, tzinfo=datetime.timezone.utc),
+            'id': 1000,
+        })
+        plan = TransactionBrowser(self.user)._page_rows(cursor, 51).explain()
+        # A range on date, not just user_id=?, so deep pages do not walk every newer row
+        self.assertIn("USING INDEX txn_user_date_idx (user_id=? AND date<?)", plan)
+        self.assertNotIn("SCAN pages_transaction", plan)
+        # Only ties on (date, created_at) are sorted by id, never the whole result
+        self.assertNotIn("USE TEMP B-TREE FOR ORDER BY", plan)
+
+    def test_sorting_queue_uses_partial_uncategorized_index(self):
+        queryset = (
+            Transaction.objects
+            .filter(user=self.user, category__isnull=True)
+            .order_by('id')
+            .values_list('id', 'description', 'date')
+        )
+        self.assertUsesIndex(queryset, 'txn_uncategorized_idx')
+
+
+class CSVRowParserTests(SimpleTestCase):
+    """The per-file date order and decimal separator are detected correctly."""
+
+    def parse(self, lines):
+        parser = CSVRowParser(user_id=1)
+        data = ('\n'.join(lines) + '\n').encode()
+        # Small chunks, so rows straddle chunk boundaries
+        rows = list(parser.parse(data[i:i + 100] for i in range(0, len(data), 100)))
+        return rows, parser.stats
+
+    def test_month_first_order_settled_after_the_sniff_sample(self):
+        # Sorted by date: the first 2,400 rows are all on days 1-12 and read either way
+        days = [datetime.date(2022, 1, 1 + i // 200) for i in range(2400)]
+        days.append(datetime.date(2022, 1, 13))
+        rows, stats = self.parse(
+            ['Date,Description,Amount']
+            + [f"{day.strftime('%m/%d/%Y')},Coffee {i},-3.50" for i, day in enumerate(days)]
+        )
+        self.assertEqual(stats['rejected'], 0)
+        self.assertEqual([row[0] for row in rows], days)
+
+    def test_day_first_when_no_row_settles_the_order(self):
+        rows, stats = self.parse(['Date,Description,Amount', '03/04/2024,Coffee,-3.50'])
+        self.assertEqual(stats['rejected'], 0)
+        self.assertEqual(rows[0][0], datetime.date(2024, 4, 3))
+
+    def test_iso_rows_are_not_held_back_by_an_undecided_order(self):
+        rows, _ = self.parse(['Date,Description,Amount', '2024-01-05,Rent,-900', '04/01/2024,Gym,-30', '25/01/2024,Tea,-2'])
+        self.assertEqual([row[0] for row in rows], [
+            datetime.date(2024, 1, 5), datetime.date(2024, 1, 4), datetime.date(2024, 1, 25),
+        ])
+
+    def test_decimal_comma_amounts(self):
+        rows, stats = self.parse([
+            'Date,Description,Amount',
+            '2024-01-01,Rent,"-1.234,56"',
+            '2024-01-02,Coffee,"€3,50"',
+            '2024-01-03,Refund,"12,5"',
+        ])
+        self.assertEqual(stats['rejected'], 0)
+        self.assertEqual([row[2] for row in rows], [Decimal('-1234.56'), Decimal('3.50'), Decimal('12.5')])
+
+    def test_decimal_point_amounts_with_thousands_separators(self):
+        rows, _ = self.parse(['Date,Description,Amount', '2024-01-01,Salary,"$2,500.00"', '2024-01-02,Tea,-2.5'])
+        self.assertEqual([row[2] for row in rows], [Decimal('2500.00'), Decimal('-2.5')])
+
+    def test_plain_amounts_still_clean_a_decorated_row_and_refuse_nan(self):
+        # More plain rows than the sniff sample, so the decorated ones come after it
+        lines = ['Date,Description,Amount'] + ['2024-01-01,Tea,-2.50'] * (CSVRowParser.SNIFF_ROWS + 1)
+        rows, stats = self.parse(lines + ['2024-01-21,Salary,"$2,500.00"', '2024-01-22,Odd,NaN'])
+        self.assertEqual(stats['rejected'], 1)
+        self.assertEqual([row[2] for row in rows[-2:]], [Decimal('-2.50'), Decimal('2500.00')])
+
+    def test_identical_rows_get_distinct_fingerprints(self):
+        # Two coffees on the 2nd, and the 1st coming back in a file not grouped by date
+        rows, _ = self.parse([
+            'Date,Description,Amount',
+            '2024-01-01,Coffee,-3.50', '2024-01-02,Coffee,-3.50', '2024-01-02,Coffee,-3.50',
+            '2024-01-01,Coffee,-3.50',
+        ])
+        fingerprints = [row[4] for row in rows]
+        self.assertEqual(len(set(fingerprints)), 4)
+        # The first of each is the plain content hash, as on any other upload
+        self.assertEqual(fingerprints[1], make_fingerprint(1, datetime.date(2024, 1, 2), 'Coffee', Decimal('-3.50')))
+        self.assertEqual(fingerprints[2], make_fingerprint(1, datetime.date(2024, 1, 2), 'Coffee', Decimal('-3.50'), 1))
+
+
+class CategoryRulePatternTests(SimpleTestCase):
+    """Rule patterns must still work once combined into one alternation."""
+
+    def test_rejects_global_flags_and_group_references(self):
+        for pattern in ('(?i)shell', r'(a)\1', '(?P<brand>shell)', '(a)(?P=a)'):
+            with self.subTest(pattern=pattern):
+                self.assertIsNotNone(CategoryRule.pattern_error(pattern))
+
+    def test_accepts_ordinary_patterns(self):
+        for pattern in (r'\bshell\b', 'uber|lyft', '(?i:bp)', r'\\1'):
+            with self.subTest(pattern=pattern):
+                self.assertIsNone(CategoryRule.pattern_error(pattern))
+
+    def test_ruleset_skips_a_rule_that_breaks_the_alternation(self):
+        ruleset = CompiledRuleSet([('(?i)shell', 1), (r'\bbp\b', 2)])
+        self.assertEqual(ruleset.size, 1)
+        self.assertEqual(ruleset.match('BP Station'), 2)
+
+
+class StaleImportJobTests(TestCase):
+    """Jobs left running by a worker that died are requeued, then failed."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('importer')
+        self.batch = ImportBatch.objects.create(user=self.user)
+        self.runner = ImportJobRunner()
+
+    def running_job(self, attempts, idle):
+        return ImportJob.objects.create(
+            user=self.user, batch=self.batch, original_name='statement.csv',
+            status=ImportJob.STATUS_RUNNING, attempts=attempts,
+            heartbeat_at=timezone.now() - idle,
+        )
+
+    def test_requeues_a_job_whose_worker_stopped(self):
+        job = self.running_job(1, self.runner.timeout * 2)
+        self.assertEqual(self.runner.recover_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_PENDING)
+
+    def test_leaves_a_job_with_a_recent_heartbeat(self):
+        job = self.running_job(1, self.runner.timeout / 2)
+        self.assertEqual(self.runner.recover_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_RUNNING)
+
+    def test_fails_a_job_after_too_many_attempts_and_finishes_its_batch(self):
+        job = self.running_job(ImportJob.MAX_ATTEMPTS, self.runner.timeout * 2)
+        self.runner.recover_stale()
+        job.refresh_from_db()
+        self.batch.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_FAILED)
+        self.assertTrue(self.batch.is_finished)
+
+    def test_a_retry_refreshes_the_months_the_dead_worker_committed(self):
+        csv = b'Date,Description,Amount\n2024-01-05,Rent,-900\n2024-02-05,Rent,-900\n'
+        TransactionImporter(self.user, import_batch=self.batch).run(SimpleUploadedFile('statement.csv', csv))
+        # The worker died after committing the rows, before refreshing the rollups
+        MonthlyRollup.objects.filter(user=self.user).delete()
+        stats = TransactionImporter(self.user, import_batch=self.batch).run(SimpleUploadedFile('statement.csv', csv))
+        self.assertEqual(stats['duplicates'], 2)
+        self.assertEqual(
+            sorted(MonthlyRollup.objects.filter(user=self.user).values_list('month', 'total')),
+            [(datetime.date(2024, 1, 1), Decimal('-900')), (datetime.date(2024, 2, 1), Decimal('-900'))],
+        )
+
+
+class EnqueueUploadTests(TestCase):
+    """Uploads are stored before the batch is created, and removed again if queuing fails."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user('uploader')
+
+    def stored_files(self):
+        return [name for _, _, names in os.walk(self.media_root) for name in names]
+
+    def test_expands_zip_members_into_jobs(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zf:
+            zf.writestr('jan.csv', 'Date,Description,Amount\n2024-01-05,Rent,-900\n')
+            zf.writestr('__MACOSX/._jan.csv', '')
+            zf.writestr('feb.csv', 'Date,Description,Amount\n2024-02-05,Rent,-900\n')
+        batch = enqueue_upload(self.user, [SimpleUploadedFile('statements.zip', archive.getvalue())])
+        jobs = batch.jobs.order_by('original_name')
+        self.assertEqual([job.original_name for job in jobs], ['statements.zip/feb.csv', 'statements.zip/jan.csv'])
+        with jobs[0].file.open('rb') as fh:
+            self.assertIn(b'2024-02-05', fh.read())
+
+    def test_a_failed_upload_leaves_no_files_or_batch(self):
+        files = [
+            SimpleUploadedFile('statement.csv', b'Date,Description,Amount\n2024-01-05,Rent,-900\n'),
+            SimpleUploadedFile('broken.zip', b'not a zip'),
+        ]
+        with self.assertRaises(zipfile.BadZipFile):
+            enqueue_upload(self.user, files)
+        self.assertEqual(self.stored_files(), [])
+        self.assertFalse(ImportBatch.objects.filter(user=self.user).exists())
+
+
+@override_settings(IMPORT_UPLOAD_MAX_BYTES=64)
+class ImportUploadHandlerTests(SimpleTestCase):
+    """Statement files are refused on the way in, with the first reason found."""
+
+    def upload(self, name, data, chunk_size=16):
+        handler = ImportUploadHandler()
+        handler.new_file('file', name, 'text/csv', len(data))
+        for start in range(0, len(data), chunk_size):
+            handler.receive_data_chunk(data[start:start + chunk_size], start)
+        return handler.file_complete(len(data))
+
+    def test_accepts_a_csv_and_spools_it_whole(self):
+        data = b'Date,Description,Amount\n2024-01-05,Rent,-900\n'
+        uploaded = self.upload('statement.csv', data)
+        self.addCleanup(uploaded.close)
+        self.assertNotIsInstance(uploaded, RejectedUpload)
+        self.assertEqual(uploaded.read(), data)
+
+    def test_oversize_keeps_the_size_error_while_the_header_is_still_buffered(self):
+        # No newline before the limit: the head is still being collected when the size check fires
+        uploaded = self.upload('statement.csv', b'Date,Description,Amount' + b'x' * 100)
+        self.assertIsInstance(uploaded, RejectedUpload)
+        self.assertEqual(uploaded.upload_error.code, 'too_large')
+
+    def test_refuses_a_pdf_saved_as_csv(self):
+        uploaded = self.upload('statement.csv', b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self.assertIsInstance(uploaded, RejectedUpload)
+        self.assertEqual(uploaded.upload_error.code, 'pdf')
+
+    def test_refuses_a_csv_without_the_required_columns(self):
+        uploaded = self.upload('statement.csv', b'When,What\n2024-01-05,Rent\n')
+        self.assertIsInstance(uploaded, RejectedUpload)
+        self.assertEqual(uploaded.upload_error.code, 'bad_header')
+
+
+class CategoryBulkEditorTests(TestCase):
+    """Merges and reassignments undo exactly, and keep the rollups in step."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('bulk')
+        self.food = Category.objects.create(user=self.user, name='Food')
+        self.fuel = Category.objects.create(user=self.user, name='Fuel')
+        self.rule = CategoryRule.objects.create(user=self.user, category=self.food, pattern='cafe')
+        rows = [
+            ('Corner Cafe', '-4.50', self.food), ('Cafe Nero', '-120.00', self.food),
+            ('Shell', '-60.00', self.fuel), ('Shell Cafe', '-3.20', None), ('Salary', '2500.00', None),
+        ]
+        Transaction.objects.bulk_create(
+            Transaction(
+                user=self.user, date=datetime.date(2024, month, 3 + day), description=description,
+                amount=Decimal(amount), category=category,
+            )
+            for month in (1, 2) for day, (description, amount, category) in enumerate(rows)
+        )
+        # Undo must give back who assigned each category, not just the category
+        Transaction.objects.filter(description='Cafe Nero').update(category_source=Transaction.SOURCE_RULE)
+        rebuild_monthly_rollups(self.user.pk)
+        self.editor = CategoryBulkEditor(self.user)
+        self.original = self.categories()
+
+    def categories(self):
+        rows = Transaction.objects.values_list('id', 'category_id', 'category_source')
+        return {pk: (category_id, source) for pk, category_id, source in rows}
+
+    def rollups(self):
+        return sorted(
+            MonthlyRollup.objects.filter(user=self.user)
+            .values_list('month', 'category_id', 'total', 'count', 'min_amount', 'max_amount'),
+            key=str,
+        )
+
+    def assertRollupsCurrent(self):
+        kept = self.rollups()
+        rebuild_monthly_rollups(self.user.pk)
+        self.assertEqual(kept, self.rollups())
+
+    def test_merge_and_undo_restore_the_category_under_its_old_id(self):
+        food_id = self.food.pk
+        self.editor.merge(self.food, self.fuel)
+        self.assertFalse(Category.objects.filter(pk=food_id).exists())
+        self.assertEqual(Transaction.objects.filter(category=self.fuel).count(), 6)
+        self.assertRollupsCurrent()
+
+        self.editor.undo()
+        restored = Category.objects.get(pk=food_id)
+        self.assertEqual((restored.user, restored.name), (self.user, 'Food'))
+        self.assertEqual(CategoryRule.objects.get(pk=self.rule.pk).category_id, food_id)
+        self.assertEqual(self.categories(), self.original)
+        self.assertIsNone(self.editor.last_change())
+        self.assertRollupsCurrent()
+
+    def test_reassign_and_undo_restore_each_rows_category(self):
+        change = self.editor.reassign('cafe', self.fuel)
+        self.assertEqual(change.rows, 6)
+        self.assertEqual(Transaction.objects.filter(category=self.fuel).count(), 8)
+        self.assertRollupsCurrent()
+
+        self.editor.undo()
+        self.assertEqual(self.categories(), self.original)
+        self.assertRollupsCurrent()
+
+
+@unittest.skipUnless(ML_AVAILABLE, "NumPy is not installed")
+class MLModelStalenessTests(TestCase):
+    """Moving rows between categories retrains the model even though the labeled count is unchanged."""
+
+    def setUp(self):
+        settings_override = override_settings(ML_MODEL_DIR=tempfile.mkdtemp())
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user('learner')
+        self.food = Category.objects.create(user=self.user, name='Food')
+        self.fuel = Category.objects.create(user=self.user, name='Fuel')
+        Transaction.objects.bulk_create(
+            Transaction(
+                user=self.user, date=datetime.date(2024, 1, 1 + i), description=description,
+                amount=Decimal('-5.00'), category=category,
+            )
+            for i, (description, category) in enumerate(
+                [('Tesco Express', self.food)] * 6 + [('Shell Cafe', self.food)] * 3
+                + [('Shell Station', self.fuel)] * 6
+            )
+        )
+        self.categorizer = MLCategorizer(self.user)
+        self.categorizer.train()
+
+    def test_model_is_current_until_labels_change(self):
+        self.assertFalse(self.categorizer.is_stale(self.categorizer.get_model(retrain_if_stale=False)))
+        with self.captureOnCommitCallbacks(execute=True):
+            CategoryBulkEditor(self.user).reassign('cafe', self.fuel)
+        model = self.categorizer.get_model(retrain_if_stale=False)
+        self.assertTrue(self.categorizer.is_stale(model))
+        self.assertFalse(self.categorizer.is_stale(self.categorizer.get_model()))
+
+    def test_a_hand_correction_makes_the_model_stale(self):
+        row = Transaction.objects.filter(category=self.food).first()
+        row.category = self.fuel
+        with self.captureOnCommitCallbacks(execute=True):
+            row.save()
+        self.assertTrue(self.categorizer.is_stale(self.categorizer.get_model(retrain_if_stale=False)))
+        # The import worker's pass retrains it, once
+        self.assertEqual(retrain_stale_models(), 1)
+        self.assertEqual(retrain_stale_models(), 0)
+
+    def test_learns_only_from_hand_labels(self):
+        CategoryRule.objects.create(user=self.user, category=self.fuel, pattern='texaco')
+        Transaction.objects.bulk_create(
+            Transaction(user=self.user, date=datetime.date(2024, 2, 1 + i), description='Texaco', amount=Decimal('-40'))
+            for i in range(5)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            RuleCategorizer(self.user).run()
+        self.assertEqual(
+            set(Transaction.objects.filter(description='Texaco').values_list('category_source', flat=True)),
+            {Transaction.SOURCE_RULE},
+        )
+        # Rule output is not a label: the model is still current
+        self.assertFalse(self.categorizer.is_stale(self.categorizer.get_model(retrain_if_stale=False)))
+        self.assertEqual(self.categorizer.train().n_samples, 15)
+
+
+@unittest.skipUnless(LEDGER_AVAILABLE, "NumPy is not installed")
+class LedgerSnapshotTests(TestCase):
+    """Snapshots load only the columns asked for, computed in SQL, in (date, id) order."""
+
+    def setUp(self):
+        settings_override = override_settings(LEDGER_VERSION_DIR=tempfile.mkdtemp())
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user('ledger')
+        food = Category.objects.create(user=self.user, name='Food')
+        self.rows = Transaction.objects.bulk_create([
+            Transaction(user=self.user, date=datetime.date(2024, 3, 2), description='Tea', amount=Decimal('-2.35')),
+            Transaction(user=self.user, date=datetime.date(1969, 12, 31), description='Old', amount=Decimal('10.10')),
+            Transaction(
+                user=self.user, date=datetime.date(2024, 3, 1), description='Tea', amount=Decimal('-0.05'), category=food
+            ),
+        ])
+        self.food = food
+
+    def test_loads_only_the_requested_columns(self):
+        snapshot = LedgerSnapshot.load(self.user.pk, columns=('cents',))
+        self.assertEqual(snapshot.columns, {'ids', 'days', 'cents'})
+        self.assertIsNone(snapshot.category_ids)
+        epoch = datetime.date(1970, 1, 1)
+        self.assertEqual(snapshot.days.tolist(), [
+            (datetime.date(1969, 12, 31) - epoch).days, (datetime.date(2024, 3, 1) - epoch).days,
+            (datetime.date(2024, 3, 2) - epoch).days,
+        ])
+        self.assertEqual(snapshot.cents.tolist(), [1010, -5, -235])
+
+    def test_a_missing_column_reloads_the_union(self):
+        get_ledger(self.user.pk, ('category_ids',))
+        snapshot = get_ledger(self.user.pk, ('cents',))
+        self.assertTrue({'category_ids', 'cents'} <= snapshot.columns)
+        self.assertEqual(snapshot.category_ids.tolist(), [-1, self.food.pk, -1])
+        self.assertEqual(snapshot.cents.tolist(), [1010, -5, -235])
+
+    def test_an_invalidation_from_another_process_reloads(self):
+        snapshot = get_ledger(self.user.pk, ('category_ids',))
+        self.assertIs(get_ledger(self.user.pk, ('category_ids',)), snapshot)
+        Transaction.objects.filter(category=self.food).update(category=None)
+        # What the import worker or a management command does: it shares only the version file
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_ledger(self.user.pk)
+        self.assertEqual(get_ledger(self.user.pk, ('category_ids',)).category_ids.tolist(), [-1, -1, -1])
+
+
+class KeysetPaginationTests(TestCase):
+    """Walking the cursors visits every row once, in order, even across date and created_at ties."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('browser')
+        Transaction.objects.bulk_create(
+            Transaction(user=self.user, date=datetime.date(2024, 1, 1 + i % 3), description=f'Row {i}', amount=1)
+            for i in range(8)
+        )
+        # Identical created_at within a date: only the id breaks the tie
+        Transaction.objects.filter(user=self.user).update(created_at=timezone.now())
+        self.browser = TransactionBrowser(self.user)
+
+    def test_cursors_walk_every_row_once(self):
+        expected = list(self.browser.queryset().values_list('id', flat=True))
+        seen, cursor = [], None
+        while True:
+            rows, cursor = self.browser.page(cursor, limit=3)
+            seen.extend(row['id'] for row in rows)
+            if cursor is None:
+                break
+        self.assertEqual(seen, expected)
+
+    def test_cursor_round_trip_and_garbage(self):
+        row = self.browser.queryset().values(*TransactionBrowser.COLUMNS).first()
+        self.assertEqual(
+            TransactionBrowser.decode_cursor(TransactionBrowser.encode_cursor(row)),
+            (row['date'], row['created_at'], row['id']),
+        )
+        for cursor in ('not-a-cursor', 'MjAyNC0wMS0wMXx4fDE'):
+            with self.assertRaises(InvalidCursor):
+                TransactionBrowser.decode_cursor(cursor)
+
+
+@unittest.skipUnless(fts_available(), "Full-text search needs SQLite FTS5")
+class TransactionSearchTests(TestCase):
+    """The FTS triggers from migration 0012 keep search in step with edits and deletes."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('searcher')
+        self.search = TransactionSearch(self.user)
+        self.row = Transaction.objects.create(
+            user=self.user, date=datetime.date(2024, 1, 1), description='STARBUCKS 1234', amount=Decimal('-4.20'),
+        )
+
+    def found(self, query):
+        return [row['id'] for row in self.search.search(query)]
+
+    def test_prefix_match(self):
+        self.assertEqual(self.found('star'), [self.row.pk])
+
+    def test_edit_and_delete_reach_the_index(self):
+        self.row.description = 'Tesco Metro'
+        self.row.notes = 'weekly shop'
+        self.row.save()
+        self.assertEqual(self.found('star'), [])
+        self.assertEqual(self.found('tesco'), [self.row.pk])
+        self.assertEqual(self.found('weekly'), [self.row.pk])
+        self.row.delete()
+        self.assertEqual(self.found('tesco'), [])
+
+    def test_other_users_rows_are_not_found(self):
+        other = TransactionSearch(User.objects.create_user('other'))
+        self.assertEqual(other.search('star'), [])
+
+
+class TransactionExporterTests(TestCase):
+    """Exports stream in pieces and read back as the rows they came from."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('exporter')
+        food = Category.objects.create(user=self.user, name='Food')
+        Transaction.objects.bulk_create(
+            Transaction(
+                user=self.user, date=datetime.date(2024, 1, 1 + i), description=f'Shop, "branch" {i}',
+                amount=Decimal('-1.50') * (i + 1), notes='note' if i % 2 else None, category=food if i % 3 else None,
+            )
+            for i in range(20)
+        )
+        self.exporter = TransactionExporter(Transaction.objects.filter(user=self.user).order_by('date'), chunk_size=7)
+        # Small pieces, so the streaming path is taken
+        self.exporter.FLUSH_BYTES = 200
+
+    def test_csv_streams_the_header_first_and_reads_back(self):
+        pieces = list(self.exporter.stream('csv'))
+        self.assertEqual(pieces[0], 'Date,Description,Amount,Notes,Category\r\n')
+        self.assertGreater(len(pieces), 3)
+        rows = list(csv.DictReader(io.StringIO(''.join(pieces))))
+        self.assertEqual(len(rows), 20)
+        self.assertEqual(rows[1], {
+            'Date': '2024-01-02', 'Description': 'Shop, "branch" 1', 'Amount': '-3.00', 'Notes': 'note',
+            'Category': 'Food',
+        })
+
+    def test_ndjson_is_one_object_per_line(self):
+        lines = ''.join(self.exporter.stream('ndjson')).splitlines()
+        self.assertEqual(len(lines), 20)
+        self.assertEqual(json.loads(lines[0]), {
+            'date': '2024-01-01', 'description': 'Shop, "branch" 0', 'amount': '-1.50', 'notes': None,
+            'category': None,
+        })
+
+
+@unittest.skipUnless(ANOMALIES_AVAILABLE, "NumPy is not installed")
+class RollingMedianTests(SimpleTestCase):
+    """Rows early in their group only see their own group's history."""
+
+    def test_warm_up_rows_mask_the_previous_group(self):
+        import numpy as np
+        # Group A then group B, each sorted by time
+        values = np.array([10, 10, 10, 100, 1, 2, 3, 4, 5], dtype=np.float64)
+        positions = np.array([0, 1, 2, 3, 0, 1, 2, 3, 4])
+        median, mad = rolling_median_mad(values, positions, window=3, min_history=2)
+        # Too little history: no score
+        self.assertTrue(np.isnan(median[[0, 1, 4, 5]]).all())
+        # B's third row sees only 1 and 2, not A's 10 and 100
+        self.assertEqual((median[6], mad[6]), (1.5, 0.5))
+        self.assertEqual((median[3], mad[3]), (10, 0))
+        self.assertEqual((median[7], median[8]), (2, 3))
+
+
+class RecurringDetectionTests(TestCase):
+    """Regular payments to one merchant become a series; irregular ones do not."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('payer')
+        self.merchant = Merchant.objects.create(key='netflix', name='Netflix')
+
+    def test_monthly_series_in_its_own_amount_band(self):
+        rows = [(datetime.date(2024, month, 3), Decimal('-9.99')) for month in range(1, 6)]
+        rows.append((datetime.date(2024, 2, 17), Decimal('-120.00')))  # A one-off purchase
+        [series] = detect_series(self.user.pk, self.merchant.pk, rows)
+        self.assertEqual(series.cadence, RecurringSeries.CADENCE_MONTHLY)
+        self.assertEqual(series.occurrences, 5)
+        # The last date plus the typical interval (30 days), not the same day next month
+        self.assertEqual(series.next_date, datetime.date(2024, 6, 2))
+
+    def test_irregular_dates_are_not_a_series(self):
+        days = (1, 9, 40, 41, 100)
+        rows = [(datetime.date(2024, 1, 1) + datetime.timedelta(days=d), Decimal('-9.99')) for d in days]
+        self.assertEqual(detect_series(self.user.pk, self.merchant.pk, rows), [])
+
+    def test_refresh_replaces_the_merchants_series(self):
+        Transaction.objects.bulk_create(
+            Transaction(
+                user=self.user, merchant=self.merchant, date=datetime.date(2024, 1, 5) + datetime.timedelta(weeks=i),
+                description='Netflix', amount=Decimal('-9.99'),
+            )
+            for i in range(5)
+        )
+        refresh_recurring_series(self.user.pk, [self.merchant.pk])
+        self.assertEqual(
+            list(RecurringSeries.objects.filter(user=self.user).values_list('cadence', 'occurrences')),
+            [(RecurringSeries.CADENCE_WEEKLY, 5)],
+        )
+        Transaction.objects.filter(user=self.user).delete()
+        refresh_recurring_series(self.user.pk, [self.merchant.pk])
+        self.assertFalse(RecurringSeries.objects.filter(user=self.user).exists())
+
+
+class CategoryCacheTests(TestCase):
+    """Saving or deleting a category is seen by the next read of the cache."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cached')
+        self.food = Category.objects.create(user=self.user, name='Food')
+
+    def names(self):
+        return [category['name'] for category in user_categories(self.user.pk)]
+
+    def test_save_and_delete_invalidate(self):
+        self.assertEqual(self.names(), ['Food'])
+        Category.objects.create(user=self.user, name='Bills')
+        self.assertEqual(self.names(), ['Bills', 'Food'])
+        self.food.name = 'Groceries'
+        self.food.save()
+        self.assertEqual(self.names(), ['Bills', 'Groceries'])
+        self.food.delete()
+        self.assertEqual(self.names(), ['Bills'])
+
+    def test_users_are_cached_apart(self):
+        other = User.objects.create_user('other')
+        self.assertEqual(self.names(), ['Food'])
+        Category.objects.create(user=other, name='Travel')
+        self.assertEqual(self.names(), ['Food'])
+        self.assertEqual([c['name'] for c in user_categories(other.pk)], ['Travel'])
@@ -0,0 +1,160 @@
+"""
+Upload handler for the statement import form.
+
+``ImportUploadHandler`` takes the place of Django's default handlers on
+the upload views. Every file goes straight to a temporary file as it
+arrives, whatever its size, so nothing is held in memory; storing the
+upload later moves that file into MEDIA_ROOT rather than copying it.
+Each file is judged as soon as its first bytes are in:
+
+  - a name that is not .csv or .zip is refused before any content is kept
+  - a .csv that is really an Excel workbook, PDF, JSON or XML document
+    gets that file type's message from ``TransactionUploadForm.FILE_TYPE_ERRORS``
+  - a .csv that is not UTF-8 text, or whose header row lacks a required
+    column, is refused with the importer's own message
+  - a file is refused at the byte that takes it over ``IMPORT_UPLOAD_MAX_BYTES``
+
+The rest of a refused file is read and dropped, not stored or decoded,
+so the browser still gets the form back. The file reaches the form as a
+``RejectedUpload`` carrying the error, and the form reports it.
+"""
+import codecs
+import csv
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+
+from .forms import TransactionUploadForm
+from .parsers import CSVHeaderError, CSVRowParser
+
+# Bytes of a CSV file collected before its header row is checked, if no newline comes first
+HEADER_PEEK_BYTES = 64 * 1024
+ACCEPTED_EXTENSIONS = ('.csv', '.zip')
+# Leading bytes of formats people upload by mistake, keyed to FILE_TYPE_ERRORS
+CONTENT_SIGNATURES = (
+    (b'PK\x03\x04', '.xlsx'),
+    (b'\xd0\xcf\x11\xe0', '.xls'),
+    (b'%PDF', '.pdf'),
+    (b'{', '.json'),
+    (b'[', '.json'),
+    (b'<', '.xml'),
+)
+
+
+def _max_bytes():
+    return getattr(settings, 'IMPORT_UPLOAD_MAX_BYTES', 100 * 1024 * 1024)
+
+
+class RejectedUpload(UploadedFile):
+    """
+    Stands in for a file the handler refused. ``upload_error`` says why;
+    it is None when the file name alone already tells the form.
+    """
+
+    def __init__(self, name, size, upload_error):
+        super().__init__(None, name=name, size=size)
+        self.upload_error = upload_error
+
+    def open(self, mode=None):
+        raise ValueError("A rejected upload has no content.")
+
+
+class ImportUploadHandler(FileUploadHandler):
+    """Spools statement files to disk, checking their type, header row and size on the way in."""
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_bytes = _max_bytes()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.upload_error = None
+        _, extension = os.path.splitext(self.file_name.lower())
+        self.rejected = extension not in ACCEPTED_EXTENSIONS
+        # Only CSV content is checked here; archives are checked member by member by the form
+        self.head = b'' if extension == '.csv' else None
+        self.file = None if self.rejected else TemporaryUploadedFile(
+            self.file_name, self.content_type, 0, self.charset, self.content_type_extra
+        )
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.rejected:
+            return None
+        if start + len(raw_data) > self.max_bytes:
+            self._reject(ValidationError(
+                f"'{self.file_name}' is too large (limit {self.max_bytes // (1024 * 1024)} MB).",
+                code='too_large'
+            ))
+            return None
+        if self.head is not None:
+            self.head += raw_data
+            if b'\n' not in self.head and len(self.head) < HEADER_PEEK_BYTES:
+                return None
+            raw_data = self._release_head(complete=False)
+            if raw_data is None:
+                return None
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if self.rejected:
+            # Refused on the way in: keep that error, whatever the head holds
+            return RejectedUpload(self.file_name, file_size, self.upload_error)
+        if self.head is not None:
+            # A CSV file shorter than one line
+            head = self._release_head(complete=True)
+            if head is None:
+                return RejectedUpload(self.file_name, file_size, self.upload_error)
+            self.file.write(head)
+        self.file.seek(0)
+        self.file.size = file_size
+        return self.file
+
+    def upload_interrupted(self):
+        if self.file is not None:
+            self.file.close()
+
+    def _release_head(self, complete):
+        """Check the collected start of a CSV file; return it for writing, or None if refused."""
+        head, self.head = self.head, None
+        error = check_csv_start(self.file_name, head, complete)
+        if error is not None:
+            self._reject(error)
+            return None
+        return head
+
+    def _reject(self, error):
+        self.rejected = True
+        self.upload_error = error
+        # A refused file is not checked any further
+        self.head = None
+        if self.file is not None:
+            # Deletes the temporary file
+            self.file.close()
+            self.file = None
+
+
+def check_csv_start(name, head, complete):
+    """
+    Return a ValidationError for the CSV file ``name`` whose first bytes
+    are ``head`` (the whole file if ``complete``), or None if it looks importable.
+    """
+    stripped = head.removeprefix(codecs.BOM_UTF8).lstrip()
+    for signature, extension in CONTENT_SIGNATURES:
+        if stripped.startswith(signature):
+            message, icon_class, file_type = TransactionUploadForm.FILE_TYPE_ERRORS[extension]
+            return ValidationError(message, code=file_type, params={'icon': icon_class})
+    if b'\x00' in head:
+        return ValidationError(f"'{name}' is not a text CSV file.", code='not_csv')
+    try:
+        text = codecs.getincrementaldecoder(CSVRowParser.ENCODING)().decode(head, final=complete)
+    except UnicodeDecodeError:
+        return ValidationError(f"'{name}' is not UTF-8 text. Please save it as CSV UTF-8.", code='not_csv')
+    try:
+        CSVRowParser.header_columns(next(csv.reader(text.splitlines()[:1]), None))
+    except CSVHeaderError as e:
+        return ValidationError(f"'{name}': {e}", code='bad_header')
+    return None
@@ -2,7 +2,7 @@
 
 from django.urls import path
 from . import views
-from .views import AISortingView, AnalyticsDashboardView, TransactionUploadView, HomeView, ManageCategoriesView, AboutView, FeaturesView
+from .views import TransactionListView, TransactionListAPIView, TransactionExportView, TransactionSearchView, AISortingView, AnalyticsDashboardView, TransactionUploadView, ImportBatchStatusView, ImportJobStatusView, HomeView, ManageCategoriesView, AboutView, FeaturesView
 
 urlpatterns = [
     # Route 1: Home page
@@ -16,6 +16,14 @@ urlpatterns = [
     
     # Upload Transactions (UC 3.1) - Now using CBV
     path('upload/', TransactionUploadView.as_view(), name='upload_transactions'),
+    path('upload/batches/<int:pk>/status/', ImportBatchStatusView.as_view(), name='import_batch_status'),
+    path('upload/jobs/<int:pk>/status/', ImportJobStatusView.as_view(), name='import_job_status'),
+
+    # Transaction browser (keyset pagination) and its JSON endpoint
+    path('transactions/', TransactionListView.as_view(), name='transaction_list'),
+    path('api/transactions/', TransactionListAPIView.as_view(), name='transaction_list_api'),
+    path('transactions/export/', TransactionExportView.as_view(), name='transaction_export'),
+    path('api/transactions/search/', TransactionSearchView.as_view(), name='transaction_search'),
 
     # AI Sorting (UC 4.1)
     path('ai-sorting/', AISortingView.as_view(), name='ai_sorting'),
@@ -0,0 +1,25 @@
+"""
+Version numbers shared by every process through small files: the web
+processes, the import worker and the management commands all read the
+same value, which an in-process cache (locmem) cannot give them.
+"""
+import os
+import time
+
+
+def read_version(path):
+    """The version stored at ``path``; 0 if it was never written."""
+    try:
+        with open(path) as fh:
+            return int(fh.read() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def write_version(path):
+    """Store a fresh, unique version at ``path``, replacing the file atomically."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as fh:
+        fh.write(str(time.time_ns()))
+    os.replace(tmp_path, path)
@@ -1,18 +1,30 @@
-import csv
-import io
-import datetime
-from decimal import Decimal, InvalidOperation
-
 from django.shortcuts import render, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import TemplateView, FormView, View
 from django.db import IntegrityError
+from django.core.exceptions import ValidationError
 from django.contrib import messages
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.db.models import Count, Max, Min, Q, Sum
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 
-from .models import Category, Transaction
-from .forms import TransactionUploadForm
+from .models import Category, CategoryRule, Transaction, ImportBatch, ImportJob, MonthlyRollup, RecurringSeries, SpendingAnomaly
+from .forms import TransactionUploadForm, TransactionFilterForm
+from .browse import TransactionBrowser, InvalidCursor
+from .bulk import BulkChangeError, CategoryBulkEditor
+from .export import TransactionExporter
+from .search import TransactionSearch
+from .importer import TransactionImporter
+from .jobs import enqueue_upload
+from .uploads import ImportUploadHandler
+from .categorizer import RuleCategorizer
+from .category_cache import default_category_names, user_categories
+from .ml_categorizer import MLCategorizer, ML_AVAILABLE
+from .anomalies import AnomalyDetector, ANOMALIES_AVAILABLE
 
 # --- 1. UPDATED 'home_view' for your Smart Sorter project ---
 # --- 1. UPDATED 'home_view' for your Smart Sorter project ---
@@ -34,20 +46,18 @@ class ManageCategoriesView(LoginRequiredMixin, View):
     Separates GET (display) and POST (action) logic.
     """
     def get(self, request):
-        # Fetch default suggestions from the database (controlled by Admin)
-        from .models import DefaultCategory # Local import to avoid circular dependency if any
-        default_categories = DefaultCategory.objects.values_list('name', flat=True)
-        
-        # Get user's categories
-        user_categories = Category.objects.filter(user=request.user).order_by('name')
-        existing_names = set(c.name for c in user_categories)
+        # Default suggestions (controlled by Admin) and the user's categories, both cached
+        default_categories = default_category_names()
+        categories = user_categories(request.user.pk)
+        existing_names = set(c['name'] for c in categories)
         
         # Filter suggestions (exclude ones the user already has)
         suggestions = [s for s in default_categories if s not in existing_names]
 
         context = {
-            'categories': user_categories,
+            'categories': categories,
             'suggestions': suggestions[:5],
+            'last_bulk_change': CategoryBulkEditor(request.user).last_change(),
         }
         return render(request, 'manage_categories.html', context)
 
@@ -69,179 +79,154 @@ class ManageCategoriesView(LoginRequiredMixin, View):
                 messages.success(request, "Category deleted successfully.")
             except Category.DoesNotExist:
                 messages.error(request, "Category could not be found.")
-            
+
+        elif 'merge_categories' in request.POST:
+            categories = Category.objects.filter(user=request.user)
+            source = categories.filter(id=request.POST.get('source_id')).first()
+            target = categories.filter(id=request.POST.get('target_id')).first()
+            if source is None or target is None:
+                messages.error(request, "Please pick both categories.")
+            else:
+                self._bulk(request, lambda editor: editor.merge(source, target))
+
+        elif 'reassign_transactions' in request.POST:
+            target = Category.objects.filter(user=request.user, id=request.POST.get('target_id')).first()
+            if target is None:
+                messages.error(request, "Please pick a category.")
+            else:
+                self._bulk(request, lambda editor: editor.reassign(request.POST.get('match_text', ''), target))
+
+        elif 'undo_bulk_change' in request.POST:
+            try:
+                change = CategoryBulkEditor(request.user).undo()
+                messages.success(request, f"Undone: {change.summary} ({change.rows} transaction(s) restored).")
+            except BulkChangeError as e:
+                messages.error(request, str(e))
+
         return redirect('manage_categories')
 
+    def _bulk(self, request, operation):
+        try:
+            change = operation(CategoryBulkEditor(request.user))
+        except BulkChangeError as e:
+            messages.error(request, str(e))
+            return
+        messages.success(request, f"{change.summary}: {change.rows} transaction(s) updated.")
+
 
 # --- 8. Upload Transactions View (UC 3.1) - Class-Based View ---
+@method_decorator(csrf_exempt, name='dispatch')
 class TransactionUploadView(LoginRequiredMixin, FormView):
     """
     Handles CSV file upload for bulk transaction import.
+    The file is stored and queued as an ImportJob; parsing happens in the
+    ``process_imports`` worker so request time does not grow with file size.
+    Files are received by ImportUploadHandler, which spools them to disk
+    and refuses wrong types, bad header rows and oversized files early.
     Follows OOP best practices using Django's FormView.
     """
     template_name = 'upload_transactions.html'
     form_class = TransactionUploadForm
     
     # Required CSV headers (case-insensitive matching)
-    REQUIRED_HEADERS = ['date', 'description', 'amount']
-    OPTIONAL_HEADERS = ['notes']
+    REQUIRED_HEADERS = TransactionImporter.REQUIRED_HEADERS
+    OPTIONAL_HEADERS = TransactionImporter.OPTIONAL_HEADERS
+    
+    def dispatch(self, request, *args, **kwargs):
+        # The CSRF check reads request.POST, which parses the upload, so
+        # the handler must be in place first (hence exempt, then protect)
+        request.upload_handlers = [ImportUploadHandler(request)]
+        return csrf_protect(super().dispatch)(request, *args, **kwargs)
     
     def get_context_data(self, **kwargs):
-        """Add stats and transactions to context."""
+        """Add import progress, stats and transactions for the batch in the URL."""
         context = super().get_context_data(**kwargs)
-        context['stats'] = self.request.session.pop('upload_stats', {
+        context['stats'] = {
             'total_rows': 0,
             'successful': 0,
+            'duplicates': 0,
+            'rejected': 0,
             'errors': [],
             'processed': False
-        })
+        }
+        context['transactions'] = None
+        context['job'] = None
         
-        # Get recently imported transactions for preview
-        transaction_ids = self.request.session.pop('imported_transaction_ids', [])
-        if transaction_ids:
-            context['transactions'] = Transaction.objects.filter(
-                id__in=transaction_ids,
-                user=self.request.user
-            ).order_by('-date')[:50]  # Limit to 50 for display
-        else:
-            context['transactions'] = None
+        batch = self._get_batch()
+        if batch is None:
+            return context
+        
+        jobs = list(batch.jobs.order_by('id'))
+        if not batch.is_finished:
+            # Still queued or running: the template polls the batch status endpoint
+            context['batch'] = batch
+            context['file_count'] = len(jobs)
+            context['job'] = next((job for job in jobs if not job.is_finished), jobs[0] if jobs else None)
+            return context
+        
+        stats = batch.as_stats()
+        context['stats'] = stats
+        # Per-file results, in the same shape as the batch totals
+        if len(jobs) > 1:
+            context['file_stats'] = [(job, job.as_stats()) for job in jobs]
+        if self.request.method == 'GET':
+            self._add_result_messages(batch, stats)
+        
+        # Preview the batch's own rows, served by the import_batch index
+        if stats['successful']:
+            context['transactions'] = (
+                Transaction.objects
+                .filter(import_batch=batch, user=self.request.user)
+                .order_by('-date')[:50]  # Limit to 50 for display
+            )
             
         return context
     
     def form_valid(self, form):
-        """Process the uploaded CSV file."""
+        """Store the uploaded CSV/ZIP files and queue them for background import."""
+        batch = enqueue_upload(self.request.user, form.cleaned_data['file'])
+        names = list(batch.jobs.values_list('original_name', flat=True))
+        if len(names) == 1:
+            messages.info(self.request, f"'{names[0]}' received. Importing in the background...")
+        else:
+            messages.info(self.request, f"{len(names)} files received. Importing in the background...")
         
-        stats = {
-            'total_rows': 0,
-            'successful': 0,
-            'errors': [],
-            'processed': False
-        }
+        # Redirect to self to show progress (PRG pattern); only the batch id travels
+        return redirect(f"{reverse('upload_transactions')}?batch={batch.id}")
+    
+    def _get_batch(self):
+        """Return the current user's batch named in ``?batch=``, or None."""
+        batch_id = self.request.GET.get('batch', '')
+        if not batch_id.isdigit():
+            return None
+        return ImportBatch.objects.filter(id=batch_id, user=self.request.user).first()
+    
+    def _add_result_messages(self, batch, stats):
+        """Show success/warning messages for a finished import batch."""
+        for job in batch.jobs.filter(status=ImportJob.STATUS_FAILED):
+            messages.error(self.request, job.message)
+        
+        if stats['successful'] > 0:
+            messages.success(
+                self.request, 
+                f"Successfully imported {stats['successful']} transaction(s)!"
+            )
         
-        uploaded_file = form.cleaned_data['file']
+        if stats['duplicates']:
+            messages.info(
+                self.request, 
+                f"{stats['duplicates']} row(s) were already imported and were skipped as duplicates."
+            )
         
-        try:
-            # Read CSV content
-            file_content = uploaded_file.read().decode('utf-8-sig')  # Handle BOM
-            csv_reader = csv.DictReader(io.StringIO(file_content))
-            
-            # Normalize headers (lowercase, strip whitespace)
-            if csv_reader.fieldnames:
-                actual_headers = [h.lower().strip() for h in csv_reader.fieldnames]
-            else:
-                messages.error(self.request, "CSV file appears to be empty or has no headers.")
-                return self.form_invalid(form)
-            
-            # Validate required headers
-            missing_headers = [
-                h.capitalize() for h in self.REQUIRED_HEADERS 
-                if h not in actual_headers
-            ]
-            
-            if missing_headers:
-                messages.error(
-                    self.request, 
-                    f"Missing required column(s): {', '.join(missing_headers)}. "
-                    f"Your CSV must have: Date, Description, Amount, Notes (optional)"
-                )
-                return self.form_invalid(form)
-            
-            # Process each row
-            rows = list(csv_reader)
-            stats['total_rows'] = len(rows)
-            transactions_to_create = []
-            
-            for row_num, row in enumerate(rows, start=2):
-                # Skip empty rows
-                if not any(row.values()):
-                    continue
-                
-                # Normalize row keys
-                row_normalized = {
-                    k.lower().strip(): v.strip() if v else '' 
-                    for k, v in row.items()
-                }
-                
-                # Parse date (try multiple formats)
-                date_str = row_normalized.get('date', '')
-                parsed_date = self._parse_date(date_str)
-                
-                if not parsed_date:
-                    stats['errors'].append(
-                        f"Row {row_num}: Invalid date '{date_str}'. "
-                        "Use formats like YYYY-MM-DD or DD/MM/YYYY."
-                    )
-                    continue
-                
-                # Parse description
-                description = row_normalized.get('description', '')
-                if not description:
-                    stats['errors'].append(f"Row {row_num}: Description cannot be empty.")
-                    continue
-                
-                # Parse amount
-                amount = self._parse_amount(row_normalized.get('amount', ''))
-                if amount is None:
-                    stats['errors'].append(
-                        f"Row {row_num}: Invalid amount '{row_normalized.get('amount', '')}'. "
-                        "Must be a number."
-                    )
-                    continue
-                
-                # Get optional notes
-                notes = row_normalized.get('notes', '') or None
-                
-                # Create transaction object
-                transactions_to_create.append(Transaction(
-                    user=self.request.user,
-                    date=parsed_date,
-                    description=description[:255],
-                    amount=amount,
-                    notes=notes
-                ))
-                stats['successful'] += 1
-            
-            # Bulk create transactions
-            created_transactions = []
-            if transactions_to_create:
-                created_transactions = Transaction.objects.bulk_create(transactions_to_create)
-            
-            stats['processed'] = True
-            
-            # Store transaction IDs in session for preview
-            self.request.session['imported_transaction_ids'] = [
-                t.id for t in created_transactions
-            ]
-            self.request.session['upload_stats'] = stats
-            
-            # Show success/warning messages
-            if stats['successful'] > 0:
-                messages.success(
-                    self.request, 
-                    f"Successfully imported {stats['successful']} transaction(s)!"
-                )
-            
-            if stats['errors']:
-                messages.warning(
-                    self.request, 
-                    f"{len(stats['errors'])} row(s) had issues and were skipped."
-                )
-            
-            if stats['successful'] == 0 and not stats['errors']:
-                messages.info(self.request, "No transactions were found in the file.")
-                
-        except UnicodeDecodeError:
-            messages.error(
+        if stats['rejected']:
+            messages.warning(
                 self.request, 
-                "Unable to read file. Please ensure it's saved as UTF-8 encoded CSV."
+                f"{stats['rejected']} row(s) had issues and were skipped."
             )
-            return self.form_invalid(form)
-        except Exception as e:
-            messages.error(self.request, f"An error occurred while processing: {str(e)}")
-            return self.form_invalid(form)
         
-        # Redirect to self to show results (PRG pattern)
-        return redirect('upload_transactions')
+        if stats['successful'] == 0 and not stats['rejected'] and not stats['duplicates']:
+            if not batch.jobs.filter(status=ImportJob.STATUS_FAILED).exists():
+                messages.info(self.request, "No transactions were found in the file.")
     
     def form_invalid(self, form):
         """Handle invalid form submission."""
@@ -249,36 +234,304 @@ class TransactionUploadView(LoginRequiredMixin, FormView):
             for error in errors:
                 messages.error(self.request, error)
         return super().form_invalid(form)
-    
-    def _parse_date(self, date_str):
-        """Parse date string trying multiple formats."""
-        date_formats = ['%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%d-%m-%Y', '%m-%d-%Y']
-        for fmt in date_formats:
-            try:
-                return datetime.datetime.strptime(date_str, fmt).date()
-            except ValueError:
-                continue
-        return None
-    
-    def _parse_amount(self, amount_str):
-        """Parse amount string, handling currency symbols."""
-        cleaned = amount_str.replace(',', '').replace('$', '').replace('£', '').replace('€', '')
+
+
+class ImportBatchStatusView(LoginRequiredMixin, View):
+    """
+    JSON progress for a whole upload, summed over its files; polled by
+    the upload page while the batch is being imported.
+    """
+    def get(self, request, pk):
+        batch = ImportBatch.objects.filter(id=pk, user=request.user).first()
+        if batch is None:
+            return JsonResponse({'error': 'Import batch not found.'}, status=404)
+        totals = batch.jobs.aggregate(
+            rows_parsed=Sum('rows_parsed'),
+            rows_inserted=Sum('rows_inserted'),
+            rows_rejected=Sum('rows_rejected'),
+            rows_duplicate=Sum('rows_duplicate'),
+            files=Count('id'),
+            files_done=Count('id', filter=Q(status__in=(ImportJob.STATUS_DONE, ImportJob.STATUS_FAILED))),
+        )
+        data = {key: value or 0 for key, value in totals.items()}
+        data['id'] = batch.id
+        data['finished'] = batch.is_finished
+        return JsonResponse(data)
+
+
+class ImportJobStatusView(LoginRequiredMixin, View):
+    """
+    Lightweight JSON endpoint polled by the upload page while a
+    background import job runs.
+    """
+    def get(self, request, pk):
+        job = ImportJob.objects.filter(id=pk, user=request.user).values(
+            'id', 'status', 'rows_parsed', 'rows_inserted', 'rows_rejected', 'rows_duplicate', 'message'
+        ).first()
+        if job is None:
+            return JsonResponse({'error': 'Import job not found.'}, status=404)
+        job['finished'] = job['status'] in (ImportJob.STATUS_DONE, ImportJob.STATUS_FAILED)
+        return JsonResponse(job)
+
+
+
+
+
+# --- 9. Transaction Browser (keyset pagination) ---
+class TransactionBrowserMixin:
+    """Shared filter parsing and page lookup for the HTML and JSON browsers."""
+
+    def get_page(self, request):
+        """Return (form, rows, next_cursor); rows is None if the filters are invalid."""
+        form = TransactionFilterForm(request.GET or None, user=request.user)
+        if form.is_bound and not form.is_valid():
+            return form, None, None
+        filters = form.cleaned_data if form.is_bound else {}
+        browser = TransactionBrowser(request.user, filters)
         try:
-            return Decimal(cleaned)
-        except (InvalidOperation, ValueError):
-            return None
+            rows, next_cursor = browser.page(filters.get('cursor'), filters.get('limit'))
+        except InvalidCursor as e:
+            form.add_error('cursor', str(e))
+            return form, None, None
+        return form, rows, next_cursor
+
+
+class TransactionListView(LoginRequiredMixin, TransactionBrowserMixin, View):
+    """Browse all of a user's transactions, newest first, with filters."""
+    template_name = 'transactions.html'
+
+    def get(self, request):
+        form, rows, next_cursor = self.get_page(request)
+        next_query = None
+        if next_cursor:
+            params = request.GET.copy()
+            params['cursor'] = next_cursor
+            next_query = params.urlencode()
+        # Exports take the same filters, minus the paging parameters
+        export_params = request.GET.copy()
+        for key in ('cursor', 'limit'):
+            export_params.pop(key, None)
+        context = {
+            'form': form,
+            'transactions': rows or [],
+            'next_query': next_query,
+            'export_query': export_params.urlencode(),
+            'is_first_page': not request.GET.get('cursor'),
+        }
+        return render(request, self.template_name, context)
+
+
+class TransactionListAPIView(LoginRequiredMixin, TransactionBrowserMixin, View):
+    """JSON version of the transaction browser, using the same filters and cursor."""
+
+    def get(self, request):
+        form, rows, next_cursor = self.get_page(request)
+        if rows is None:
+            return JsonResponse({'errors': form.errors}, status=400)
+        results = [
+            {
+                'id': row['id'],
+                'date': row['date'].isoformat(),
+                'description': row['description'],
+                'amount': str(row['amount']),
+                'category_id': row['category_id'],
+                'category': row['category__name'],
+            }
+            for row in rows
+        ]
+        return JsonResponse({'results': results, 'next_cursor': next_cursor})
 
 
+class TransactionSearchView(LoginRequiredMixin, View):
+    """Ranked full-text search over the user's descriptions and notes (JSON)."""
+    MAX_LIMIT = 100
 
+    def get(self, request):
+        query = request.GET.get('q', '')
+        try:
+            limit = min(max(int(request.GET.get('limit', TransactionSearch.DEFAULT_LIMIT)), 1), self.MAX_LIMIT)
+        except ValueError:
+            return JsonResponse({'errors': {'limit': ["Enter a whole number."]}}, status=400)
+        rows = TransactionSearch(request.user).search(query, limit)
+        results = [
+            {
+                'id': row['id'],
+                'date': row['date'].isoformat(),
+                'description': row['description'],
+                'amount': str(row['amount']),
+                'notes': row['notes'],
+                'category_id': row['category_id'],
+                'category': row['category__name'],
+            }
+            for row in rows
+        ]
+        return JsonResponse({'query': query, 'results': results})
+
+
+class TransactionExportView(LoginRequiredMixin, View):
+    """
+    Download the user's transactions as CSV (re-importable) or NDJSON,
+    streamed row by row. Accepts the browser's filters, e.g. a date range.
+    """
+
+    def get(self, request):
+        fmt = request.GET.get('format', 'csv')
+        if fmt not in TransactionExporter.FORMATS:
+            return JsonResponse({'errors': {'format': ["Use 'csv' or 'ndjson'."]}}, status=400)
+        form = TransactionFilterForm(request.GET, user=request.user)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+
+        # Oldest first, like a bank statement; a backward walk of txn_user_date_idx
+        queryset = TransactionBrowser(request.user, form.cleaned_data).queryset().order_by('date', 'created_at', 'id')
+        content_type, extension = TransactionExporter.FORMATS[fmt]
+        response = StreamingHttpResponse(
+            TransactionExporter(queryset).stream(fmt),
+            content_type=f"{content_type}; charset=utf-8"
+        )
+        filename = f"transactions-{timezone.localdate():%Y%m%d}.{extension}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
 
 # --- 4. NEW Class-Based Views for Modules ---
 
-class AISortingView(LoginRequiredMixin, TemplateView):
+class AISortingView(LoginRequiredMixin, View):
+    """
+    AI Sorting module (UC 4.1).
+    Shows how many transactions still need a category, lets the user
+    manage keyword/merchant rules and runs the rule-based categorizer
+    followed by the per-user ML model.
+    """
     template_name = 'ai_sorting.html'
 
+    def get(self, request):
+        transactions = Transaction.objects.filter(user=request.user)
+        context = {
+            'uncategorized_count': transactions.filter(category__isnull=True).count(),
+            'categorized_count': transactions.filter(category__isnull=False).count(),
+            'rules': CategoryRule.objects.filter(user=request.user).select_related('category'),
+            'categories': user_categories(request.user.pk),
+            'match_choices': CategoryRule.MATCH_CHOICES,
+            'ml_available': ML_AVAILABLE,
+        }
+        return render(request, self.template_name, context)
+
+    def post(self, request):
+        if 'run_sorting' in request.POST:
+            stats = RuleCategorizer(request.user).run()
+            # Rules first, then the learned model for whatever they missed
+            # The model as last trained: retraining is left to the import worker
+            ml_stats = (
+                MLCategorizer(request.user).run(retrain_if_stale=False) if ML_AVAILABLE
+                else {'categorized': 0, 'trained_on': 0}
+            )
+            categorized = stats['categorized'] + ml_stats['categorized']
+            if not stats['rules'] and not ml_stats['trained_on']:
+                messages.info(request, "Add some categories or rules first so there is something to sort by.")
+            elif categorized:
+                messages.success(
+                    request,
+                    f"Categorized {categorized} of {stats['scanned']} transaction(s) "
+                    f"({stats['categorized']} by rules, {ml_stats['categorized']} by the AI model)."
+                )
+            else:
+                messages.info(request, "No uncategorized transactions matched your rules.")
+
+        elif 'add_rule' in request.POST:
+            pattern = request.POST.get('pattern', '').strip()
+            category = Category.objects.filter(id=request.POST.get('category_id'), user=request.user).first()
+            if pattern and category:
+                rule = CategoryRule(
+                    user=request.user,
+                    category=category,
+                    pattern=pattern,
+                    match_type=request.POST.get('match_type', CategoryRule.MATCH_KEYWORD)
+                )
+                try:
+                    rule.full_clean()
+                    rule.save()
+                    messages.success(request, f"Rule '{pattern}' added.")
+                except ValidationError as e:
+                    for error in e.messages:
+                        messages.error(request, error)
+            else:
+                messages.error(request, "Please enter a keyword and pick a category.")
+
+        elif 'delete_rule' in request.POST:
+            deleted, _ = CategoryRule.objects.filter(
+                id=request.POST.get('rule_id'), user=request.user
+            ).delete()
+            if deleted:
+                messages.success(request, "Rule deleted.")
+            else:
+                messages.error(request, "Rule could not be found.")
+
+        return redirect('ai_sorting')
+
 class AnalyticsDashboardView(LoginRequiredMixin, TemplateView):
+    """
+    Analytics Dashboard (UC 5.1).
+    Reads only the MonthlyRollup, RecurringSeries and SpendingAnomaly
+    tables, so the cost grows with months x categories rather than with
+    the number of transactions. POST re-runs the anomaly scan.
+    """
     template_name = 'analytics_dashboard.html'
+    ANOMALY_LIMIT = 10
+
+    def post(self, request):
+        if not ANOMALIES_AVAILABLE:
+            messages.error(request, "Anomaly detection needs NumPy, which is not installed.")
+            return redirect('analytics_dashboard')
+        stats = AnomalyDetector(request.user).run()
+        messages.success(
+            request,
+            f"Scanned {stats['scanned']} categorized transaction(s); {stats['flagged']} look unusual."
+        )
+        return redirect('analytics_dashboard')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        rollups = MonthlyRollup.objects.filter(user=self.request.user).order_by()
+
+        monthly = list(
+            rollups.values('month')
+            .annotate(total=Sum('total'), count=Sum('count'))
+            .order_by('-month')[:12]
+        )
+        by_category = list(
+            rollups.values('category__name')
+            .annotate(
+                total=Sum('total'),
+                count=Sum('count'),
+                min_amount=Min('min_amount'),
+                max_amount=Max('max_amount'),
+            )
+            .order_by('total')
+        )
+
+        # Bar widths relative to the largest absolute total in each table
+        for rows in (monthly, by_category):
+            largest = max((abs(r['total']) for r in rows), default=0)
+            for r in rows:
+                r['percent'] = round(abs(r['total']) * 100 / largest) if largest else 0
+
+        context['monthly'] = monthly
+        context['by_category'] = by_category
+        context['recurring'] = (
+            RecurringSeries.objects
+            .filter(user=self.request.user)
+            .select_related('merchant')
+            .order_by('next_date')
+        )
+        context['anomalies'] = (
+            SpendingAnomaly.objects
+            .filter(user=self.request.user)
+            .select_related('transaction__category')
+            .order_by('-transaction__date')[:self.ANOMALY_LIMIT]
+        )
+        context['anomalies_available'] = ANOMALIES_AVAILABLE
+        return context
 
 class AboutView(TemplateView):
     template_name = 'about.html'